@@ -0,0 +1,167 @@
+import json
+import time
+import numpy as np
+from alns.insertion import insertion_operators
+from alns.removal import removal_operators
+from classes.instancecontext import InstanceContext
+from classes.parameters import Parameters
+from classes.solutionstate import SolutionState
+from functions.main_algo import algo
+
+# Import the config file
+from config import *
+alns_budget_seconds = ALNS_BUDGET_SECONDS
+alns_min_removed = ALNS_MIN_REMOVED
+alns_max_removed = ALNS_MAX_REMOVED
+alns_segment = ALNS_SEGMENT
+alns_reaction = ALNS_REACTION
+alns_scores = ALNS_SCORES
+alns_start_temperature = ALNS_START_TEMPERATURE
+alns_cooling = ALNS_COOLING
+
+class ALNSResult(object):
+    def __init__(self, best:SolutionState, times:list, objectives:list, best_objectives:list, weights:dict, iterations:int, chains:list = None):
+        '''
+        Initialize the result of an ALNS run: the best state, the objective-vs-time trace and the final operator weights.
+        The result of a parallel run has no current state: its objectives are the best objective over all chains, the same as best_objectives,
+        its weights are the mean final weights of the chains, and chains holds the trace and final weights of each chain.
+        '''
+        self.best = best # the best state found
+        self.times = times # the wall-clock seconds from the start at the end of each iteration, 0 for the initial state
+        self.objectives = objectives # the objective of the current state after each iteration
+        self.best_objectives = best_objectives # the best objective after each iteration
+        self.weights = weights # the weight of each removal and insertion operator at the end
+        self.iterations = iterations
+        self.chains = chains or [] # the trace, with times from the start of the parallel run, and the final weights of each chain of a parallel run
+
+    def get_trace(self) -> dict:
+        '''
+        Get the objective-vs-time trace as plain lists, with the trace of each chain of a parallel run
+        '''
+        trace = {'time': self.times, 'objective': self.objectives, 'best': self.best_objectives}
+        if self.chains:
+            trace['chains'] = self.chains
+        return trace
+
+    def get_improvement_per_second(self) -> float:
+        '''
+        Get the decrease of the best objective per second of the run
+        '''
+        return (self.best_objectives[0] - self.best_objectives[-1])/self.times[-1] if self.times[-1] > 0 else 0.0
+
+class ALNS(object):
+    def __init__(self, removals:dict = removal_operators, insertions:dict = insertion_operators, seed:int = 0,
+                 min_removed:int = alns_min_removed, max_removed:int = alns_max_removed, segment:int = alns_segment,
+                 reaction:float = alns_reaction, scores:tuple = alns_scores,
+                 start_temperature:float = alns_start_temperature, cooling:float = alns_cooling):
+        '''
+        Initialize an adaptive large neighbourhood search over a solution state.
+        Each iteration draws a removal and an insertion operator by roulette wheel over their weights, removes between min_removed and
+        max_removed orders and inserts them again. The move is kept or rolled back with the undo log of the state.
+        Operators score scores[0] for a new best state, scores[1] for a better state, scores[2] for an accepted worse one
+        and 0 for a move that keeps the objective or is rolled back. Every segment iterations each weight moves by reaction toward the mean score of its operator.
+        A worse state is accepted with the simulated annealing probability at a temperature that starts at start_temperature and is
+        multiplied by cooling every iteration, with start_temperature 0 only states that are not worse are accepted.
+        '''
+        self.removals = removals
+        self.insertions = insertions
+        self.rng = np.random.default_rng(seed)
+        self.min_removed, self.max_removed = min_removed, max_removed
+        self.segment = segment
+        self.reaction = reaction
+        self.scores = scores
+        self.start_temperature = start_temperature
+        self.cooling = cooling
+
+    def select(self, weights:np.ndarray) -> int:
+        '''
+        Draw an operator with a probability proportional to its weight
+        '''
+        return int(self.rng.choice(len(weights), p = weights/weights.sum()))
+
+    def accept(self, candidate:float, current:float, temperature:float) -> bool:
+        '''
+        Decide if a candidate objective replaces the current one
+        '''
+        if candidate <= current:
+            return True
+        return temperature > 0 and self.rng.random() < np.exp((current - candidate)/temperature)
+
+    def iterate(self, state:SolutionState, budget:float = alns_budget_seconds, max_iterations:int = None, weights:dict = None) -> ALNSResult:
+        '''
+        Improve a state until the wall-clock budget in seconds or max_iterations is spent. The state is changed in place and ends as the best state found.
+        The operator weights start from weights, e.g. those of an earlier run, or at 1.
+        '''
+        removal_names, insertion_names = list(self.removals), list(self.insertions)
+        weights = [np.array([(weights or {}).get(name, 1.0) for name in names]) for names in [removal_names, insertion_names]] # operator weights
+        segment_scores = [np.zeros(len(removal_names)), np.zeros(len(insertion_names))] # scores of the operators in the current segment
+        segment_uses = [np.zeros(len(removal_names)), np.zeros(len(insertion_names))] # uses of the operators in the current segment
+
+        state.commit()
+        current = best = state.objective()
+        best_state = state.copy() # shares the route arrays with the state
+        times, objectives, best_objectives = [0.0], [current], [best]
+        temperature = self.start_temperature
+        start = time.perf_counter()
+        iteration = 0
+        while time.perf_counter() - start < budget and (max_iterations is None or iteration < max_iterations):
+            chosen = [self.select(weights[0]), self.select(weights[1])]
+            mark = state.checkpoint()
+            n = int(self.rng.integers(self.min_removed, self.max_removed + 1))
+            self.removals[removal_names[chosen[0]]](state, self.rng, n)
+            self.insertions[insertion_names[chosen[1]]](state, self.rng)
+
+            candidate = state.objective()
+            if candidate < best - 1e-9:
+                score = self.scores[0]
+                best = current = candidate
+                state.commit()
+                best_state = state.copy()
+            elif self.accept(candidate, current, temperature):
+                if candidate < current - 1e-9:
+                    score = self.scores[1]
+                elif candidate > current + 1e-9:
+                    score = self.scores[2]
+                else: # e.g. the orders went back where they were
+                    score = 0
+                current = candidate
+                state.commit()
+            else:
+                score = 0
+                state.rollback(mark)
+
+            for w in range(2):
+                segment_scores[w][chosen[w]] += score
+                segment_uses[w][chosen[w]] += 1
+            iteration += 1
+            if iteration % self.segment == 0: # adapt the weights to the scores of the segment
+                for w in range(2):
+                    used = segment_uses[w] > 0
+                    weights[w][used] = (1 - self.reaction)*weights[w][used] + self.reaction*segment_scores[w][used]/segment_uses[w][used]
+                    weights[w] = np.maximum(weights[w], 1e-3) # every operator keeps a chance
+                    segment_scores[w][:], segment_uses[w][:] = 0, 0
+            temperature *= self.cooling
+
+            times.append(time.perf_counter() - start)
+            objectives.append(current)
+            best_objectives.append(best)
+
+        state.__dict__.update(best_state.__dict__) # end on the best state
+        return ALNSResult(state, times, objectives, best_objectives,
+                          {**dict(zip(removal_names, weights[0].tolist())), **dict(zip(insertion_names, weights[1].tolist()))}, iteration)
+
+def run_alns(instance_dir, budget:float = alns_budget_seconds, seed:int = 0, matching:str = 'lsa', params:Parameters = None,
+             context:InstanceContext = None, **kwargs) -> ALNSResult:
+    '''
+    Run the algorithm on an instance and improve the routes it built with ALNS for budget seconds
+    '''
+    dr = algo(instance_dir, matching, params = params, context = context)
+    state = SolutionState.from_result(dr)
+    return ALNS(seed = seed, **kwargs).iterate(state, budget)
+
+def write_traces(results:dict, path:str):
+    '''
+    Write the objective-vs-time trace of the ALNS run of each instance to a json file
+    '''
+    with open(path, 'w') as f:
+        json.dump({instance: result.get_trace() for instance, result in results.items()}, f)
@@ -0,0 +1,68 @@
+import numpy as np
+from classes.solutionstate import SolutionState
+
+# Import the config file
+from config import *
+regret_k = ALNS_REGRET_K
+
+# Insertion operators put the orders of state.unassigned back in place, each one into a route of its decision epoch and restaurant.
+# The number of routes of an epoch and restaurant does not change, since each route was matched to a courier.
+
+def get_options(state:SolutionState, row:int, t:int) -> list:
+    '''
+    Get the best position and its cost increase for an order in each route it can go to, sorted by cost increase
+    '''
+    group = (t, int(state.order_store.restaurant[row]))
+    routes = state.route_index.get(group) or [state.add_route(*group)] # an order whose routes are gone opens a new one
+    options = []
+    for k in routes:
+        deltas = state.get_insertion_deltas(k, row)
+        pos = int(np.argmin(deltas))
+        options.append((float(deltas[pos]), k, pos))
+    return sorted(options)
+
+def get_regret(options:list, k:int) -> float:
+    '''
+    Get the k-regret of an order, how much worse its k-1 next best routes are than the best one
+    '''
+    if len(options) < k: # the missing routes count as infinitely worse, so orders with fewer routes go first
+        return float('inf')
+    return sum(delta - options[0][0] for delta, _, _ in options[1:k])
+
+def insert_by_priority(state:SolutionState, k:int):
+    '''
+    Insert the unassigned orders one at a time: with k = 1 the cheapest one first, otherwise the one with the largest k-regret.
+    The options of an order are only scored again when a route of its epoch and restaurant has changed.
+    '''
+    options = {row: get_options(state, row, t) for row, t in state.unassigned}
+    groups = {row: (t, int(state.order_store.restaurant[row])) for row, t in state.unassigned}
+    while options:
+        if k == 1:
+            row = min(options, key = lambda r: (options[r][0][0], r))
+        else:
+            row = max(options, key = lambda r: (get_regret(options[r], k), -options[r][0][0], -r))
+        _, route, pos = options.pop(row)[0]
+        state.insert(route, pos, row)
+        for other in options: # only the orders that could go to the changed route
+            if groups[other] == groups[row]:
+                options[other] = get_options(state, other, groups[other][0])
+
+def greedy_insertion(state:SolutionState, rng:np.random.Generator):
+    '''
+    Insert the cheapest order first, at its best position
+    '''
+    insert_by_priority(state, 1)
+
+def regret_insertion(state:SolutionState, rng:np.random.Generator, k:int = regret_k):
+    '''
+    Insert the order with the largest k-regret first, at its best position
+    '''
+    insert_by_priority(state, k)
+
+def regret_2_insertion(state:SolutionState, rng:np.random.Generator):
+    '''
+    Insert the order with the largest 2-regret first
+    '''
+    insert_by_priority(state, 2)
+
+insertion_operators = {'greedy': greedy_insertion, 'regret_2': regret_2_insertion, 'regret_k': regret_insertion} # selectable by name
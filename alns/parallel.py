@@ -0,0 +1,87 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from alns.driver import ALNS, ALNSResult
+from classes.instancecontext import InstanceContext
+from classes.parameters import Parameters
+from classes.solutionstate import SolutionState
+from functions.main_algo import algo
+from functions.sweep import get_worker_context
+
+# Import the config file
+from config import *
+alns_budget_seconds = ALNS_BUDGET_SECONDS
+alns_migration_seconds = ALNS_MIGRATION_SECONDS
+
+def run_chain(task:tuple) -> tuple:
+    '''
+    Run one ALNS chain in a worker process. The task carries the context, which is attached to its shared memory and not copied,
+    and the solution to start from as a few integer arrays. Return the best solution found, its objective, the trace and the operator weights.
+    '''
+    context, params, solution, seed, budget, weights, options = task
+    state = SolutionState.from_context(get_worker_context(context), params, solution)
+    result = ALNS(seed = seed, **options).iterate(state, budget, weights = weights)
+    return result.best.get_solution(), result.best_objectives[-1], result.get_trace(), result.weights, result.iterations
+
+def merge_traces(traces:list, offsets:list) -> tuple:
+    '''
+    Merge the traces of chains run side by side, each one started offsets[i] seconds after the parallel run,
+    into the best objective over all chains against time
+    '''
+    events = sorted((offset + t, best) for trace, offset in zip(traces, offsets) for t, best in zip(trace['time'], trace['best']))
+    times, best_objectives = [], []
+    for t, best in events:
+        if not best_objectives or best < best_objectives[-1]:
+            times.append(t)
+            best_objectives.append(best)
+    return times, best_objectives
+
+def run_parallel_alns(instance_dir, budget:float = alns_budget_seconds, chains:int = None, seed:int = 0, migration:float = alns_migration_seconds,
+                      matching:str = 'lsa', params:Parameters = None, context:InstanceContext = None, **options) -> ALNSResult:
+    '''
+    Run the algorithm on an instance and improve the routes it built with chains ALNS chains in a process pool for budget seconds.
+    With migration 0 the chains are independent multi-starts with seeds seed, seed+1, ... and the best one is kept.
+    Otherwise an island model: the chains stop every migration seconds and all of them go on from the best solution found so far,
+    each with its own seed and operator weights. The instance data is shared with the workers through shared memory,
+    the workers only receive the routes as integer arrays. A context that is not shared yet is shared for the run and copied back to private memory at the end.
+    The result holds the best state, the best objective over all chains against time, as objectives and best_objectives, and the total number of iterations.
+    Its weights are the mean final weights of the chains, and its chains the current and best objective against time and the final weights
+    of each chain in each round.
+    '''
+    chains = chains or os.cpu_count()
+    params = params if params is not None else Parameters()
+    shared = context is None or not context.shared
+    context = (context if context is not None else InstanceContext(instance_dir)).share() if shared else context
+    dr = algo(instance_dir, matching, params = params, context = context)
+    initial = SolutionState.from_result(dr)
+
+    solutions = [initial.get_solution()]*chains # the solution each chain starts from
+    weights = [None]*chains
+    best_solution, best_objective = initial.get_solution(), initial.objective()
+    traces, offsets, chain_traces, iterations = [], [], [], 0
+    rounds = max(1, int(round(budget/migration))) if migration > 0 else 1
+    try:
+        with ProcessPoolExecutor(max_workers=chains) as executor:
+            start = time.perf_counter()
+            for r in range(rounds):
+                round_start = time.perf_counter() - start
+                round_budget = budget - round_start if r == rounds - 1 else budget/rounds # the last round takes what is left
+                tasks = [(context, params, solutions[i], seed + r*chains + i, round_budget, weights[i], options) for i in range(chains)]
+                for i, (solution, objective, trace, chain_weights, chain_iterations) in enumerate(executor.map(run_chain, tasks)):
+                    traces.append(trace)
+                    offsets.append(round_start)
+                    chain_traces.append({'chain': i, 'round': r, 'time': [round_start + t for t in trace['time']],
+                                         'objective': trace['objective'], 'best': trace['best'], 'weights': chain_weights})
+                    weights[i] = chain_weights
+                    iterations += chain_iterations
+                    if objective < best_objective:
+                        best_solution, best_objective = solution, objective
+                solutions = [best_solution]*chains # the islands migrate to the best solution
+    finally:
+        if shared:
+            context.unshare() # dr and the initial state are on the shared blocks and are not used past here
+
+    best = SolutionState.from_context(context, params, best_solution)
+    times, best_objectives = merge_traces(traces, offsets) # starts at the initial objective at time 0
+    mean_weights = {name: sum(w[name] for w in weights)/chains for name in weights[0]} if weights[0] else {}
+    return ALNSResult(best, times, best_objectives, best_objectives, mean_weights, iterations, chain_traces)
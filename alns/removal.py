@@ -0,0 +1,79 @@
+import numpy as np
+from classes.solutionstate import SolutionState
+
+# Import the config file
+from config import *
+worst_randomness = ALNS_WORST_RANDOMNESS
+shaw_randomness = ALNS_SHAW_RANDOMNESS
+
+# Removal operators take out n orders of a solution state in place, the orders are then in state.unassigned.
+# Orders keep their decision epoch and restaurant, so they can only go back to a route of the same epoch and restaurant.
+
+def pick(rng:np.random.Generator, n:int, randomness:float) -> int:
+    '''
+    Pick a position in a list of n candidates sorted from the best one, biased to the front by randomness (1: uniform)
+    '''
+    return int(n*rng.random()**randomness)
+
+def random_removal(state:SolutionState, rng:np.random.Generator, n:int):
+    '''
+    Remove n orders drawn uniformly
+    '''
+    rows, routes = state.get_assigned()
+    for i in rng.choice(len(rows), min(n, len(rows)), replace=False):
+        state.remove_row(int(routes[i]), int(rows[i]))
+
+def worst_removal(state:SolutionState, rng:np.random.Generator, n:int, randomness:float = worst_randomness):
+    '''
+    Remove n orders with the largest cost savings, one at a time so the savings of the route an order leaves are updated
+    '''
+    for _ in range(n):
+        rows, routes = state.get_assigned()
+        if len(rows) == 0:
+            return
+        savings = np.concatenate([state.get_removal_deltas(k) for k in range(len(state.routes)) if len(state.routes[k])]) # cached for the routes that did not change
+        i = np.argsort(savings, kind='stable')[pick(rng, len(rows), randomness)]
+        state.remove_row(int(routes[i]), int(rows[i]))
+
+def get_relatedness(state:SolutionState, seed:int, rows:np.ndarray, routes:np.ndarray) -> np.ndarray:
+    '''
+    Get how unrelated each order of rows is to the seed order, the smaller the more related:
+    the travel time between the two orders, the difference of their ready times, and a penalty for another epoch or restaurant
+    '''
+    location, ready_time = state.order_store.location, state.order_store.ready_time
+    travel_time = state.travel_times.matrix[location[seed], location[rows]].astype(np.float64)
+    ready_gap = np.abs(ready_time[rows].astype(np.float64) - ready_time[seed])
+    seed_route = routes[rows == seed][0]
+    epochs, restaurants = np.array(state.epochs)[routes], np.array(state.restaurants)[routes]
+    other_group = (epochs != state.epochs[seed_route]) | (restaurants != state.restaurants[seed_route]) # the orders cannot be exchanged
+    return travel_time/max(travel_time.max(), 1) + ready_gap/max(ready_gap.max(), 1) + 2*other_group
+
+def shaw_removal(state:SolutionState, rng:np.random.Generator, n:int, randomness:float = shaw_randomness):
+    '''
+    Remove a random seed order and the n-1 orders most related to it
+    '''
+    rows, routes = state.get_assigned()
+    if len(rows) == 0:
+        return
+    seed = int(rows[rng.integers(len(rows))])
+    order = np.argsort(get_relatedness(state, seed, rows, routes), kind='stable') # the seed first
+    chosen = [order[0]]
+    rest = list(order[1:])
+    while len(chosen) < min(n, len(rows)):
+        chosen.append(rest.pop(pick(rng, len(rest), randomness)))
+    for i in chosen:
+        state.remove_row(int(routes[i]), int(rows[i]))
+
+def restaurant_removal(state:SolutionState, rng:np.random.Generator, n:int):
+    '''
+    Remove up to n orders of the routes of a random restaurant at a random epoch, so they can be rebundled together
+    '''
+    groups = [k for k in state.route_index if sum(len(state.routes[r]) for r in state.route_index[k]) > 1] # groups with something to rebundle
+    if not groups:
+        return random_removal(state, rng, n)
+    group = groups[rng.integers(len(groups))]
+    members = [(r, int(row)) for r in state.route_index[group] for row in state.routes[r]]
+    for i in rng.permutation(len(members))[:n]:
+        state.remove_row(*members[i])
+
+removal_operators = {'random': random_removal, 'worst': worst_removal, 'shaw': shaw_removal, 'restaurant': restaurant_removal} # selectable by name
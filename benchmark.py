@@ -0,0 +1,59 @@
+import argparse
+import sys
+
+from benchmarks.baseline import compare, format_comparison, load_baseline, save_baseline
+from benchmarks.end_to_end import get_dimension_means, get_end_to_end_benchmarks, get_families
+from benchmarks.micro import Recording, get_micro_benchmarks, measure, micro_benchmarks
+from classes.matching import matching_backends
+
+# Import the config file
+from config import *
+
+if __name__ == '__main__':
+
+    # Parse the arguments
+    parser = argparse.ArgumentParser(description='Run the benchmarks and compare them to a baseline, failing on a slowdown')
+    parser.add_argument('--suite', type=str, default='all', choices=['micro', 'end_to_end', 'all'])
+    parser.add_argument('--micro', type=str, nargs='+', default=list(micro_benchmarks), choices=list(micro_benchmarks), help='the micro-benchmarks to run')
+    parser.add_argument('--instance_dir', type=str, default=BENCHMARK_INSTANCE, help='the instance the micro-benchmarks run on')
+    parser.add_argument('--instances', type=str, default='data/*', help='glob of the instance directories of the end-to-end benchmarks')
+    parser.add_argument('--per_family', type=int, default=BENCHMARK_INSTANCES_PER_FAMILY, help='the number of instances of each family run end to end')
+    parser.add_argument('--repeats', type=int, default=BENCHMARK_REPEATS, help='the number of timings of each benchmark, the fastest is kept')
+    parser.add_argument('--matching', type=str, default=MATCHING_BACKEND, choices=list(matching_backends))
+    parser.add_argument('--baseline', type=str, default=BENCHMARK_BASELINE, help='the baseline file')
+    parser.add_argument('--threshold', type=float, default=BENCHMARK_THRESHOLD, help='the relative slowdown at which a benchmark fails')
+    parser.add_argument('--save', action='store_true', help='write the results to the baseline file instead of failing on a slowdown')
+    args = parser.parse_args()
+
+    # The timings of every benchmark run go round together, so the timings of each benchmark are spread over the whole suite
+    benchmarks = {}
+    recording = None
+    families = {}
+    if args.suite in ('micro', 'all'):
+        print('Running the micro-benchmarks on', args.instance_dir)
+        recording = Recording(args.instance_dir, args.matching)
+        benchmarks.update(get_micro_benchmarks(recording, args.micro))
+    if args.suite in ('end_to_end', 'all'):
+        print('Running the end-to-end benchmarks on', args.instances)
+        families = get_families(args.instances, args.per_family)
+        benchmarks.update(get_end_to_end_benchmarks(families, args.matching))
+    try:
+        seconds = measure(benchmarks, args.repeats)
+    finally:
+        if recording is not None:
+            recording.close()
+    results = {name: value for name, value in seconds.items() if name.startswith('micro/')}
+    if families:
+        results.update(get_dimension_means(families, seconds, args.matching))
+
+    if args.save:
+        save_baseline(results, args.baseline)
+        print(format_comparison(compare({}, results)))
+        print('Baseline written to', args.baseline)
+    else:
+        rows = compare(load_baseline(args.baseline), results, args.threshold)
+        print(format_comparison(rows))
+        slower = [row[0] for row in rows if row[4] == 'slower']
+        if slower:
+            print('{} benchmark(s) more than {:.0%} slower than the baseline: {}'.format(len(slower), args.threshold, ', '.join(slower)))
+            sys.exit(1)
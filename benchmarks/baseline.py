@@ -0,0 +1,67 @@
+import json
+import os
+import platform
+import subprocess
+
+# Import the config file
+from config import *
+benchmark_threshold = BENCHMARK_THRESHOLD
+
+def get_machine() -> dict:
+    '''
+    Get a description of the machine and of the commit the benchmarks ran on, a baseline is only comparable on the same machine
+    '''
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    return {'python': platform.python_version(), 'machine': platform.machine(), 'processor': platform.processor(),
+            'cpus': os.cpu_count(), 'commit': commit}
+
+def save_baseline(results:dict, path):
+    '''
+    Write benchmark results to a baseline file, keeping the results of the benchmarks that were not run
+    '''
+    baseline = load_baseline(path) if os.path.isfile(path) else {}
+    with open(path, 'w') as f:
+        json.dump({'machine': get_machine(), 'results': {**baseline, **results}}, f, indent=4, sort_keys=True)
+
+def load_baseline(path) -> dict:
+    '''
+    Read the benchmark results of a baseline file
+    '''
+    with open(path) as f:
+        return json.load(f)['results']
+
+def compare(baseline:dict, results:dict, threshold:float = benchmark_threshold) -> list:
+    '''
+    Compare benchmark results to a baseline. A benchmark is a regression if it is more than threshold slower than its baseline,
+    relative to it. Return (name, baseline seconds, seconds, relative change, status) for each benchmark run,
+    the status is 'ok', 'faster', 'slower' or 'new' for a benchmark that is not in the baseline.
+    '''
+    rows = []
+    for name in sorted(results):
+        seconds = results[name]
+        if name not in baseline:
+            rows.append((name, None, seconds, None, 'new'))
+            continue
+        change = seconds/baseline[name] - 1 if baseline[name] > 0 else 0.0
+        if change > threshold:
+            status = 'slower'
+        elif change < -threshold:
+            status = 'faster'
+        else:
+            status = 'ok'
+        rows.append((name, baseline[name], seconds, change, status))
+    return rows
+
+def format_comparison(rows:list) -> str:
+    '''
+    Format the rows of compare as a table
+    '''
+    lines = ['{:<44}{:>12}{:>12}{:>9}  {}'.format('benchmark', 'baseline', 'current', 'change', 'status')]
+    for name, base, seconds, change, status in rows:
+        lines.append('{:<44}{:>12}{:>11.4f}s{:>9}  {}'.format(name, '{:.4f}s'.format(base) if base is not None else '-', seconds,
+                                                            '{:+.1%}'.format(change) if change is not None else '-', status))
+    return '\n'.join(lines)
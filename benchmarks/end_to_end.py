@@ -0,0 +1,66 @@
+import contextlib
+import glob
+import os
+import re
+from benchmarks.micro import measure
+from functions.main_algo import algo
+
+# Import the config file
+from config import *
+matching_backend = MATCHING_BACKEND
+benchmark_instances_per_family = BENCHMARK_INSTANCES_PER_FAMILY
+benchmark_repeats = BENCHMARK_REPEATS
+
+def get_family(instance_dir) -> str:
+    '''
+    Get the family of an instance, its name without the leading instance number, e.g. o100t75s1p125 for 7o100t75s1p125
+    '''
+    return re.sub(r'^\d+', '', os.path.basename(os.path.normpath(instance_dir)))
+
+def get_families(instance_pattern:str = 'data/*', per_family:int = benchmark_instances_per_family) -> dict:
+    '''
+    Get the first per_family instance directories of each family matching instance_pattern, by family
+    '''
+    instance_dirs = sorted(d for d in glob.glob(instance_pattern) if os.path.isfile(os.path.join(d, 'orders.txt')))
+    families = {}
+    for instance_dir in instance_dirs:
+        families.setdefault(get_family(instance_dir), []).append(instance_dir)
+    return {family: instance_dirs[:per_family] for family, instance_dirs in sorted(families.items())}
+
+def get_dimensions(family:str) -> list:
+    '''
+    Get the value of each dimension of a family, e.g. ['o100', 't75', 's1', 'p125'] for o100t75s1p125
+    '''
+    return re.findall(r'[a-z]+\d+', family)
+
+def get_end_to_end_benchmarks(families:dict, matching:str = matching_backend) -> dict:
+    '''
+    Get the run of the algorithm on each instance of families, reading the instance from its cache, by instance directory
+    '''
+    def get_run(instance_dir):
+        def run():
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                algo(instance_dir, matching)
+        return run, None
+    return {instance_dir: get_run(instance_dir) for instance_dirs in families.values() for instance_dir in instance_dirs}
+
+def get_dimension_means(families:dict, seconds:dict, matching:str = matching_backend) -> dict:
+    '''
+    Get the mean seconds of a run over the families with each value of a dimension, e.g. o50, t75, s1 or p125, by name,
+    from the seconds of a run of each instance. A single run of a small instance varies by up to a third on a busy machine,
+    the mean over the families of a dimension value is much steadier.
+    '''
+    runs = {} # the seconds of a run of each instance with each dimension value
+    for family, instance_dirs in families.items():
+        for dimension in get_dimensions(family):
+            runs.setdefault(dimension, []).extend(seconds[instance_dir] for instance_dir in instance_dirs)
+    return {'end_to_end/{}_{}'.format(dimension, matching): sum(values)/len(values) for dimension, values in sorted(runs.items())}
+
+def run_end_to_end_benchmarks(instance_pattern:str = 'data/*', per_family:int = benchmark_instances_per_family,
+                              matching:str = matching_backend, repeats:int = benchmark_repeats) -> dict:
+    '''
+    Run the algorithm on the first per_family instances of each family and get the mean seconds of a run over the families
+    with each value of a dimension by name, the fastest of repeats runs of each instance is kept
+    '''
+    families = get_families(instance_pattern, per_family)
+    return get_dimension_means(families, measure(get_end_to_end_benchmarks(families, matching), repeats), matching)
@@ -0,0 +1,190 @@
+import contextlib
+import math
+import os
+import shutil
+import tempfile
+import time
+from classes.deliveryrouting import DeliveryRouting
+from classes.instancecontext import InstanceContext
+from classes.matching import get_matching_backend
+from classes.route import Route
+from classes.solutionsink import TextSolutionSink
+from functions.main_algo import handle_epoch
+from functions.sweep import load_evaluator
+
+# Import the config file
+from config import *
+matching_backend = MATCHING_BACKEND
+benchmark_repeats = BENCHMARK_REPEATS
+benchmark_min_seconds = BENCHMARK_MIN_SECONDS
+
+def time_loop(run, setup, number:int) -> float:
+    '''
+    Get the seconds of number runs of run in a row. If setup is given, it is called untimed before the loop, once for each run,
+    and its results are passed to the runs.
+    '''
+    args = [(setup(),) if setup is not None else () for _ in range(number)]
+    start = time.perf_counter()
+    for arg in args:
+        run(*arg)
+    return time.perf_counter() - start
+
+def get_number(run, setup = None, min_seconds:float = benchmark_min_seconds) -> int:
+    '''
+    Get the number of runs of run a timing loops to take at least min_seconds, so a short benchmark is timed well above the jitter of the machine
+    '''
+    number = 1
+    seconds = time_loop(run, setup, number)
+    while seconds < min_seconds:
+        number = max(2*number, math.ceil(1.2*number*min_seconds/max(seconds, 1e-9)))
+        seconds = time_loop(run, setup, number)
+    return number
+
+def measure(benchmarks:dict, repeats:int = benchmark_repeats, min_seconds:float = benchmark_min_seconds) -> dict:
+    '''
+    Time the (run, setup) pairs of benchmarks, by name, and get the seconds of one run of each one, the fastest over repeats timings.
+    The timings go round the benchmarks, so that a slow spell of the machine, which can last minutes, does not fall on every timing of one benchmark.
+    '''
+    numbers = {name: get_number(run, setup, min_seconds) for name, (run, setup) in benchmarks.items()}
+    best = {name: float('inf') for name in benchmarks}
+    for _ in range(repeats):
+        for name, (run, setup) in benchmarks.items():
+            best[name] = min(best[name], time_loop(run, setup, numbers[name])/numbers[name])
+    return best
+
+class RecordingRouting(DeliveryRouting):
+    '''
+    Delivery routing problem that keeps the inputs of the bundle construction of each decision epoch, so it can be run again on its own
+    '''
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.epochs = [] # (t, ready orders, bundle size, ready orders grouped by restaurant) of each decision epoch solved
+
+    def initialization(self, t:int, ready_orders:list, idle_couriers:list, bundle_size:int, orders_by_restaurant:dict = None):
+        self.epochs.append((t, ready_orders, bundle_size, orders_by_restaurant))
+        return super().initialization(t, ready_orders, idle_couriers, bundle_size, orders_by_restaurant)
+
+class RecordingBackend(object):
+    '''
+    Matching backend wrapper that keeps the problem of each decision epoch, so it can be solved again on its own
+    '''
+    def __init__(self, backend):
+        self.backend = backend
+        self.problems = [] # (cost, feasible, omega) of each matching problem
+
+    def solve(self, cost, feasible, omega:float) -> list:
+        self.problems.append((cost, feasible, omega))
+        return self.backend.solve(cost, feasible, omega)
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name) # the timings and sizes of the last problem
+
+class Recording(object):
+    def __init__(self, instance_dir, matching:str = matching_backend):
+        '''
+        Run the algorithm once on an instance, keeping the inputs of the bundle construction and of the matching problem of each decision epoch
+        and writing the solution files to a temporary directory, so each phase can be benchmarked on its own
+        '''
+        self.instance_dir = instance_dir
+        self.matching = matching
+        self.context = InstanceContext(instance_dir)
+        self.solution_dir = tempfile.mkdtemp(prefix='benchmark_')
+        self.output_dir = tempfile.mkdtemp(prefix='benchmark_') # the performance summary of the solution
+        self.dr = RecordingRouting(params = None, context = self.context, sink = TextSolutionSink(self.solution_dir))
+        self.backend = RecordingBackend(get_matching_backend(matching))
+        self.dr.get_ready_orders()
+        calendar = self.dr.get_calendar()
+        while calendar: # the loop of algo
+            t = calendar.next_epoch()
+            handle_epoch(self.dr, t, calendar.pop(t), self.backend)
+        self.dr.close_sink()
+
+    def build_routes(self) -> list:
+        '''
+        Build the routes of each decision epoch, as they are before the local search
+        '''
+        return [DeliveryRouting.initialization(self.dr, t, ready_orders, [], bundle_size, orders_by_restaurant)
+                for t, ready_orders, bundle_size, orders_by_restaurant in self.dr.epochs] # without recording the epochs again
+
+    def close(self):
+        '''
+        Remove the solution files of the run and their performance summary
+        '''
+        shutil.rmtree(self.solution_dir, ignore_errors=True)
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+def route_cost(recording:Recording) -> tuple:
+    '''
+    Get the run and setup of a benchmark of Route.get_route_cost on a fresh copy of every route built in the run, so no cost is cached
+    '''
+    routes = [route for res_list in recording.dr.final_result.values() for res in res_list for route in res]
+    travel_times = recording.dr.travel_times
+    def setup():
+        return [Route(list(route.bundle), route.restaurant_id, route.beta, route.gamma) for route in routes]
+    def run(copies):
+        for route in copies:
+            route.get_route_cost(travel_times)
+    return run, setup
+
+def initialization(recording:Recording) -> tuple:
+    '''
+    Get the run of a benchmark of DeliveryRouting.initialization over every decision epoch of the run
+    '''
+    dr = recording.dr
+    epochs = list(dr.epochs)
+    def run():
+        for t, ready_orders, bundle_size, orders_by_restaurant in epochs:
+            DeliveryRouting.initialization(dr, t, ready_orders, [], bundle_size, orders_by_restaurant)
+    return run, None
+
+def local_search(recording:Recording) -> tuple:
+    '''
+    Get the run and setup of a benchmark of DeliveryRouting.local_search over the routes built at every decision epoch of the run
+    '''
+    dr = recording.dr
+    def run(routes):
+        for list_of_routes_by_restaurant in routes:
+            dr.local_search(list_of_routes_by_restaurant)
+    return run, recording.build_routes
+
+def matching_per_tick(recording:Recording) -> tuple:
+    '''
+    Get the run of a benchmark of the matching backend of the recording on the matching problem of every decision epoch of the run
+    '''
+    backend = get_matching_backend(recording.matching)
+    problems = recording.backend.problems
+    def run():
+        for cost, feasible, omega in problems:
+            backend.solve(cost, feasible, omega)
+    return run, None
+
+def performance_summary(recording:Recording) -> tuple:
+    '''
+    Get the run of a benchmark of the reference evaluator, compute_performance_summary, on the solution of the run
+    '''
+    evaluator = load_evaluator()
+    def run():
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull): # the evaluator prints its progress
+            evaluator.compute_performance_summary(recording.instance_dir, recording.solution_dir, recording.output_dir)
+    return run, None
+
+micro_benchmarks = {'route_cost': route_cost, 'initialization': initialization, 'local_search': local_search,
+                    'matching': matching_per_tick, 'performance_summary': performance_summary} # selectable by name
+
+def get_micro_benchmarks(recording:Recording, names:list = None) -> dict:
+    '''
+    Get the run and setup of the micro-benchmarks in names, all of them by default, on a recording, by name.
+    The matching benchmark is named after its backend, since the backends are not comparable.
+    '''
+    return {'micro/{}_{}'.format(name, recording.matching) if name == 'matching' else 'micro/' + name: micro_benchmarks[name](recording)
+            for name in names or list(micro_benchmarks)}
+
+def run_micro_benchmarks(instance_dir, names:list = None, matching:str = matching_backend, repeats:int = benchmark_repeats) -> dict:
+    '''
+    Run the micro-benchmarks in names, all of them by default, on one instance and get the seconds of a run of each one by name
+    '''
+    recording = Recording(instance_dir, matching)
+    try:
+        return measure(get_micro_benchmarks(recording, names), repeats)
+    finally:
+        recording.close()
@@ -0,0 +1,33 @@
+class Archive(object):
+    def __init__(self, keep_assignments:bool = True):
+        '''
+        Initialize a store of the couriers and orders a run is done with.
+        DeliveryRouting retires a courier once its shift is over and an order once it is delivered or dropped,
+        so the structures walked at every decision epoch only hold the live ones. The archive records when each one was retired.
+        If keep_assignments is False, the assignments of a retired courier that were written to the solution sink are dropped from memory.
+        '''
+        self.keep_assignments = keep_assignments
+        self.couriers = {} # the epoch at which each retired courier was retired, by index in the list of couriers
+        self.delivered_orders = {} # the epoch at which each delivered order was retired, by position in the list of orders
+        self.dropped_orders = {} # the epoch at which each order left unassigned was retired, by position in the list of orders
+
+    def add_courier(self, i:int, t:int):
+        '''
+        Retire courier i at epoch t
+        '''
+        self.couriers[i] = t
+
+    def add_order(self, i:int, t:int, delivered:bool):
+        '''
+        Retire order i at epoch t, delivered or dropped
+        '''
+        if delivered:
+            self.delivered_orders[i] = t
+        else:
+            self.dropped_orders[i] = t
+
+    def summary(self) -> dict:
+        '''
+        Get the number of retired couriers, delivered orders and dropped orders
+        '''
+        return {'couriers': len(self.couriers), 'delivered_orders': len(self.delivered_orders), 'dropped_orders': len(self.dropped_orders)}
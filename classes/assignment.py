@@ -1,10 +1,13 @@
 from classes.route import Route
+from classes.traveltimematrix import TravelTimeMatrix
 
 # Import the config file
 from config import *
 x = X
 
 class Assignment():
+    __slots__ = ('assign_time', 'restaurant_id', 'pickup_time', 'courier', 'route', 'isfinal_flag', 'update_time', 'departure_time', 'departure_location')
+
     def __init__(self, assign_time:int , restaurant_id:str, courier:object, route:Route):
         '''
         Initialize an assignment
@@ -19,29 +22,19 @@ class Assignment():
         self.departure_time = 0 # the departure time of the courier to the restaurant
         self.departure_location = '' # the last position of the courier before assignment
 
-    def update(self, new_assignment, meters_per_minute, locations):
+    def update(self, new_assignment, travel_times:TravelTimeMatrix, x=x):
         '''
         Update the assignment with a new assignment.
         Combine orders in the new assignment with orders in the old assignment.
         '''
         for o in new_assignment.route.bundle: # for each order in the new assignment
-            n = len(self.route.bundle) # get the number of orders in the old assignment
-            min_route_cost = float('inf') # initialize the minimum route cost
-            best_pos = 0 # initialize the best position to insert the order
-            
-            for pos in range(n+1): # for each position to insert the order
-                self.route.bundle.insert(pos, o) # insert the order to the position
-                route_cost = self.route.get_route_cost(meters_per_minute, locations) # get the route cost of the new route
-                if route_cost < min_route_cost: # if the route cost is smaller than the minimum route cost
-                    min_route_cost = route_cost # update the minimum route cost
-                    best_pos = pos # update the best position to insert the order
-                self.route.bundle.pop(pos) # remove the order from the position
+            best_pos, _ = self.route.get_best_insertion(o, travel_times) # get the position with the smallest increase of the route cost
             self.route.bundle.insert(best_pos, o) # insert the order to the best position
         
         if new_assignment.isfinal_flag == 1: # if the new assignment is final (isfinal_flag = 1)
             self.isfinal_flag = 1 # set assignment as final
         else: # if the new assignment is tentative (isfinal_flag = 0)
-            if not self.is_no_order_long_ready_time(): # if there is no order that has been ready for x minutes
+            if not self.is_no_order_long_ready_time(x): # if there is no order that has been ready for x minutes
                 self.isfinal_flag = 1 # set assignment as final
             else: # if there is an order that has been ready for x minutes
                 self.isfinal_flag = 0 # set assignment as tentative
@@ -49,12 +42,12 @@ class Assignment():
         self.update_time +=1 # update the number of times the assignment is updated
         self.assign_time = new_assignment.assign_time # update the assign time
 
-    def is_no_order_long_ready_time(self, x=X) -> bool:
+    def is_no_order_long_ready_time(self, x=x) -> bool:
         '''
         Check that there is no order that has been ready for x minutes
         '''
+        route_ready_time = self.route.get_ready_time() # get the ready time of the route
         for o in self.route.bundle: # for each order in the route
-            route_ready_time = self.route.get_ready_time() # get the ready time of the route
             if route_ready_time - o.ready_time >= x: # if the ready time of the route is later than x minutes after the ready time of the order
                 return False # then return False
         return True # else return True
@@ -1,13 +1,56 @@
 class Courier(object):
-    def __init__(self, courier_information:dict):
+    '''
+    Courier class, a view on one row of a CourierStore
+    '''
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store, index:int):
         '''
         Initialize a courier
         '''
-        self.id = courier_information.get('courier') # courier id
-        self.x = courier_information.get('x') # courier x location
-        self.y = courier_information.get('y') # courier y location
-        self.on_time = courier_information.get('on_time') # courier on time
-        self.off_time = courier_information.get('off_time') # courier off time
-        self.assignments = [] # list of order assignments
-        self.next_available_time = self.on_time # the next time the courier is available (or the drop off time of the last order)
-        self.position_after_last_assignment = self.id # the position of the courier after the last assignment
+        self.store = store # the courier store
+        self.index = index # the row of the courier in the store
+
+    @property
+    def id(self):
+        return self.store.ids[self.index] # courier id
+
+    @property
+    def x(self):
+        return self.store.x[self.index].item() # courier x location
+
+    @property
+    def y(self):
+        return self.store.y[self.index].item() # courier y location
+
+    @property
+    def on_time(self):
+        return self.store.on_time[self.index].item() # courier on time
+
+    @property
+    def off_time(self):
+        return self.store.off_time[self.index].item() # courier off time
+
+    @property
+    def assignments(self):
+        return self.store.assignments[self.index] # list of order assignments
+
+    @assignments.setter
+    def assignments(self, value):
+        self.store.assignments[self.index] = value
+
+    @property
+    def next_available_time(self):
+        return self.store.next_available_time[self.index].item() # the next time the courier is available (or the drop off time of the last order)
+
+    @next_available_time.setter
+    def next_available_time(self, value):
+        self.store.next_available_time[self.index] = value
+
+    @property
+    def position_after_last_assignment(self):
+        return self.store.location_ids[self.store.position[self.index]] # the position of the courier after the last assignment
+
+    @position_after_last_assignment.setter
+    def position_after_last_assignment(self, value):
+        self.store.position[self.index] = self.store.location_index[value]
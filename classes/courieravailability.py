@@ -0,0 +1,138 @@
+import heapq
+import numpy as np
+
+class CourierAvailability(object):
+    def __init__(self, couriers:list):
+        '''
+        Initialize an index of the couriers that are idle before a given time.
+        Couriers that have not taken a bundle yet become idle at the start of their shift and are read from the couriers sorted by on time,
+        the others wait in a min-heap keyed on their next available time. A courier whose next available time is not before its off time
+        never becomes idle, and an idle courier stays idle until assign_bundle changes its next available time.
+        A courier is retired with retire once its shift is too close to its end for any bundle, and is then left out of the idle set.
+        '''
+        self.couriers = couriers
+        self.on_time = np.array([c.on_time for c in couriers], dtype=np.float64)
+        self.off_time = np.array([c.off_time for c in couriers], dtype=np.float64)
+        self.shift_order = np.argsort(self.on_time, kind='stable') # couriers by the start of their shift
+        self.shift_start = self.on_time[self.shift_order] # sorted on times
+        self.updated = [False]*len(couriers) # whether the next available time of each courier was changed by an assignment
+        self.known = [True]*len(couriers) # whether the shift of each courier is known, shifts are announced one by one in online mode
+        self.version = [0]*len(couriers) # number of changes of each courier, heap entries of older versions are stale
+        self.off_order = np.argsort(self.off_time, kind='stable') # couriers by the end of their shift
+        self.shift_end = self.off_time[self.off_order] # sorted off times
+        self.next_off = 0 # position in off_order of the next courier to retire
+        self.retired = [False]*len(couriers) # whether each courier is retired
+        self.reset()
+
+    def reset(self):
+        '''
+        Rebuild the index from the current next available time of every courier
+        '''
+        self.heap = [(self.couriers[i].next_available_time, i, self.version[i]) for i in range(len(self.couriers))
+                     if self.updated[i] and self.couriers[i].next_available_time < self.off_time[i]] # couriers that have taken a bundle
+        heapq.heapify(self.heap)
+        self.next_shift = 0 # position in shift_order of the next courier to start its shift
+        self.idle = set() # indices of the idle couriers
+        self.retired_idle = 0 # the number of retired couriers that would be idle, still counted by count_idle
+        self.started = [] # couriers that started their shift since the last call of get_started
+        self.until = -np.inf # the idle couriers are those available before this time
+
+    def make_idle(self, i:int):
+        '''
+        Add courier i to the idle set, or only count it if it is retired
+        '''
+        if self.retired[i]:
+            self.retired_idle += 1
+        else:
+            self.idle.add(i)
+
+    def advance(self, until:float):
+        '''
+        Move every courier that is available before until into the idle set
+        '''
+        if until < self.until: # the index only moves forward in time
+            self.reset()
+        self.until = until
+
+        while self.next_shift < len(self.shift_order) and self.shift_start[self.next_shift] < until: # couriers starting their shift
+            i = int(self.shift_order[self.next_shift])
+            self.next_shift += 1
+            if self.known[i] and not self.updated[i] and self.on_time[i] < self.off_time[i]:
+                self.make_idle(i)
+                self.started.append(i)
+
+        while self.heap and self.heap[0][0] < until: # couriers finishing their last bundle
+            _, i, version = heapq.heappop(self.heap)
+            if version == self.version[i]: # skip stale entries
+                self.make_idle(i)
+
+    def forget_shifts(self):
+        '''
+        Forget the shifts of all couriers, which are then announced with add_shift
+        '''
+        self.known = [False]*len(self.couriers)
+        self.reset()
+
+    def add_shift(self, i:int):
+        '''
+        Announce the shift of courier i, it is idle from its on time like the couriers known from the start
+        '''
+        self.known[i] = True
+        if not self.updated[i] and self.on_time[i] < self.until and self.on_time[i] < self.off_time[i]: # the shift started before the index time
+            self.make_idle(i)
+            self.started.append(i)
+
+    def retire(self, before:float) -> list:
+        '''
+        Retire the couriers whose shift ends before before and return them.
+        A retired courier leaves the idle set but is still counted by count_idle, so the bundle size does not change.
+        '''
+        retired = []
+        while self.next_off < len(self.off_order) and self.shift_end[self.next_off] < before:
+            i = int(self.off_order[self.next_off])
+            self.next_off += 1
+            self.retired[i] = True
+            if i in self.idle:
+                self.idle.discard(i)
+                self.retired_idle += 1
+            retired.append(i)
+        return retired
+
+    def get_started(self) -> list:
+        '''
+        Get the couriers that started their shift since the last call and are not retired
+        '''
+        started = [i for i in self.started if not self.retired[i]]
+        self.started = []
+        return started
+
+    def get_idle(self, until:float) -> list:
+        '''
+        Get the couriers available before until and before their off time, in the order of the couriers list
+        '''
+        self.advance(until)
+
+        return [self.couriers[i] for i in sorted(self.idle)]
+
+    def count_idle(self, until:float) -> int:
+        '''
+        Get the number of couriers available before until and before their off time, retired couriers included
+        '''
+        self.advance(until)
+
+        return len(self.idle) + self.retired_idle
+
+    def update(self, i:int):
+        '''
+        Update the index after the next available time of courier i has changed
+        '''
+        self.updated[i] = True
+        self.version[i] += 1
+        self.idle.discard(i)
+
+        next_available_time = self.couriers[i].next_available_time
+        if next_available_time < self.off_time[i]: # the courier becomes idle again before its shift ends
+            if next_available_time < self.until:
+                self.make_idle(i)
+            else:
+                heapq.heappush(self.heap, (next_available_time, i, self.version[i]))
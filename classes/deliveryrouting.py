@@ -1,43 +1,97 @@
+import bisect
 from collections import defaultdict
 import copy
+import heapq
 import numpy as np
 from typing import Tuple
+from classes.archive import Archive
 from classes.assignment import Assignment
 from classes.courier import Courier
+from classes.courieravailability import CourierAvailability
+from classes.eventcalendar import EventCalendar
+from classes.instancecontext import InstanceContext
+from classes.localsearch import LocalSearch
 from classes.order import Order
-from classes.route import Route
-from functions.read_instance_information import read_instance_information
+from classes.parameters import Parameters
+from classes.profiler import null_profiler
+from classes.route import Route, batch_insertion
+from classes.solutionsink import SolutionSink
+from classes.spatialindex import CourierGrid
+from classes.store import CourierStore, OrderStore
 
 # Import the config file
 from config import *
-f_minute = F_MINUTE
-commitment_strategy = COMMITMENT_STRATEGY
+batched_construction = BATCHED_CONSTRUCTION
+candidate_radius = CANDIDATE_RADIUS
+candidate_k = CANDIDATE_K
+spatial_cell_minutes = SPATIAL_CELL_MINUTES
+archive_assignments = ARCHIVE_ASSIGNMENTS
 
 class DeliveryRouting:
-    def __init__(self, instance_dir:str):
+    def __init__(self, instance_dir:str = None, params:Parameters = None, context:InstanceContext = None, sink:SolutionSink = None):
         '''
-        Initialize a delivery routing problem
+        Initialize a delivery routing problem, with the parameters in config.py if params is not given.
+        The instance data is read from instance_dir, or taken from context, which can be shared by many runs on the same instance.
+        If sink is given, the records of every assignment are written to it once the assignment is final.
         '''
+        self.params = params if params is not None else Parameters() # the parameters of the run
+        self.context = context if context is not None else InstanceContext(instance_dir) # everything about the instance that does not depend on the parameters
 
-        orders, restaurants, couriers, instanceparams, locations ,\
         self.meters_per_minute, self.pickup_service_minutes, self.dropoff_service_minutes, \
             self.target_click_to_door, self.pay_per_order,\
-            self.guaranteed_pay_per_hour = read_instance_information(instance_dir) # read instance information from the instance directory
+            self.guaranteed_pay_per_hour = self.context.meters_per_minute, self.context.pickup_service_minutes, self.context.dropoff_service_minutes,\
+                self.context.target_click_to_door, self.context.pay_per_order, self.context.guaranteed_pay_per_hour # instance parameters
+
+        # Decision epochs
+        self.f = self.params.f_minute # every f minutes solves a matching problem
+        self.delta_u = self.params.delta_u # the assignment horizon
+        self.commitment_strategy = self.params.commitment_strategy # 0: no commitment, 1: commitment
+        self.horizon = self.context.horizon # the decision epochs run up to this time
+        self.matching_times = {} # the time in seconds spent solving the matching problem at each decision epoch
+        self.profiler = null_profiler # records the phases of each decision epoch, a TickProfiler when the run is profiled
+        self.epoch_latencies = {} # the time in seconds from the start of each decision epoch to its assignments in online mode
+        self.final_result = {} # the routes built at each decision epoch grouped by restaurant, as they were before the matching
+
+        # Locations
+        self.locations = self.context.locations
+        self.travel_times = self.context.travel_times # travel time between every pair of locations, computed once per instance
 
         # Orders
-        self.orders = [Order(order) for order in orders.to_dict(orient = 'records')] # convert orders to Order class
-        self.orders = sorted(self.orders, key = lambda x: x.id) # sort orders by id
-        self.unassigned_orders = self.copy(self.orders) # unassigned orders
-        self.orders_by_horizon_interval = defaultdict(list)
+        self.order_store = OrderStore(self.context.order_data) # the outcomes of the run on the shared static order data
+        self.orders = [Order(self.order_store, int(i)) for i in self.context.order_rows] # an Order view on each row of the store, sorted by id
+        self.orders_by_horizon_interval = defaultdict(list) # orders of each decision epoch
+        self.horizon_buckets = {} # indices in self.orders of the orders of each decision epoch
+        self.orders_by_restaurant_at_t = {} # orders of each decision epoch grouped by restaurant
+        self.in_flight = [] # (dropoff time, row in the order store) of the orders of final assignments that are not retired yet, a min-heap
+        self.online = False # whether the orders and couriers are revealed one by one
 
         # Restaurants
-        self.restaurants = restaurants # set restaurants in the problem
+        self.restaurants = self.context.restaurants # set restaurants in the problem
+        self.restaurant_rank = self.context.restaurant_rank # position of each restaurant in the restaurants file
         
         # Couriers
-        self.couriers = [Courier(courier) for courier in couriers.to_dict(orient = 'records')] # convert couriers to Courier class
-        
-        # Locations
-        self.locations = locations
+        self.courier_store = CourierStore(self.context.courier_data) # the state of the run on the shared static courier data
+        self.couriers = [Courier(self.courier_store, i) for i in range(len(self.courier_store.ids))] # a Courier view on each row of the store
+        self.courier_index = {c.id: i for i, c in enumerate(self.couriers)} # position of each courier in the list of couriers
+        self.courier_availability = CourierAvailability(self.couriers) # idle couriers by next available time
+
+        self.tentative_couriers = set() # indices of the couriers whose last assignment is not final
+
+        # Courier positions
+        self.courier_grid = CourierGrid(self.locations, self.travel_times, spatial_cell_minutes) # on shift couriers by the grid cell of their position after the last assignment, added when their shift starts
+
+        # Retired couriers and orders
+        self.archive = Archive(archive_assignments) # couriers and orders the decision epochs no longer need
+
+        # Bundle construction
+        self.batched_construction = batched_construction # score all bundle and position candidates of a restaurant at once
+
+        # Local search
+        self.local_search_engine = LocalSearch(self.travel_times) # relocate and exchange moves between the routes of a restaurant
+
+        # Solution output
+        self.sink = sink # where the final assignments are written during the run
+        self.emitted_assignments = [0]*len(self.couriers) # the number of assignments of each courier written to the sink
     
 
     def travel_time(self, origin_id:str, destination_id:str):
@@ -50,12 +104,14 @@ class DeliveryRouting:
             float: The travel time between the origin and destination in minutes.
         """
 
-        dist = np.sqrt((self.locations.at[destination_id, 'x'] - self.locations.at[origin_id, 'x'])**2\
-                    + (self.locations.at[destination_id, 'y'] - self.locations.at[origin_id, 'y'])**2) # calculate the distance between the origin and the destination
-        
-        tt = np.ceil(dist/self.meters_per_minute) # calculate the travel time between the origin and the destination
-        
-        return tt
+        return self.travel_times.travel_time(origin_id, destination_id) # look up the travel time between the origin and the destination
+
+    @property
+    def unassigned_orders(self) -> list:
+        '''
+        Orders that have not been assigned to a courier
+        '''
+        return [o for o in self.orders if self.order_store.courier[o.index] < 0]
 
     def copy(self, x):
         '''
@@ -67,16 +123,101 @@ class DeliveryRouting:
     def get_ready_orders(self) -> dict:
         '''
         This function return orders which have ready time fall into the corresponding horizon.
-        This function should be run only once.
+        This function should be run only once, use rebucket to change f or delta_u afterwards.
         '''
-        t_list = [*range(0, 24*60+1, self.f)] # initiate the starting time of each interval
-        
-        for i in range(1, len(t_list)): # loop through each interval
-            for o in self.orders: # loop through each order
-                if o.placement_time < t_list[i] and o.placement_time >= t_list[i-1] and o.ready_time < t_list[i] + self.delta_u: # if the order placement time is within the interval and the order is ready within the assignemnt horizon
-                    self.orders_by_horizon_interval[t_list[i]].append(o) # append the order to the corresponding horizon
-                if o.placement_time < t_list[i] and o.placement_time >= t_list[i-1] and o.ready_time >= t_list[i] + self.delta_u: # if the order placement time is within the interval but the order is ready after the assignemnt horizon
-                    self.orders_by_horizon_interval[t_list[i] + self.f * np.ceil((o.ready_time - (t_list[i] + self.delta_u))/self.f)].append(o) # append the order to a future horizon in which the order is ready.
+        self.rebucket(self.f, self.delta_u)
+
+        return self.orders_by_horizon_interval
+
+    def rebucket(self, f_minute:int, delta_u:int):
+        '''
+        Assign every order to the decision epoch at which it is first considered, in one pass over the orders.
+        An order placed in [t-f, t) goes to epoch t if it is ready within the assignment horizon t + delta_u,
+        otherwise to the first later epoch t + f*ceil((ready_time - t - delta_u)/f) in which it is.
+        '''
+        self.f = f_minute
+        self.delta_u = delta_u
+        horizon_buckets, restaurant_buckets = self.context.get_buckets(self.f, self.delta_u) # positions in self.orders of the orders of each epoch, shared by the runs with the same f and delta_u
+        self.horizon_buckets = dict(horizon_buckets) # retire drops the solved epochs, the shared buckets are kept
+
+        self.orders_by_horizon_interval = defaultdict(list)
+        for k, v in self.horizon_buckets.items():
+            self.orders_by_horizon_interval[k] = [self.orders[i] for i in v] # orders of each epoch
+        self.orders_by_restaurant_at_t = {k: {r_id: [self.orders[i] for i in group] for r_id, group in v.items()} for k, v in restaurant_buckets.items()} # orders of each epoch by restaurant
+
+    def group_orders_by_restaurant(self, orders:list) -> dict:
+        '''
+        Group orders by restaurant. Restaurants are in the order of the restaurants file and the orders of a restaurant keep their order in the list.
+        Orders of restaurants that are not in the restaurants file are left out.
+        '''
+        orders_by_restaurant = {}
+        for o in sorted((o for o in orders if o.restaurant_id in self.restaurant_rank), key = lambda o: self.restaurant_rank[o.restaurant_id]): # stable sort by restaurant
+            orders_by_restaurant.setdefault(o.restaurant_id, []).append(o)
+        return orders_by_restaurant
+
+    def get_ready_orders_by_restaurant_at_t(self, t) -> dict:
+        '''
+        Get the orders of the decision epoch t grouped by restaurant
+        '''
+        if t not in self.orders_by_restaurant_at_t and self.orders_by_horizon_interval.get(t): # an epoch that got orders in online mode
+            self.orders_by_restaurant_at_t[t] = self.group_orders_by_restaurant(self.orders_by_horizon_interval[t])
+        return self.orders_by_restaurant_at_t.get(t, {})
+
+    def start_online(self):
+        '''
+        Forget the orders and the courier shifts of the instance, they are revealed one by one with add_order and add_courier
+        '''
+        self.orders_by_horizon_interval = defaultdict(list)
+        self.horizon_buckets = {}
+        self.orders_by_restaurant_at_t = {}
+        self.order_position = {o.id: i for i, o in enumerate(self.orders)} # position of each order in the list of orders
+        self.courier_availability.forget_shifts()
+        self.online = True
+
+    def add_order(self, order_id:str, not_before:int = 0):
+        '''
+        Reveal an order in online mode, returning the decision epoch it goes to or None if it is placed before the day starts.
+        It goes to the same epoch as in get_ready_orders, or to not_before if that epoch has already been solved.
+        Orders of an epoch keep the order get_ready_orders gives them.
+        '''
+        i = self.order_position[order_id]
+        o = self.orders[i]
+        if o.placement_time < 0:
+            return None
+        t_placement = (int(np.floor(o.placement_time/self.f)) + 1)*self.f # the first epoch after the placement of the order
+        t = max(t_placement + self.f*max(0, int(np.ceil((o.ready_time - t_placement - self.delta_u)/self.f))), not_before)
+
+        bisect.insort(self.orders_by_horizon_interval[t], o, key = lambda x: (x.placement_time//self.f, self.order_position[x.id]))
+        self.horizon_buckets[t] = np.array([self.order_position[x.id] for x in self.orders_by_horizon_interval[t]], dtype=np.intp)
+        self.orders_by_restaurant_at_t.pop(t, None) # grouped again when the epoch is solved
+        return t
+
+    def add_courier(self, courier_id:str):
+        '''
+        Reveal the shift of a courier in online mode, the courier is idle from its on time
+        '''
+        self.courier_availability.add_shift(self.courier_index[courier_id])
+
+    def get_retire_epoch(self, courier_id:str) -> int:
+        '''
+        Get the first decision epoch at which retire takes a courier out
+        '''
+        courier = self.couriers[self.courier_index[courier_id]]
+        earliest_arrival = self.f + (self.dropoff_service_minutes + self.pickup_service_minutes)/2 # after the epoch, as in retire
+        return max(0, (int((courier.off_time - earliest_arrival)//self.f) + 1)*self.f)
+
+    def get_calendar(self) -> EventCalendar:
+        '''
+        Get an event calendar with the release of every order bucket and the end of every shift known so far
+        '''
+        calendar = EventCalendar(self.f, self.horizon)
+        for t, orders in self.orders_by_horizon_interval.items():
+            if orders:
+                calendar.schedule(t, 'orders')
+        for i, c in enumerate(self.couriers):
+            if self.courier_availability.known[i]:
+                calendar.schedule(self.get_retire_epoch(c.id), 'shift_end')
+        return calendar
 
     def get_ready_orders_at_t(self, t):
         '''
@@ -89,19 +230,17 @@ class DeliveryRouting:
         '''
         Get idle couriers at time t
         '''
-        idle_courier = [] # initiate a list of idle couriers
-
-        for c in self.couriers: # loop through each courier
-            if c.next_available_time < t + self.delta_u and c.next_available_time < c.off_time : # if the courier is next available within the assignment horizon and the courier is not off duty
-                idle_courier.append(c) # append the courier to the list of idle couriers
-        return idle_courier # return the list of idle couriers
+        idle_couriers = self.courier_availability.get_idle(t + self.delta_u) # couriers next available within the assignment horizon and not off duty
+        for i in self.courier_availability.get_started(): # couriers that started their shift join the grid
+            self.courier_grid.update(self.couriers[i].id, self.couriers[i].position_after_last_assignment)
+        return idle_couriers
 
     def get_bundle_size(self, t) -> int :
         '''
         Get the bundle size at time t
         '''
         number_of_orders = len(self.get_ready_orders_at_t(t)) # get the number of orders ready at time t
-        number_of_couriers = len(self.get_idle_courier_at_t(t)) # get the number of idle couriers at time t
+        number_of_couriers = self.courier_availability.count_idle(t + self.delta_u) # get the number of idle couriers at time t
         
         if number_of_couriers == 0: # if there are no idle couriers
             bundle_size = 2 # default value of bundle size
@@ -136,6 +275,77 @@ class DeliveryRouting:
         
         return True # otherwise the courier can take the bundle
 
+    def get_assignment_matrices(self, t, routes:list, couriers:list) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        Build the feasibility mask and the pickup delay of every route and courier pair in one pass.
+        feasible[i, j] applies the same rules as can_assign to route i and courier j, and cost[i, j] is the pickup delay
+        of the bundle of route i if courier j takes it. A courier idle since before t leaves at t, as in can_assign and assign_bundle,
+        so the delay of a courier that has been waiting is not undercounted.
+        '''
+        if not routes or not couriers:
+            return np.zeros((len(routes), len(couriers)), dtype=bool), np.zeros((len(routes), len(couriers)))
+
+        index = self.travel_times.index
+        route_ready_time = np.array([route.get_ready_time() for route in routes], dtype=np.float64) # the ready time of each bundle
+        route_restaurant = np.array([index[route.restaurant_id] for route in routes]) # the location index of the restaurant of each bundle
+
+        courier_rows = np.fromiter((c.index for c in couriers), dtype=np.intp, count=len(couriers)) # rows of the couriers in the courier store
+        on_time = self.courier_store.on_time[courier_rows].astype(np.float64)
+        off_time = self.courier_store.off_time[courier_rows].astype(np.float64)
+        next_available_time = self.courier_store.next_available_time[courier_rows]
+        courier_position = self.courier_store.position[courier_rows] # the location index of each courier after its last assignment
+        tentative_restaurant = np.array([index[c.assignments[-1].restaurant_id] if c.assignments and c.assignments[-1].isfinal_flag == 0 else -1
+                                         for c in couriers]) # the restaurant of the last bundle of each courier if it is not final, -1 otherwise
+
+        travel_time = self.travel_times.matrix[np.ix_(courier_position, route_restaurant)].T +\
+                       self.pickup_service_minutes/2 # time from the departure of each courier to its arrival at the restaurant of each bundle, from its position after the last assignment
+        arrival_time = (np.maximum(t, next_available_time) + self.dropoff_service_minutes/2)[np.newaxis, :] + travel_time # arrival time of each courier at the restaurant of each bundle
+
+        feasible = (route_ready_time[:, np.newaxis] >= on_time[np.newaxis, :]) &\
+                    (route_ready_time[:, np.newaxis] <= off_time[np.newaxis, :]) &\
+                     (arrival_time <= off_time[np.newaxis, :]) &\
+                      ((tentative_restaurant[np.newaxis, :] == -1) | (tentative_restaurant[np.newaxis, :] == route_restaurant[:, np.newaxis])) # the same rules as can_assign
+        cost = np.maximum(0, arrival_time - route_ready_time[:, np.newaxis]) # pickup delay of each pair, from the same arrival time as assign_bundle
+
+        return feasible, cost
+
+    def get_candidate_mask(self, routes:list, couriers:list, pruning:str, radius:float = candidate_radius, k:int = candidate_k) -> np.ndarray:
+        '''
+        Get the route and courier pairs the matching step considers, looked up in the courier grid.
+        With pruning 'radius' a route only considers the couriers within radius minutes of its restaurant,
+        with 'knn' the k couriers nearest to it, and with 'none' every courier.
+        '''
+        mask = np.zeros((len(routes), len(couriers)), dtype=bool)
+        if pruning == 'none':
+            mask[:] = True
+            return mask
+
+        members = {c.id: j for j, c in enumerate(couriers)} # column of each courier
+        candidates = {} # candidate columns of each restaurant, shared by its routes
+        for i, route in enumerate(routes):
+            if route.restaurant_id not in candidates:
+                if pruning == 'radius':
+                    candidates[route.restaurant_id] = self.courier_grid.within_radius(route.restaurant_id, radius, members)
+                elif pruning == 'knn':
+                    candidates[route.restaurant_id] = self.courier_grid.nearest(route.restaurant_id, k, members)
+                else:
+                    raise ValueError("pruning must be 'none', 'radius' or 'knn', got {}".format(pruning))
+            mask[i, candidates[route.restaurant_id]] = True
+
+        return mask
+
+    def update_courier_after_last_assignment(self, courier:Courier):
+        '''
+        Set the next available time and the position of a courier from its last assignment, and move it in the courier grid
+        '''
+        courier.next_available_time = courier.assignments[-1].pickup_time + self.pickup_service_minutes/2 +\
+                                        courier.assignments[-1].route.get_total_travel_time(self.travel_times) +\
+                                         self.dropoff_service_minutes*(len(courier.assignments[-1].route.bundle) - 1) +\
+                                          self.dropoff_service_minutes/2 # set the next available time of the courier to the pickup time plus the pickup service time divided by 2 plus the total travel time of the bundle, and the dropoff service time multiplied by the number of orders in the bundle minus 1, and the dropoff service time divided by 2
+        courier.position_after_last_assignment = courier.assignments[-1].route.get_end_position() # set the position after the last assignment of the courier to the end position of the bundle
+        self.courier_grid.update(courier.id, courier.position_after_last_assignment) # move the courier to the cell of its new position
+        self.courier_availability.update(self.courier_index[courier.id]) # the courier is idle again at its new next available time
+
     def assign_bundle(self, t:int, courier:Courier, route:Route):
         '''
         Assign a bundle to a courier
@@ -173,22 +383,17 @@ class DeliveryRouting:
         # If the courier, c, can reach the restaurant, r, before time t + f, and all orders in the bundle, b, are estimated to be ready by t + f,
         # Then make a final commitment of the courier to the bundle - instruct the courer to travel to the restaurant, pick up and deliver the orders in the bundle.
 
-        if (arrival_time <= t + f_minute and route_ready_time <= t + f_minute) or\
-           (route_ready_time <= t + f_minute and route_ready_time <= arrival_time): # if the arrival time is before the current time plus f minutes and the ready time of the bundle is before the current time plus f minutes and the ready time of the bundle is before the arrival time
+        if (arrival_time <= t + self.f and route_ready_time <= t + self.f) or\
+           (route_ready_time <= t + self.f and route_ready_time <= arrival_time): # if the arrival time is before the current time plus f minutes and the ready time of the bundle is before the current time plus f minutes and the ready time of the bundle is before the arrival time
             
             assignment.isfinal_flag = 1 # set the isfinal flag of the assignment to 1
             
             if len(courier.assignments) > 0: # if the courier has taken at least one bundle
                 if courier.assignments[-1].isfinal_flag == 0: # if the last assignment is not final
 
-                    courier.assignments[-1].update(assignment, self.meters_per_minute, self.locations) # update the last assignment of the courier with the new assignment
+                    courier.assignments[-1].update(assignment, self.travel_times, self.params.x) # update the last assignment of the courier with the new assignment
                     courier.assignments[-1].pickup_time = max(arrival_time, courier.assignments[-1].route.get_ready_time()) # set the pickup time of the last assignment to the maximum of the arrival time and the ready time of the bundle
-                    courier.next_available_time = courier.assignments[-1].pickup_time + self.pickup_service_minutes/2 +\
-                                                    courier.assignments[-1].route.get_total_travel_time(self.meters_per_minute,self.locations) +\
-                                                     self.dropoff_service_minutes*(len(courier.assignments[-1].route.bundle) - 1) +\
-                                                      self.dropoff_service_minutes/2 # set the next available time of the courier to the pickup time plus the pickup service time divided by 2 plus the total travel time of the bundle, and the dropoff service time multiplied by the number of orders in the bundle minus 1, and the dropoff service time divided by 2
-                    
-                    courier.position_after_last_assignment = courier.assignments[-1].route.get_end_position(self.meters_per_minute, self.locations) # set the position after the last assignment of the courier to the end position of the bundle
+                    self.update_courier_after_last_assignment(courier) # set the next available time and the position of the courier from its last assignment
                     
                     for i, order in enumerate(courier.assignments[-1].route.bundle): # loop through each order in the bundle
                         order.pickup_time = pickup_time # set the pickup time of the order to the pickup time calculated above
@@ -206,37 +411,25 @@ class DeliveryRouting:
                 
                 else: # if the last assignment is final
                     courier.assignments.append(assignment) # append the assignment to the courier's assignments
-                    courier.next_available_time = courier.assignments[-1].pickup_time +  self.pickup_service_minutes/2 +\
-                                                    courier.assignments[-1].route.get_total_travel_time(self.meters_per_minute, self.locations) +\
-                                                    self.dropoff_service_minutes*(len(courier.assignments[-1].route.bundle) -1) +\
-                                                    self.dropoff_service_minutes/2 # set the next available time of the courier to the pickup time plus the pickup service time divided by 2 plus the total travel time of the bundle, and the dropoff service time multiplied by the number of orders in the bundle minus 1, and the dropoff service time divided by 2
-                    courier.position_after_last_assignment = courier.assignments[-1].route.get_end_position(self.meters_per_minute,self.locations) # set the position after the last assignment of the courier to the end position of the bundle
+                    self.update_courier_after_last_assignment(courier) # set the next available time and the position of the courier from its last assignment
             
             else: # if the courier has not taken any bundles
                 courier.assignments.append(assignment) # append the assignment to the courier's assignments
-                courier.next_available_time = courier.assignments[-1].pickup_time +  self.pickup_service_minutes/2 +\
-                                                    courier.assignments[-1].route.get_total_travel_time(self.meters_per_minute, self.locations) +\
-                                                    self.dropoff_service_minutes*(len(courier.assignments[-1].route.bundle) -1) +\
-                                                    self.dropoff_service_minutes/2 # set the next available time of the courier to the pickup time plus the pickup service time divided by 2 plus the total travel time of the bundle, and the dropoff service time multiplied by the number of orders in the bundle minus 1, and the dropoff service time divided by 2
-                courier.position_after_last_assignment = courier.assignments[-1].route.get_end_position(self.meters_per_minute,self.locations) # set the position after the last assignment of the courier to the end position of the bundle
+                self.update_courier_after_last_assignment(courier) # set the next available time and the position of the courier from its last assignment
         
         else: # if the courier is not available
-            if commitment_strategy == 0: # if the commitment strategy is 0
+            if self.commitment_strategy == 0: # if the commitment strategy is 0
                 assignment.isfinal_flag = 1 # set the isfinal flag of the assignment to 1
             else: # if the commitment strategy is not 0
                 assignment.isfinal_flag = 0 # set the isfinal flag of the assignment to 0
             
             if len(courier.assignments) > 0: # if the courier has taken at least one bundle
                 if courier.assignments[-1].isfinal_flag == 0: # if the last assignment is not final
-                    courier.assignments[-1].update(assignment, self.meters_per_minute, self.locations) # update the last assignment of the courier
+                    courier.assignments[-1].update(assignment, self.travel_times, self.params.x) # update the last assignment of the courier
                     courier.assignments[-1].pickup_time = max(arrival_time, courier.assignments[-1].route.get_ready_time()) # set the pickup time of the last assignment of the courier to the maximum of the arrival time and the ready time of the bundle
                     
                     if courier.assignments[-1].isfinal_flag == 1: # if the last assignment is final
-                        courier.next_available_time = courier.assignments[-1].pickup_time +  self.pickup_service_minutes/2 +\
-                                                        courier.assignments[-1].route.get_total_travel_time(self.meters_per_minute,self.locations) +\
-                                                        self.dropoff_service_minutes*(len(courier.assignments[-1].route.bundle) -1) +\
-                                                        self.dropoff_service_minutes/2 # set the next available time of the courier to the pickup time plus the pickup service time divided by 2 plus the total travel time of the bundle, and the dropoff service time multiplied by the number of orders in the bundle minus 1, and the dropoff service time divided by 2
-                        courier.position_after_last_assignment = courier.assignments[-1].route.get_end_position(self.meters_per_minute,self.locations) # set the position after the last assignment of the courier to the end position of the bundle
+                        self.update_courier_after_last_assignment(courier) # set the next available time and the position of the courier from its last assignment
                     else: # if the last assignment is not final
                         pass # do nothing
                     
@@ -257,23 +450,156 @@ class DeliveryRouting:
                 else: # if the last assignment can not be updated
                     courier.assignments.append(assignment) # append the assignment to the courier's assignments
                     if courier.assignments[-1].isfinal_flag == 1: # if the last assignment is final
-                        courier.next_available_time = courier.assignments[-1].pickup_time +  self.pickup_service_minutes/2 +\
-                                                        courier.assignments[-1].route.get_total_travel_time(self.meters_per_minute, self.locations) +\
-                                                        self.dropoff_service_minutes*(len(courier.assignments[-1].route.bundle)-1) +\
-                                                        self.dropoff_service_minutes/2 # set the next available time of the courier to the pickup time plus the pickup service time divided by 2 plus the total travel time of the bundle, and the dropoff service time multiplied by the number of orders in the bundle minus 1, and the dropoff service time divided by 2
-                        courier.position_after_last_assignment = courier.assignments[-1].route.get_end_position(self.meters_per_minute, self.locations) # set the position after the last assignment of the courier to the end position of the bundle
+                        self.update_courier_after_last_assignment(courier) # set the next available time and the position of the courier from its last assignment
             else: 
                 courier.assignments.append(assignment) # append the assignment to the courier's assignments
                 if courier.assignments[-1].isfinal_flag == 1: # if the last assignment is final
-                    courier.next_available_time = courier.assignments[-1].pickup_time +  self.pickup_service_minutes/2 +\
-                                                    courier.assignments[-1].route.get_total_travel_time(self.meters_per_minute, self.locations) +\
-                                                    self.dropoff_service_minutes*(len(courier.assignments[-1].route.bundle) -1) +\
-                                                    self.dropoff_service_minutes/2 # set the next available time of the courier to the pickup time plus the pickup service time divided by 2 plus the total travel time of the bundle, and the dropoff service time multiplied by the number of orders in the bundle minus 1, and the dropoff service time divided by 2
-                    courier.position_after_last_assignment = courier.assignments[-1].route.get_end_position(self.meters_per_minute,self.locations) # set the position after the last assignment of the courier to the end position of the bundle
+                    self.update_courier_after_last_assignment(courier) # set the next available time and the position of the courier from its last assignment
+
+        c_index = self.courier_index[courier.id]
+        if courier.assignments[-1].isfinal_flag == 1: # only the last assignment of the courier can have become final
+            self.tentative_couriers.discard(c_index)
+            for o in courier.assignments[-1].route.bundle: # its orders are in flight until they are delivered
+                heapq.heappush(self.in_flight, (o.dropoff_time, o.index))
+            if self.sink is not None:
+                self.emit_assignments(courier, self.sink, final_only=True)
+        else:
+            self.tentative_couriers.add(c_index)
 
-    def initialization(self, t:int, ready_orders:list, idle_couriers:list, bundle_size:int):
+    def emit_assignments(self, courier:Courier, sink:SolutionSink, final_only:bool = False):
+        '''
+        Write the assignments of a courier that are not written yet to a sink, stopping at the first tentative one if final_only
+        '''
+        c_index = self.courier_index[courier.id]
+        for a in courier.assignments[self.emitted_assignments[c_index]:]:
+            if final_only and a.isfinal_flag != 1:
+                break
+            self.write_assignment(courier, a, sink)
+            self.emitted_assignments[c_index] += 1
+
+    def write_assignment(self, courier:Courier, assignment:Assignment, sink:SolutionSink):
+        '''
+        Write the records of an assignment to a sink: the assignment, the orders of its bundle and the moves of its courier,
+        the journey to the restaurant and from there to each order of the bundle
+        '''
+        assignment_id = sink.write_assignment(assignment.assign_time, assignment.pickup_time, courier.id, [o.id for o in assignment.route.bundle])
+
+        # journey from courier's location/last assignment's last location to the restaurant of the assignment
+        sink.write_move(courier.id, assignment.departure_time, assignment.departure_location, assignment.restaurant_id, assignment_id)
+
+        # journey from restaurant to the last order's location
+        departure_time = assignment.pickup_time + self.pickup_service_minutes/2
+        origin_id = assignment.restaurant_id
+        for o in assignment.route.bundle:
+            sink.write_move(courier.id, departure_time, origin_id, o.id, assignment_id)
+            sink.write_order(o.id, o.placement_time, o.ready_time, o.pickup_time, o.dropoff_time, o.courier_id)
+            departure_time += self.travel_time(origin_id, o.id) + self.dropoff_service_minutes
+            origin_id = o.id
+
+    def close_sink(self):
+        '''
+        Write the assignments that are still tentative at the end of the run and close the sink
+        '''
+        if self.sink is None:
+            return
+        for i in sorted(self.tentative_couriers): # the other couriers have written every assignment
+            self.emit_assignments(self.couriers[i], self.sink)
+        self.sink.close()
+
+    def retire(self, t:int):
+        '''
+        Move to the archive what the decision epochs after t no longer need: the couriers whose shift ends before they could reach any restaurant,
+        the orders delivered by t and the orders of epoch t left unassigned, and drop the buckets of epoch t.
+        This keeps the idle set, the courier grid and the buckets at the size of the live load, rebucket builds the buckets of every epoch again.
+        '''
+        earliest_arrival = t + self.f + (self.dropoff_service_minutes + self.pickup_service_minutes)/2 # no courier reaches a restaurant earlier in a later epoch
+        for i in self.courier_availability.retire(earliest_arrival):
+            courier = self.couriers[i]
+            self.courier_grid.remove(courier.id)
+            self.archive.add_courier(i, t)
+            if not self.archive.keep_assignments and self.sink is not None and i not in self.tentative_couriers: # every assignment of the courier is written
+                courier.assignments = []
+                self.emitted_assignments[i] = 0
+
+        for o in self.orders_by_horizon_interval.get(t, []):
+            if self.order_store.courier[o.index] < 0: # never considered again
+                self.archive.add_order(o.index, t, delivered=False)
+        while self.in_flight and self.in_flight[0][0] <= t:
+            _, i = heapq.heappop(self.in_flight)
+            self.archive.add_order(i, t, delivered=True)
+
+        # the epoch is solved, no order is added to it any more
+        self.orders_by_horizon_interval.pop(t, None)
+        self.horizon_buckets.pop(t, None)
+        self.orders_by_restaurant_at_t.pop(t, None)
+
+    def get_best_batch_insertion(self, routes:list, order:Order, bundle_size:int) -> Tuple[int, int]:
+        '''
+        Get the best bundle and the best position in it to insert an order, scoring every bundle and position candidate
+        of a restaurant in one array operation. A bundle that is already full only takes the order if its efficiency improves.
+        '''
+        route_index, pos, cost_increase, new_travel_time = batch_insertion(routes, order, self.travel_times) # score every candidate
+
+        starts = np.flatnonzero(pos == 0) # first candidate of each bundle
+        n = np.diff(np.append(starts, len(pos))) - 1 # number of orders in each bundle
+        min_cost_increase = np.minimum.reduceat(cost_increase, starts) # smallest cost increase in each bundle
+        is_min = np.flatnonzero(cost_increase == min_cost_increase[route_index]) # candidates with the smallest cost increase of their bundle
+        best = is_min[np.unique(route_index[is_min], return_index=True)[1]] # first best position of each bundle
+
+        current_travel_time = np.array([route.get_total_travel_time(self.travel_times) for route in routes], dtype=np.float64)
+        current_efficiency = np.divide(n, current_travel_time, out=np.full(len(routes), np.inf), where=current_travel_time > 0) # get the current efficiency of each bundle
+        new_efficiency = np.divide(n+1, new_travel_time[best], out=np.full(len(routes), np.inf), where=new_travel_time[best] > 0) # get the new efficiency of each bundle
+        can_take = (n + 1 <= bundle_size) | (current_efficiency < new_efficiency) # a full bundle only takes the order if its efficiency improves
+
+        best_i = int(np.argmin(np.where(can_take, min_cost_increase, np.inf))) # first bundle with the smallest cost increase
+        best_i_pos = int(pos[best[best_i]])
+
+        return best_i, best_i_pos
+
+    def build_restaurant_routes(self, r_id:str, r_order:list, bundle_size:int) -> list:
+        '''
+        Assign the ready orders of one restaurant into bundles of about bundle_size orders.
+        Only the static order data and the travel times are used, so the restaurants of a decision epoch can be built in any order or process.
+        '''
+        number_of_bundle = int(np.ceil(len(r_order)/bundle_size)) # get the number of bundles for the restaurant by rounding up the number of orders divided by the bundle size
+        set_of_bundles = [Route([], r_id, self.params.beta, self.params.gamma) for _ in range(number_of_bundle)] # Initiate a list of empty routes for the restaurant
+        
+        # Assign orders into bundels:
+        for o in r_order: # for each order
+            if self.batched_construction: # if all candidates are scored at once
+                best_i, best_i_pos = self.get_best_batch_insertion(set_of_bundles, o, bundle_size) # get the best bundle and the best position in it
+                set_of_bundles[best_i].bundle.insert(best_i_pos, o) # insert the order into the best bundle at the best position
+                continue
+
+            min_cost_increase = float('inf') # Initiate the minimum cost increase to infinity
+
+            for i in range(number_of_bundle): # for each bundle
+                route = set_of_bundles[i]
+                n = len(route.bundle) # get the number of orders in the bundle
+                best_pos, cost_increase = route.get_best_insertion(o, self.travel_times) # get the best position in the bundle and the cost increase of inserting the order there
+
+                if n + 1 > bundle_size: # if the number of orders in the bundle plus 1 is greater than the bundle size
+                    current_travel_time = route.get_total_travel_time(self.travel_times) # get the current travel time of the bundle
+                    new_travel_time = route.insertion_travel_time(o, best_pos, self.travel_times) # get the travel time of the bundle with the order at the best position
+                    current_efficiency = n/current_travel_time if current_travel_time > 0 else float('inf') # get the current efficiency of the bundle
+                    new_efficiency = (n+1)/new_travel_time if new_travel_time > 0 else float('inf') # get the new efficiency of the bundle
+
+                    if current_efficiency >= new_efficiency: # if the current efficiency is greater than or equal to the new efficiency
+                        continue # continue to the next bundle
+                
+                if cost_increase < min_cost_increase: # if the cost increase of the bundle is less than the minimum cost increase
+                    min_cost_increase = cost_increase # set the minimum cost increase to the cost increase of the bundle
+                    best_i = i # set the best bundle to the bundle
+                    best_i_pos = best_pos # set the best position to the best position
+
+            set_of_bundles[best_i].bundle.insert(best_i_pos, o) # insert the order into the best bundle at the best position
+
+        return set_of_bundles
+
+    def initialization(self, t:int, ready_orders:list, idle_couriers:list, bundle_size:int, orders_by_restaurant:dict = None):
         '''
         This function is used to initialize the assignment of orders to couriers at the beginning of the simulation.
+        orders_by_restaurant is the ready orders grouped by restaurant, it is built from ready_orders if not given.
         '''
 
         list_of_routes_by_restaurant = [] # Initiate an empty list of routes by restaurant
@@ -281,130 +607,58 @@ class DeliveryRouting:
         if not ready_orders: # if there are no ready orders
             return  list_of_routes_by_restaurant # return the empty list of routes by restaurant
         else: # if there are ready orders
-            for r_id in self.restaurants['restaurant']: # for each restaurant
-                r_order= [] # Initiate an empty list of orders for the restaurant
-                
-                for o in ready_orders: # for each order
-                    if o.restaurant_id == r_id: # if the order is from the restaurant
-                        r_order.append(o) # append the order to the list of orders for the restaurant
-                
-                number_of_bundle = int(np.ceil(len(r_order)/bundle_size)) # get the number of bundles for the restaurant by rounding up the number of orders divided by the bundle size
-                set_of_bundles = [[] for _ in range(number_of_bundle)] # Initiate a list of empty bundles for the restaurant
-                
-                # Assign orders into bundels:
-                for o in r_order: # for each order
-                    min_cost_increase = float('inf') # Initiate the minimum cost increase to infinity
-
-                    for i in range(number_of_bundle): # for each bundle
-                        n = len(set_of_bundles[i]) # get the number of orders in the bundle
-                        if n + 1<= bundle_size: # if the number of orders in the bundle plus 1 is less than or equal to the bundle size
-                            min_route_cost = float('inf') # Initiate the minimum route cost to infinity
-                            for pos in range(n+1): # for each position in the bundle
-                                set_of_bundles[i].insert(pos, o) # insert the order into the bundle at the position 
-                                if Route(set_of_bundles[i], r_id).get_route_cost(self.meters_per_minute, self.locations) < min_route_cost: # if the route cost of the bundle is less than the minimum route cost
-                                    min_route_cost = Route(set_of_bundles[i], r_id).get_route_cost(self.meters_per_minute, self.locations) # set the minimum route cost to the route cost of the bundle
-                                    best_pos = pos # set the best position to the position
-                                set_of_bundles[i].pop(pos) # remove the order from the bundle at the position  
-                        else: # if the number of orders in the bundle plus 1 is greater than the bundle size
-                            min_route_cost = float('inf') # Initiate the minimum route cost to infinity
-                            
-                            for pos in range(n+1): # for each position in the bundle
-                                set_of_bundles[i].insert(pos,o) # insert the order into the bundle at the position
-                                if Route(set_of_bundles[i], r_id).get_route_cost(self.meters_per_minute, self.locations) < min_route_cost: # if the route cost of the bundle is less than the minimum route cost
-                                    min_route_cost = Route(set_of_bundles[i], r_id).get_route_cost(self.meters_per_minute, self.locations) # set the minimum route cost to the route cost of the bundle
-                                    best_pos = pos # set the best position to the position
-                                set_of_bundles[i].pop(pos) # remove the order from the bundle at the position
-                            
-                            current_efficiency = n/Route(set_of_bundles[i], r_id).get_total_travel_time(self.meters_per_minute, self.locations) # get the current efficiency of the bundle
-                            set_of_bundles[i].insert(best_pos, o) # insert the order into the bundle at the best position
-                            new_efficiency = (n+1)/Route(set_of_bundles[i], r_id).get_total_travel_time(self.meters_per_minute, self.locations) # get the new efficiency of the bundle
-
-                            if current_efficiency < new_efficiency: # if the current efficiency is less than the new efficiency
-                                set_of_bundles[i].pop(best_pos) # remove the order from the bundle at the best position
-                            else: # if the current efficiency is greater than or equal to the new efficiency
-                                set_of_bundles[i].pop(best_pos) # remove the order from the bundle at the best position
-                                continue # continue to the next bundle
-
-                        current_cost = Route(set_of_bundles[i], r_id).get_route_cost(self.meters_per_minute, self.locations) # get the current cost of the bundle
-                        set_of_bundles[i].insert(best_pos, o) # insert the order into the bundle at the best position
-                        new_cost = Route(set_of_bundles[i], r_id).get_route_cost(self.meters_per_minute, self.locations) # get the new cost of the bundle
-                        cost_increase = new_cost - current_cost # get the cost increase of the bundle
-                        
-                        if cost_increase < min_cost_increase: # if the cost increase of the bundle is less than the minimum cost increase
-                            min_cost_increase = cost_increase # set the minimum cost increase to the cost increase of the bundle
-                            best_i = i # set the best bundle to the bundle
-                            best_i_pos = best_pos # set the best position to the best position
-                        set_of_bundles[i].pop(best_pos) # remove the order from the bundle at the best position
+            if orders_by_restaurant is None:
+                orders_by_restaurant = self.group_orders_by_restaurant(ready_orders) # group the ready orders by restaurant
 
-                    set_of_bundles[best_i].insert(best_i_pos, o) # insert the order into the best bundle at the best position
-                
-                set_of_bundles = [Route(bundle, r_id) for bundle in set_of_bundles] # convert the list of bundles into a list of routes
-                
+            for r_id, r_order in orders_by_restaurant.items(): # for each restaurant with ready orders
+                set_of_bundles = self.build_restaurant_routes(r_id, r_order, bundle_size) # assign the orders of the restaurant into bundles
                 if set_of_bundles: # if the list of routes is not empty
                     list_of_routes_by_restaurant.append(set_of_bundles) # append the list of routes to the list of routes by restaurant
 
             return list_of_routes_by_restaurant 
         
 
-        ### Local Search ###
+    ### Local Search ###
 
-        def get_restaurant_cost(self, res:list):
-            '''
-            Get the total cost of a restaurant
-            '''
-            res_cost = 0 # Initiate the cost of the restaurant
-            
-            for route in res: # for each route of the restaurant
-                res_cost += route.get_route_cost(self.meters_per_minute, self.locations) # add the cost of the route to the total cost of the restaurant
-            
-            return res_cost
+    def get_restaurant_cost(self, res:list):
+        '''
+        Get the total cost of a restaurant
+        '''
+        res_cost = 0 # Initiate the cost of the restaurant
         
-        def get_total_restaurant_cost(self, list_of_routes_by_restaurant:list):
-            '''
-            Get the total cost of all restaurants
-            '''
-            total_res_cost = 0 # Initiate the total cost of all restaurants
-            
-            for res in list_of_routes_by_restaurant: # for each restaurant
-                for route in res: # for each route of the restaurant
-                    total_res_cost += route.get_route_cost(self.meters_per_minute, self.locations) # add the cost of the route to the total cost of all restaurants
-            
-            return total_res_cost
+        for route in res: # for each route of the restaurant
+            res_cost += route.get_route_cost(self.travel_times) # add the cost of the route to the total cost of the restaurant
+        
+        return res_cost
+    
+    def get_total_restaurant_cost(self, list_of_routes_by_restaurant:list):
+        '''
+        Get the total cost of all restaurants
+        '''
+        total_res_cost = 0 # Initiate the total cost of all restaurants
+        
+        for res in list_of_routes_by_restaurant: # for each restaurant
+            total_res_cost += self.get_restaurant_cost(res) # add the cost of the routes of the restaurant to the total cost of all restaurants
+        
+        return total_res_cost
 
-        def local_search(self, list_of_routes_by_restaurant):
-            '''
-            Perform local search on the list of routes by restaurant
-            '''
-            current_total_res_cost = self.get_total_restaurant_cost(list_of_routes_by_restaurant)
+    def record_routes(self, t, list_of_routes_by_restaurant:list):
+        '''
+        Record the routes built at the decision epoch t in final_result.
+        The bundles are copied, since assigning a route to a courier with a tentative assignment merges it into the older route.
+        '''
+        self.final_result[t] = [[Route(list(route.bundle), route.restaurant_id, route.beta, route.gamma) for route in res]
+                                for res in list_of_routes_by_restaurant]
 
-            for res in list_of_routes_by_restaurant: # for each restaurant
-                current_cost = self.get_restaurant_cost(res) # get the current cost of the restaurant
-                
-                for route1 in res: # for each route of the restaurant
-                    route1_copy = [o for o in route1.bundle] # make a copy of the orders in the route
-                    for o in route1_copy: # for each order in the route
-                        best_route = route1 # initiate the best route to be the current route
-                        best_pos = route1.bundle.index(o) # initiate the best position to be the current position
-                        route1.bundle.remove(o) # remove the order from the route
-
-                        for route2 in res: # for each route of the restaurant
-                            for j in range(len(route2.bundle)+1): # for each position in the route
-
-                                route2.bundle.insert(j,o) # insert the order at position j
-                                new_cost = self.get_restaurant_cost(res) # get the new cost of the restaurant
-                                
-                                if new_cost < current_cost: # if the new cost is less than the current cost 
-                                    current_cost = new_cost # update the current cost
-                                    best_route = route2 # update the best route
-                                    best_pos = j # update the best position
-
-                                route2.bundle.pop(j) # remove the order from the route
-
-                        best_route.bundle.insert(best_pos,o) # insert the order at the best position
-            
-            for res_index in range(len(list_of_routes_by_restaurant)): # for each restaurant
-                list_of_routes_by_restaurant[res_index] = [route for route in list_of_routes_by_restaurant[res_index] if len(route.bundle)!= 0] # remove empty routes
-                
-            new_total_res_cost = self.get_total_restaurant_cost(list_of_routes_by_restaurant) # get the new total cost of all restaurants
-            
-            return list_of_routes_by_restaurant
\ No newline at end of file
+    def local_search(self, list_of_routes_by_restaurant):
+        '''
+        Perform local search on the list of routes by restaurant.
+        Orders are relocated and swapped between the routes of the same restaurant, scoring each move by the cost deltas of the routes it changes.
+        '''
+        for res in list_of_routes_by_restaurant: # for each restaurant
+            self.local_search_engine.run(res) # improve the routes of the restaurant
+        
+        for res_index in range(len(list_of_routes_by_restaurant)): # for each restaurant
+            list_of_routes_by_restaurant[res_index] = [route for route in list_of_routes_by_restaurant[res_index] if len(route.bundle)!= 0] # remove empty routes
+        
+        return list_of_routes_by_restaurant
@@ -0,0 +1,50 @@
+import heapq
+
+class EventCalendar(object):
+    def __init__(self, f_minute:int, horizon:int):
+        '''
+        Initialize a calendar of the decision epochs that have work to do, a min-heap of (epoch, kind) events.
+        Decision epochs are the multiples of f_minute up to horizon. An epoch only needs a decision if an order bucket is released at it,
+        kind 'orders', and only needs the archive to be updated if a shift ends at it, kind 'shift_end'. The other events, couriers starting
+        their shift or becoming available again, only matter to an epoch with orders and are read then from the courier availability index.
+        '''
+        self.f = f_minute
+        self.horizon = horizon # the last time of the simulation
+        self.heap = [] # (epoch, kind) of the scheduled events
+        self.scheduled = set() # the scheduled events, each one is kept once
+
+    def get_epoch(self, time:float) -> int:
+        '''
+        Get the first decision epoch after time, the one that handles an event at time
+        '''
+        return (int(time//self.f) + 1)*self.f
+
+    def schedule(self, t:int, kind:str):
+        '''
+        Schedule an event at epoch t, events after the horizon are left out
+        '''
+        if t > self.horizon or (t, kind) in self.scheduled:
+            return
+        self.scheduled.add((t, kind))
+        heapq.heappush(self.heap, (t, kind))
+
+    def next_epoch(self):
+        '''
+        Get the next epoch with an event, None if there is none
+        '''
+        return self.heap[0][0] if self.heap else None
+
+    def pop(self, t:int) -> set:
+        '''
+        Remove the events up to epoch t and return the kinds of the events at t
+        '''
+        kinds = set()
+        while self.heap and self.heap[0][0] <= t:
+            epoch, kind = heapq.heappop(self.heap)
+            self.scheduled.discard((epoch, kind))
+            if epoch == t:
+                kinds.add(kind)
+        return kinds
+
+    def __len__(self):
+        return len(self.heap)
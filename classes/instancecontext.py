@@ -0,0 +1,167 @@
+from multiprocessing import shared_memory
+import numpy as np
+from classes.store import CourierData, OrderData
+from classes.traveltimematrix import TravelTimeMatrix
+from functions.instance_cache import get_travel_time_matrix
+from functions.read_instance_information import read_instance_information
+
+# Import the config file
+from config import *
+horizon_minutes = HORIZON_MINUTES
+
+class InstanceContext(object):
+    def __init__(self, instance_dir:str, horizon:int = horizon_minutes):
+        '''
+        Initialize everything about an instance that does not depend on the parameters of a run:
+        the instance tables, the travel time matrix, the static order and courier data, the simulated horizon and the decision epoch buckets.
+        The horizon is in minutes, 0 for the whole days that cover the orders and shifts of the instance.
+        The context is read-only, so the runs of a parameter sweep can share it, in one process or through shared memory.
+        '''
+        self.instance_dir = instance_dir
+
+        self.orders, self.restaurants, self.couriers, self.instanceparams, self.locations,\
+        self.meters_per_minute, self.pickup_service_minutes, self.dropoff_service_minutes, \
+            self.target_click_to_door, self.pay_per_order,\
+            self.guaranteed_pay_per_hour = read_instance_information(instance_dir) # read instance information from the instance directory
+
+        self.travel_times = get_travel_time_matrix(instance_dir, self.locations, self.meters_per_minute) # travel time between every pair of locations
+        self.order_data = OrderData.from_frame(self.orders, self.travel_times, list(self.couriers['courier'])) # static order data
+        self.courier_data = CourierData.from_frame(self.couriers, self.travel_times) # static courier data
+        self.shared = {} # shared memory blocks of the arrays, by array name
+        self.horizon = horizon if horizon > 0 else self.get_day_horizon() # the last time of the simulation, the decision epochs run up to it
+        self.init_derived()
+
+    def init_derived(self):
+        '''
+        Initialize the small lookups derived from the tables and the static data
+        '''
+        self.order_rows = np.array(sorted(range(len(self.order_data.ids)), key = self.order_data.ids.__getitem__), dtype=np.intp) # rows of the orders sorted by id
+        self.restaurant_rank = {r_id: i for i, r_id in enumerate(self.restaurants['restaurant'])} # position of each restaurant in the restaurants file
+        self.restaurant_rank_by_location = np.full(len(self.travel_times.ids), -1, dtype=np.int64) # position in the restaurants file of each location, -1 if it is not a restaurant
+        for r_id, rank in self.restaurant_rank.items():
+            self.restaurant_rank_by_location[self.travel_times.index[r_id]] = rank
+        self.buckets = {} # decision epoch buckets for each f and delta_u
+
+    def get_day_horizon(self) -> int:
+        '''
+        Get the end of the last day in which an order is placed or a shift ends
+        '''
+        last_time = max(self.orders['placement_time'].max() if len(self.orders) else 0, self.couriers['off_time'].max() if len(self.couriers) else 0)
+        return 24*60*max(1, int(np.ceil(last_time/(24*60))))
+
+    def get_buckets(self, f_minute:int, delta_u:int):
+        '''
+        Get the orders of each decision epoch and the orders of each epoch grouped by restaurant, as positions in the orders sorted by id.
+        An order placed in [t-f, t) goes to epoch t if it is ready within the assignment horizon t + delta_u,
+        otherwise to the first later epoch t + f*ceil((ready_time - t - delta_u)/f) in which it is.
+        Restaurants are in the order of the restaurants file and the orders of a restaurant keep their order in the epoch.
+        Orders placed after the last decision epoch of the horizon are left out. The buckets are computed once for each f and delta_u.
+        '''
+        if (f_minute, delta_u) in self.buckets:
+            return self.buckets[(f_minute, delta_u)]
+
+        last_t = (self.horizon//f_minute)*f_minute # the last decision epoch
+        placement_time = self.order_data.placement_time[self.order_rows].astype(np.float64)
+        ready_time = self.order_data.ready_time[self.order_rows].astype(np.float64)
+        t_placement = (np.floor(placement_time/f_minute).astype(np.int64) + 1)*f_minute # the first epoch after the placement of each order
+        delay = np.maximum(0, np.ceil((ready_time - t_placement - delta_u)/f_minute)).astype(np.int64) # epochs to wait until the order is ready within the horizon
+        bucket = t_placement + f_minute*delay # the epoch of each order
+
+        index = np.flatnonzero((placement_time >= 0) & (t_placement <= last_t)) # orders placed within the day
+        index = index[np.lexsort((index, t_placement[index], bucket[index]))] # by epoch, then in the order they were placed in the original interval loop
+        keys, starts = np.unique(bucket[index], return_index=True)
+        horizon_buckets = {int(k): v for k, v in zip(keys, np.split(index, starts[1:]))} # positions of the orders of each epoch
+
+        restaurant_rank = self.restaurant_rank_by_location[self.order_data.restaurant[self.order_rows]] # position in the restaurants file of the restaurant of each order
+        restaurant_ids = list(self.restaurants['restaurant'])
+        restaurant_buckets = {} # positions of the orders of each epoch by restaurant
+        for t, v in horizon_buckets.items():
+            v = v[restaurant_rank[v] >= 0] # orders of restaurants that are not in the restaurants file are left out
+            v = v[np.argsort(restaurant_rank[v], kind='stable')] # stable sort by restaurant
+            ranks, starts = np.unique(restaurant_rank[v], return_index=True)
+            restaurant_buckets[t] = {restaurant_ids[rank]: group for rank, group in zip(ranks, np.split(v, starts[1:]))}
+
+        self.buckets[(f_minute, delta_u)] = horizon_buckets, restaurant_buckets
+        return self.buckets[(f_minute, delta_u)]
+
+    def share(self):
+        '''
+        Move the travel time matrix and the static order and courier data to shared memory.
+        A pickled context then carries only the names of the blocks, and unpickling it in another process attaches to them without a copy.
+        Call release once every process is done with the context.
+        '''
+        for name, array in [('travel_times', self.travel_times.matrix), ('order_data', self.order_data.data), ('courier_data', self.courier_data.data)]:
+            if name in self.shared:
+                continue
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            shared_array = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            shared_array[...] = array
+            self.shared[name] = block
+        self.attach_arrays(self.get_shared_arrays())
+        return self
+
+    def get_shared_arrays(self) -> dict:
+        '''
+        Get the name, shape and dtype of each shared block
+        '''
+        return {name: (block.name, array.shape, array.dtype) for (name, block), array in
+                zip(self.shared.items(), [self.travel_times.matrix, self.order_data.data, self.courier_data.data])}
+
+    def attach_arrays(self, arrays:dict):
+        '''
+        Rebuild the travel time matrix and the static order and courier data on the shared blocks
+        '''
+        for name, (block_name, shape, dtype) in arrays.items():
+            if name not in self.shared: # attach to a block created by another process
+                self.shared[name] = shared_memory.SharedMemory(name=block_name)
+            arrays[name] = np.ndarray(shape, dtype=dtype, buffer=self.shared[name].buf)
+            arrays[name].flags.writeable = False # the context is read-only
+
+        self.travel_times = TravelTimeMatrix.from_matrix(self.travel_times.ids, arrays['travel_times'], self.meters_per_minute)
+        self.order_data = OrderData(arrays['order_data'], self.order_data.ids, self.travel_times.ids, self.order_data.courier_ids)
+        self.courier_data = CourierData(arrays['courier_data'], self.courier_data.ids, self.travel_times.ids, self.travel_times.index)
+
+    def release(self, unlink:bool = True):
+        '''
+        Detach from the shared blocks, and free them if unlink is True
+        '''
+        for block in self.shared.values():
+            block.close()
+            if unlink:
+                block.unlink()
+        self.shared = {}
+
+    def unshare(self):
+        '''
+        Copy the shared arrays back to the memory of this process and free the shared blocks, the context can then outlive them
+        '''
+        if not self.shared:
+            return self
+        self.travel_times = TravelTimeMatrix.from_matrix(self.travel_times.ids, self.travel_times.matrix.copy(), self.meters_per_minute)
+        self.order_data = OrderData(self.order_data.data.copy(), self.order_data.ids, self.travel_times.ids, self.order_data.courier_ids)
+        self.courier_data = CourierData(self.courier_data.data.copy(), self.courier_data.ids, self.travel_times.ids, self.travel_times.index)
+        self.release()
+        return self
+
+    def __getstate__(self):
+        '''
+        Pickle the context, leaving out the shared arrays, which are attached again by name
+        '''
+        state = self.__dict__.copy()
+        state['buckets'] = {} # the buckets are rebuilt on demand
+        if self.shared:
+            state['shared'] = self.get_shared_arrays()
+            state['travel_times'] = TravelTimeMatrix.from_matrix(self.travel_times.ids, np.empty((0, 0), dtype=self.travel_times.matrix.dtype), self.meters_per_minute)
+            state['order_data'] = OrderData(np.empty(0, dtype=self.order_data.data.dtype), self.order_data.ids, self.travel_times.ids, self.order_data.courier_ids)
+            state['courier_data'] = CourierData(np.empty(0, dtype=self.courier_data.data.dtype), self.courier_data.ids, self.travel_times.ids, self.travel_times.index)
+        return state
+
+    def __setstate__(self, state):
+        '''
+        Unpickle the context, attaching to the shared arrays if there are any
+        '''
+        arrays = state['shared']
+        state['shared'] = {}
+        self.__dict__.update(state)
+        if arrays:
+            self.attach_arrays(dict(arrays))
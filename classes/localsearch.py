@@ -0,0 +1,121 @@
+from classes.route import Route
+from classes.traveltimematrix import TravelTimeMatrix
+
+# Import the config file
+from config import *
+ls_strategy = LS_STRATEGY
+ls_max_iterations = LS_MAX_ITERATIONS
+ls_exchange = LS_EXCHANGE
+
+class LocalSearch(object):
+    def __init__(self, travel_times:TravelTimeMatrix, strategy:str = ls_strategy, max_iterations:int = ls_max_iterations, exchange:bool = ls_exchange):
+        '''
+        Initialize a local search over the routes of one restaurant.
+        Moves are scored by the cost deltas of the routes they change, and the best move between each pair of routes
+        is kept in a move-gain table that is refreshed only for the routes touched by an accepted move.
+        '''
+        if strategy not in ('best', 'first'):
+            raise ValueError("strategy must be 'best' or 'first', got {}".format(strategy))
+        self.travel_times = travel_times
+        self.strategy = strategy # 'best': apply the best move of the neighbourhood, 'first': apply the first improving move
+        self.max_iterations = max_iterations # maximum number of moves applied, 0 for no limit
+        self.exchange = exchange # also try to swap two orders of different routes
+        self.epsilon = 1e-9 # smallest cost decrease considered an improvement
+
+    def get_best_relocate(self, route1:Route, route2:Route):
+        '''
+        Get the best move that relocates an order of route1 to a position in route2, and its cost delta
+        '''
+        best_move, best_delta = None, float('inf')
+
+        for p1, o in enumerate(route1.bundle): # for each order of route1
+            removal_delta = route1.removal_delta(p1, self.travel_times) # cost delta of removing the order from route1
+
+            if route2 is route1: # if the order is moved inside its own route
+                reduced_route = Route(route1.bundle[:p1] + route1.bundle[p1+1:], route1.restaurant_id, route1.beta, route1.gamma) # the route without the order
+                for p2 in range(len(reduced_route.bundle)+1): # for each position in the route without the order
+                    if p2 == p1:
+                        continue # the order would stay where it is
+                    delta = removal_delta + reduced_route.insertion_delta(o, p2, self.travel_times)
+                    if delta < best_delta:
+                        best_move, best_delta = ('relocate', route1, p1, route2, p2), delta
+            else:
+                for p2 in range(len(route2.bundle)+1): # for each position in route2
+                    delta = removal_delta + route2.insertion_delta(o, p2, self.travel_times)
+                    if delta < best_delta:
+                        best_move, best_delta = ('relocate', route1, p1, route2, p2), delta
+
+        return best_move, best_delta
+
+    def get_best_exchange(self, route1:Route, route2:Route):
+        '''
+        Get the best move that swaps an order of route1 with an order of route2, and its cost delta
+        '''
+        best_move, best_delta = None, float('inf')
+
+        for p1, o1 in enumerate(route1.bundle): # for each order of route1
+            for p2, o2 in enumerate(route2.bundle): # for each order of route2
+                delta = route1.replacement_delta(p1, o2, self.travel_times) + route2.replacement_delta(p2, o1, self.travel_times)
+                if delta < best_delta:
+                    best_move, best_delta = ('exchange', route1, p1, route2, p2), delta
+
+        return best_move, best_delta
+
+    def get_best_move(self, route1:Route, route2:Route, exchange:bool):
+        '''
+        Get the best move between two routes, and its cost delta
+        '''
+        best_move, best_delta = self.get_best_relocate(route1, route2)
+
+        if exchange: # if swaps between the two routes are tried
+            move, delta = self.get_best_exchange(route1, route2)
+            if delta < best_delta:
+                best_move, best_delta = move, delta
+
+        return best_move, best_delta
+
+    def apply_move(self, move):
+        '''
+        Apply a relocate or exchange move to the routes
+        '''
+        kind, route1, p1, route2, p2 = move
+
+        if kind == 'relocate': # move the order from route1 to route2
+            o = route1.bundle.pop(p1)
+            route2.bundle.insert(p2, o)
+        else: # swap the orders of route1 and route2
+            route1.bundle[p1], route2.bundle[p2] = route2.bundle[p2], route1.bundle[p1]
+
+    def run(self, routes:list) -> int:
+        '''
+        Improve the routes of one restaurant in place until no improving move is left or the iteration limit is reached.
+        Return the number of moves applied.
+        '''
+        pairs = [(i, j) for i in range(len(routes)) for j in range(len(routes))] # relocates are directed, so every ordered pair is evaluated
+        move_gains = {} # best move and its cost delta for each pair of routes
+        stale = set(pairs) # pairs whose best move has to be recomputed
+        iterations = 0
+
+        while self.max_iterations == 0 or iterations < self.max_iterations:
+            best_move, best_delta = None, -self.epsilon # only moves that decrease the cost are applied
+
+            for pair in pairs: # for each pair of routes
+                if pair in stale: # refresh the best move of the pair if one of its routes has changed
+                    move_gains[pair] = self.get_best_move(routes[pair[0]], routes[pair[1]], self.exchange and pair[0] < pair[1]) # swaps are symmetric, so they are tried once per pair
+                    stale.discard(pair)
+                move, delta = move_gains[pair]
+                if delta < best_delta:
+                    best_move, best_delta = move, delta
+                    if self.strategy == 'first': # apply the first improving move
+                        break
+
+            if best_move is None: # no improving move is left
+                break
+
+            self.apply_move(best_move)
+            iterations += 1
+
+            touched = {i for i, route in enumerate(routes) if route is best_move[1] or route is best_move[3]} # the routes changed by the move
+            stale.update(pair for pair in pairs if pair[0] in touched or pair[1] in touched)
+
+        return iterations
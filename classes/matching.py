@@ -0,0 +1,126 @@
+import time
+import numpy as np
+
+class MatchingBackend(object):
+    '''
+    Matching backend interface.
+    A backend assigns routes to couriers given the pickup delay of every route and courier pair and which pairs are feasible.
+    Every route is either assigned to one feasible courier or left to the pseudo courier at a penalty of omega,
+    and every courier takes at most one route.
+    '''
+    name = ''
+    build_time = 0.0 # the seconds spent building the last problem solved
+    solve_time = 0.0 # the seconds spent solving the last problem
+    variables = 0 # the number of variables of the last problem
+
+    def solve(self, cost:np.ndarray, feasible:np.ndarray, omega:float) -> list:
+        '''
+        Solve the matching problem.
+        Args:
+            cost (ndarray): cost[i, j] is the pickup delay if route i is assigned to courier j.
+            feasible (ndarray): feasible[i, j] is True if route i can be assigned to courier j.
+            omega (float): the penalty of leaving a route to the pseudo courier.
+        Returns:
+            list: the (route index, courier index) pairs assigned to a real courier.
+        '''
+        raise NotImplementedError
+
+class DocplexMatching(MatchingBackend):
+    '''
+    Matching backend that solves the assignment as a binary program with docplex
+    '''
+    name = 'docplex'
+
+    def __init__(self):
+        from docplex.mp.model import Model # import here so that the other backends do not require docplex
+        self.Model = Model
+
+    def solve(self, cost:np.ndarray, feasible:np.ndarray, omega:float) -> list:
+        start = time.perf_counter()
+        # create mp model
+        m = self.Model('bundle_assignment')
+
+        route_index = [i for i in range(cost.shape[0])]
+        route_courier_list = [(int(i),int(j)) for i, j in zip(*np.nonzero(feasible))] # only feasible pairs get a variable
+
+        # create variables
+        route_courier = m.binary_var_dict(route_courier_list, name='route_courier')
+        pseudo_courier = m.binary_var_dict(route_index, name='route_pseudo_courier') # route i is left to the pseudo courier
+
+        # set objective
+        number_of_order_assign_to_pseudo_courier = m.sum(pseudo_courier[i] for i in route_index)
+        real_pickup_delay = m.sum(float(cost[i,j])*route_courier[i,j] for i, j in route_courier_list)
+        m.minimize(omega*number_of_order_assign_to_pseudo_courier+real_pickup_delay)
+        # constraints
+        routes_of_courier = {} # feasible routes of each courier
+        couriers_of_route = {i: [] for i in route_index} # feasible couriers of each route
+        for i, j in route_courier_list:
+            routes_of_courier.setdefault(j, []).append(i)
+            couriers_of_route[i].append(j)
+        # each route is assigned to one courier
+        for i in route_index:
+            m.add_constraint(pseudo_courier[i]+m.sum(route_courier[i,j] for j in couriers_of_route[i])==1)
+        # each courier is assigned to at most one route, couriers without a feasible route need no constraint
+        for j, routes in routes_of_courier.items():
+            if len(routes) > 1:
+                m.add_constraint(m.sum(route_courier[i,j] for i in routes)<=1)
+
+        self.variables = len(route_courier_list) + len(route_index)
+        self.build_time = time.perf_counter() - start
+
+        # solve model
+        start = time.perf_counter()
+        solution = m.solve(log_output = False)
+        if solution is None: # if the model has no solution, no route is assigned
+            self.solve_time = time.perf_counter() - start
+            return []
+
+        assignments = [(i,j) for i, j in route_courier_list if solution.get_value(route_courier[i,j]) > 0.5]
+        self.solve_time = time.perf_counter() - start
+        return assignments
+
+class LinearSumAssignmentMatching(MatchingBackend):
+    '''
+    Matching backend that solves the assignment as a rectangular linear assignment problem with scipy.
+    One dummy courier column per route is priced at the unassigned penalty and infeasible pairs are priced at a big M,
+    so a route is only matched to a real courier when that is feasible and cheaper than leaving it unassigned.
+    '''
+    name = 'lsa'
+
+    def __init__(self):
+        from scipy.optimize import linear_sum_assignment # import here so that the other backends do not require scipy
+        self.linear_sum_assignment = linear_sum_assignment
+
+    def solve(self, cost:np.ndarray, feasible:np.ndarray, omega:float) -> list:
+        start = time.perf_counter()
+        rows = np.flatnonzero(feasible.any(axis=1)) # routes with at least one feasible courier
+        columns = np.flatnonzero(feasible.any(axis=0)) # couriers with at least one feasible route
+        if len(rows) == 0: # every route is left to the pseudo courier
+            self.variables, self.build_time, self.solve_time = 0, time.perf_counter() - start, 0.0
+            return []
+        cost, feasible = cost[np.ix_(rows, columns)], feasible[np.ix_(rows, columns)] # the other routes and couriers cannot be matched
+        number_of_routes, number_of_couriers = cost.shape
+
+        big_m = omega + (float(cost[feasible].max()) if feasible.any() else 0) + 1 # larger than any feasible cost and the unassigned penalty
+        cost_matrix = np.full((number_of_routes, number_of_couriers + number_of_routes), float(omega)) # dummy courier columns
+        cost_matrix[:, :number_of_couriers] = np.where(feasible, cost, big_m) # real courier columns
+
+        self.variables = cost_matrix.size
+        self.build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        row_ind, col_ind = self.linear_sum_assignment(cost_matrix)
+        self.solve_time = time.perf_counter() - start
+
+        return [(int(rows[i]), int(columns[j])) for i, j in zip(row_ind, col_ind) if j < number_of_couriers and feasible[i, j]]
+
+matching_backends = {backend.name: backend for backend in [DocplexMatching, LinearSumAssignmentMatching]} # backends selectable by name
+
+def get_matching_backend(name:str) -> MatchingBackend:
+    '''
+    Get a matching backend by name
+    '''
+    if name not in matching_backends:
+        raise ValueError('unknown matching backend {}, choose one of {}'.format(name, ', '.join(matching_backends)))
+
+    return matching_backends[name]()
@@ -1,19 +1,66 @@
 class Order:
     '''
-    Order class
+    Order class, a view on one row of an OrderStore
     '''
+    __slots__ = ('store', 'index')
 
-    def __init__(self, order_information:dict):
+    def __init__(self, store, index:int):
         '''
         Initialize an order
         '''
 
-        self.id = order_information.get('order') # order id
-        self.destination = (order_information.get('x'), order_information.get('y')) # order location
-        self.placement_time = order_information.get('placement_time') # order placement time
-        self.restaurant_id = order_information.get('restaurant') # restaurant id
-        self.ready_time = order_information.get('ready_time') # order ready time
-        self.pickup_time = 0 # order pickup time
-        self.dropoff_time = 0 # order dropoff time
-        self.courier_id = "" # courier id
-        self.assign_time = 0 # assignment time
+        self.store = store # the order store
+        self.index = index # the row of the order in the store
+
+    @property
+    def id(self):
+        return self.store.ids[self.index] # order id
+
+    @property
+    def destination(self):
+        return (self.store.x[self.index].item(), self.store.y[self.index].item()) # order location
+
+    @property
+    def placement_time(self):
+        return self.store.placement_time[self.index].item() # order placement time
+
+    @property
+    def restaurant_id(self):
+        return self.store.location_ids[self.store.restaurant[self.index]] # restaurant id
+
+    @property
+    def ready_time(self):
+        return self.store.ready_time[self.index].item() # order ready time
+
+    @property
+    def pickup_time(self):
+        return self.store.pickup_time[self.index].item() # order pickup time
+
+    @pickup_time.setter
+    def pickup_time(self, value):
+        self.store.pickup_time[self.index] = value
+
+    @property
+    def dropoff_time(self):
+        return self.store.dropoff_time[self.index].item() # order dropoff time
+
+    @dropoff_time.setter
+    def dropoff_time(self, value):
+        self.store.dropoff_time[self.index] = value
+
+    @property
+    def courier_id(self):
+        courier = self.store.courier[self.index]
+        return self.store.courier_ids[courier] if courier >= 0 else "" # courier id
+
+    @courier_id.setter
+    def courier_id(self, value):
+        self.store.courier[self.index] = self.store.courier_index[value] if value != "" else -1
+
+    @property
+    def assign_time(self):
+        return self.store.assign_time[self.index].item() # assignment time
+
+    @assign_time.setter
+    def assign_time(self, value):
+        self.store.assign_time[self.index] = value
@@ -0,0 +1,120 @@
+import heapq
+import queue
+import threading
+import time
+from classes.instancecontext import InstanceContext
+
+# Import the config file
+from config import *
+delta_u = DELTA_U
+
+class OrderFeed(object):
+    '''
+    Order feed interface.
+    A feed delivers the events of the online mode as (time, kind, id) tuples, where kind is 'order' for an order placed at time
+    and 'courier' for a courier shift announced at time. Times are in minutes of the simulated day.
+    '''
+    def get_events(self, until:float) -> list:
+        '''
+        Get the events before until that have not been delivered yet and are available now
+        '''
+        raise NotImplementedError
+
+    def is_done(self) -> bool:
+        '''
+        Check if every event has been delivered
+        '''
+        raise NotImplementedError
+
+    def next_time(self):
+        '''
+        Get the time of the next event that is available now, None if there is none
+        '''
+        raise NotImplementedError
+
+def get_replay_events(context:InstanceContext, shift_notice:float = delta_u) -> list:
+    '''
+    Get the events of an instance sorted by time: every order at its placement time,
+    and every courier shift shift_notice minutes before it starts, which is when the batch algorithm first sees the courier
+    '''
+    events = [(t, 'order', o_id) for t, o_id in zip(context.orders['placement_time'].tolist(), context.orders['order'])]
+    events += [(t - shift_notice, 'courier', c_id) for t, c_id in zip(context.couriers['on_time'].tolist(), context.couriers['courier'])]
+    return sorted(events, key = lambda e: e[0])
+
+class ReplayFeed(OrderFeed):
+    '''
+    Feed that replays the orders and couriers of an instance in simulated time, every event is available as soon as it is asked for
+    '''
+    def __init__(self, context:InstanceContext, shift_notice:float = delta_u):
+        self.events = get_replay_events(context, shift_notice)
+        self.next_event = 0 # position of the next event to deliver
+
+    def get_events(self, until:float) -> list:
+        start = self.next_event
+        while self.next_event < len(self.events) and self.events[self.next_event][0] < until:
+            self.next_event += 1
+        return self.events[start:self.next_event]
+
+    def is_done(self) -> bool:
+        return self.next_event == len(self.events)
+
+    def next_time(self):
+        return self.events[self.next_event][0] if self.next_event < len(self.events) else None
+
+class QueueFeed(OrderFeed):
+    '''
+    Feed of the events a producer puts in a thread-safe queue, e.g. a thread reading a socket.
+    Events can arrive late or out of order, they are delivered once they are in the queue. The producer puts None when it is done.
+    '''
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.pending = [] # events received but not delivered yet, a min-heap on time
+        self.closed = False # the producer is done
+
+    def receive(self):
+        '''
+        Move the events in the queue to the pending events
+        '''
+        while True:
+            try:
+                event = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            if event is None:
+                self.closed = True
+            else:
+                heapq.heappush(self.pending, event)
+
+    def get_events(self, until:float) -> list:
+        self.receive()
+        events = []
+        while self.pending and self.pending[0][0] < until:
+            events.append(heapq.heappop(self.pending))
+        return events
+
+    def is_done(self) -> bool:
+        self.receive()
+        return self.closed and not self.pending
+
+    def next_time(self):
+        self.receive()
+        return self.pending[0][0] if self.pending else None
+
+    def replay(self, events:list, speedup:float, start:float = None) -> threading.Thread:
+        '''
+        Put events in the queue from a thread at their time in accelerated wall-clock time, speedup simulated minutes per wall-clock minute,
+        counted from start (time.perf_counter(), now by default). This stands in for a live order source.
+        '''
+        start = time.perf_counter() if start is None else start
+
+        def produce():
+            for event in events:
+                delay = start + max(event[0], 0)*60/speedup - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                self.queue.put(event)
+            self.queue.put(None)
+
+        thread = threading.Thread(target=produce, daemon=True)
+        thread.start()
+        return thread
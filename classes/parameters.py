@@ -0,0 +1,28 @@
+from config import *
+
+class Parameters(object):
+    def __init__(self, f_minute:int = F_MINUTE, delta_u:int = DELTA_U, beta:float = BETA, gamma:float = GAMMA,
+                 x:int = X, omega:float = OMEGA, commitment_strategy:int = COMMITMENT_STRATEGY):
+        '''
+        Initialize the parameters of one run of the algorithm, by default the values in config.py
+        '''
+        self.f_minute = f_minute # every f minutes solves a matching problem
+        self.delta_u = delta_u # the assignment horizon
+        self.beta = beta # control the freshness in the construction of bundles
+        self.gamma = gamma # control the click-to-door time in the construction of bundles
+        self.x = x # the number of minutes that is considered a long waiting time
+        self.omega = omega # the penalty of an order left to the pseudo courier
+        self.commitment_strategy = commitment_strategy # 0: no commitment, 1: commitment
+
+    def get_tag(self) -> str:
+        '''
+        Get the tag of the parameters used in the names of the performance files, e.g. f5d10b10g10x25o1000c0
+        '''
+        return 'f{}d{}b{}g{}x{}o{}c{}'.format(self.f_minute, self.delta_u, self.beta, self.gamma, self.x, self.omega, self.commitment_strategy)
+
+    def to_dict(self) -> dict:
+        '''
+        Get the parameters as a dictionary
+        '''
+        return {'f_minute': self.f_minute, 'delta_u': self.delta_u, 'beta': self.beta, 'gamma': self.gamma,
+                'x': self.x, 'omega': self.omega, 'commitment_strategy': self.commitment_strategy}
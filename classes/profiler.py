@@ -0,0 +1,166 @@
+import contextlib
+import csv
+import functools
+import importlib
+import json
+import time
+
+# Import the config file
+from config import *
+profile_worst_ticks = PROFILE_WORST_TICKS
+
+class NullProfiler(object):
+    '''
+    Profiler that records nothing, the default of a run so that the decision epochs pay only a few empty calls
+    '''
+    def tick(self, t:int):
+        return self
+
+    def lap(self, phase:str, **parts):
+        pass
+
+    def record(self, **sizes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+null_profiler = NullProfiler()
+
+class TickProfiler(NullProfiler):
+    phases = ['bucketing', 'initialization', 'local_search', 'restaurant_pool', 'record_routes', 'feasibility', 'model', 'solve', 'assign_bundle', 'retire'] # in the order of a decision epoch
+    sizes = ['orders', 'restaurants', 'routes', 'couriers', 'variables', 'assigned']
+    counted_calls = [('classes.traveltimematrix', 'TravelTimeMatrix', 'travel_time'), ('classes.route', 'Route', '_update_schedule'),
+                     ('classes.route', 'Route', 'insertion_delta'), ('classes.route', 'Route', 'removal_delta'),
+                     ('classes.route', 'Route', 'replacement_delta'),
+                     ('classes.deliveryrouting', None, 'batch_insertion')] # (module, class or None for a module function, name) of the functions whose calls are counted while the profiler is active
+
+    def __init__(self):
+        '''
+        Initialize a profiler of the decision epochs of a run: the seconds spent in each phase, the problem sizes and the calls to the counted methods.
+        The methods are only wrapped while the profiler is active, in a with statement, so a run without a profiler does not count anything.
+        Calls made in the worker processes of a RestaurantPool are not counted.
+        '''
+        self.ticks = {} # phase seconds, sizes and call counts of each decision epoch
+        self.calls = {method: 0 for _, _, method in self.counted_calls} # calls since the profiler became active
+        self.originals = [] # the methods replaced by counting wrappers
+        self.current = None # the record of the decision epoch being profiled
+        self.last = 0 # the time of the start of the tick or of the last lap
+
+    @contextlib.contextmanager
+    def tick(self, t:int):
+        '''
+        Profile the decision epoch t in a with statement
+        '''
+        self.current = self.ticks.setdefault(t, {'t': t})
+        start_calls = dict(self.calls)
+        self.last = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.current.update({method + '_calls': self.calls[method] - start_calls[method] for method in self.calls})
+            self.current['total'] = sum(self.current.get(phase, 0) for phase in self.phases)
+            self.current = None
+
+    def lap(self, phase:str, **parts):
+        '''
+        Record the time since the start of the tick or the last lap under phase,
+        less the seconds of parts, e.g. the model construction of a matching solve, which are recorded under their own names
+        '''
+        now = time.perf_counter()
+        elapsed = now - self.last
+        for name, seconds in parts.items():
+            self.current[name] = self.current.get(name, 0) + seconds
+            elapsed -= seconds
+        self.current[phase] = self.current.get(phase, 0) + elapsed
+        self.last = now
+
+    def record(self, **sizes):
+        '''
+        Record the problem sizes of the tick
+        '''
+        self.current.update(sizes)
+
+    def __enter__(self):
+        '''
+        Count the calls to the counted methods until the end of the with statement
+        '''
+        for module, cls, method in self.counted_calls:
+            owner = importlib.import_module(module) # imported here, the modules that call them import this one
+            owner = getattr(owner, cls) if cls is not None else owner # a module function is counted where it is called from
+            original = getattr(owner, method)
+            self.originals.append((owner, method, original))
+            setattr(owner, method, self.get_counter(method, original))
+        return self
+
+    def __exit__(self, *exc):
+        while self.originals:
+            owner, method, original = self.originals.pop()
+            setattr(owner, method, original)
+
+    def get_counter(self, method:str, original):
+        '''
+        Get a wrapper of a method that counts its calls
+        '''
+        calls = self.calls
+        @functools.wraps(original)
+        def counter(*args, **kwargs):
+            calls[method] += 1
+            return original(*args, **kwargs)
+        return counter
+
+    def get_columns(self) -> list:
+        '''
+        Get the columns of the record of a decision epoch
+        '''
+        return ['t', 'total'] + self.phases + self.sizes + [method + '_calls' for _, _, method in self.counted_calls]
+
+    def get_rows(self) -> list:
+        '''
+        Get the record of each decision epoch profiled, with every column, in the order of the epochs
+        '''
+        return [{column: self.ticks[t].get(column, 0) for column in self.get_columns()} for t in sorted(self.ticks)]
+
+    def get_worst_ticks(self, n:int = profile_worst_ticks) -> list:
+        '''
+        Get the records of the n slowest decision epochs, the slowest first
+        '''
+        return sorted(self.get_rows(), key = lambda row: -row['total'])[:n]
+
+    def get_summary(self, n:int = profile_worst_ticks) -> dict:
+        '''
+        Get the totals of each phase and counted method over the run and the n slowest decision epochs
+        '''
+        rows = self.get_rows()
+        totals = {column: sum(row[column] for row in rows) for column in self.get_columns()[1:]}
+        return {'ticks': len(rows), 'totals': totals, 'worst_ticks': self.get_worst_ticks(n)}
+
+    def write(self, path_prefix:str, n:int = profile_worst_ticks):
+        '''
+        Write the record of each decision epoch to path_prefix.csv, and the records with the summary to path_prefix.json
+        '''
+        with open(path_prefix + '.csv', 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=self.get_columns())
+            writer.writeheader()
+            writer.writerows(self.get_rows())
+        with open(path_prefix + '.json', 'w') as f:
+            json.dump({'summary': self.get_summary(n), 'ticks': self.get_rows()}, f, indent=4)
+
+    def format_summary(self, n:int = profile_worst_ticks) -> str:
+        '''
+        Format the time of each phase over the run and the phases of the n slowest decision epochs as a text report
+        '''
+        summary = self.get_summary(n)
+        totals = summary['totals']
+        lines = ['Profiled ticks: {}, total: {:.3f}s'.format(summary['ticks'], totals['total'])]
+        lines += ['  {:<16}{:>10.3f}s {:>6.1f}%'.format(phase, totals[phase], 100*totals[phase]/totals['total'] if totals['total'] > 0 else 0)
+                  for phase in self.phases if totals[phase] > 0]
+        lines += ['  {:<24}{:>10d}'.format(method + '_calls', totals[method + '_calls']) for _, _, method in self.counted_calls]
+        lines.append('Worst ticks:')
+        for row in summary['worst_ticks']:
+            phases = ', '.join('{} {:.1f}ms'.format(phase, 1000*row[phase]) for phase in self.phases if row[phase] > 0)
+            lines.append('  t={}: {:.1f}ms ({} routes, {} couriers, {} variables) {}'.format(row['t'], 1000*row['total'], row['routes'], row['couriers'], row['variables'], phases))
+        return '\n'.join(lines)
@@ -0,0 +1,108 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from classes.deliveryrouting import DeliveryRouting
+from classes.instancecontext import InstanceContext
+from classes.order import Order
+from classes.parameters import Parameters
+from classes.route import Route
+
+# Import the config file
+from config import *
+restaurant_workers = RESTAURANT_WORKERS
+restaurant_min_parallel = RESTAURANT_MIN_PARALLEL
+restaurant_chunk_size = RESTAURANT_CHUNK_SIZE
+
+worker_routing = None # the delivery routing problem a worker process builds routes with, on the shared instance data
+
+def init_worker(context:InstanceContext, params:Parameters):
+    '''
+    Build the delivery routing problem of a worker process once, attached to the shared instance data of the context
+    '''
+    global worker_routing
+    worker_routing = DeliveryRouting(params = params, context = context)
+
+def build_chunk(task:tuple) -> list:
+    '''
+    Build and improve the routes of a chunk of restaurants in a worker process.
+    The task carries the id and the order rows of each restaurant and the bundle size, the routes are returned as lists of order rows.
+    '''
+    chunk, bundle_size = task
+    routes_by_restaurant = []
+    for r_id, rows in chunk:
+        r_order = [Order(worker_routing.order_store, int(i)) for i in rows]
+        res = worker_routing.local_search([worker_routing.build_restaurant_routes(r_id, r_order, bundle_size)])[0] # the non-empty routes after local search
+        routes_by_restaurant.append([[o.index for o in route.bundle] for route in res])
+    return routes_by_restaurant
+
+class RestaurantPool(object):
+    def __init__(self, context:InstanceContext, params:Parameters, workers:int = restaurant_workers,
+                 min_restaurants:int = restaurant_min_parallel, chunk_size:int = restaurant_chunk_size):
+        '''
+        Initialize a pool of worker processes that build and improve the routes of the restaurants of a decision epoch.
+        The restaurants of an epoch do not share orders or routes, so they are sent to the workers in chunks of chunk_size restaurants
+        and the routes are merged back in the order of the restaurants, the same routes as the serial path whatever the scheduling.
+        An epoch with fewer than min_restaurants restaurants is built in the calling process, where the dispatch would cost more than it saves.
+        With workers 0 or 1 every epoch is built in the calling process and no worker is started.
+        The instance data is shared with the workers through shared memory, a context that is not shared yet is copied back to private memory on close.
+        '''
+        self.context = context
+        self.params = params
+        self.workers = workers
+        self.min_restaurants = max(min_restaurants, 2) # a single restaurant is never worth a dispatch
+        self.chunk_size = chunk_size
+        self.executor = None # started on the first epoch built in parallel
+        self.owns_shared = False # whether the context was shared by the pool
+
+    def accepts(self, orders_by_restaurant:dict) -> bool:
+        '''
+        Check if the routes of an epoch are worth building in the workers
+        '''
+        return self.workers > 1 and len(orders_by_restaurant) >= self.min_restaurants
+
+    def start(self):
+        '''
+        Share the instance data and start the workers
+        '''
+        if not self.context.shared:
+            self.context.share()
+            self.owns_shared = True
+        self.executor = ProcessPoolExecutor(max_workers = self.workers, initializer = init_worker, initargs = (self.context, self.params))
+
+    def get_chunks(self, orders_by_restaurant:dict) -> list:
+        '''
+        Split the restaurants into chunks of at most chunk_size restaurants and at least one chunk per worker, keeping their order
+        '''
+        items = [(r_id, np.fromiter((o.index for o in r_order), dtype=np.intp, count=len(r_order))) for r_id, r_order in orders_by_restaurant.items()]
+        size = max(1, min(self.chunk_size, int(np.ceil(len(items)/self.workers))))
+        return [items[i:i+size] for i in range(0, len(items), size)]
+
+    def build_routes(self, dr:DeliveryRouting, orders_by_restaurant:dict, bundle_size:int) -> list:
+        '''
+        Build and improve the routes of each restaurant of a decision epoch in the workers, the same as dr.initialization followed by dr.local_search.
+        The routes are made of the Order objects of dr and are grouped by restaurant in the order of orders_by_restaurant.
+        '''
+        if self.executor is None:
+            self.start()
+        tasks = [(chunk, bundle_size) for chunk in self.get_chunks(orders_by_restaurant)]
+        list_of_routes_by_restaurant = []
+        for r_id, rows_by_route in zip(orders_by_restaurant, (res for routes in self.executor.map(build_chunk, tasks) for res in routes)): # map keeps the order of the chunks
+            order_by_row = {o.index: o for o in orders_by_restaurant[r_id]}
+            list_of_routes_by_restaurant.append([Route([order_by_row[i] for i in rows], r_id, dr.params.beta, dr.params.gamma) for rows in rows_by_route])
+        return list_of_routes_by_restaurant
+
+    def close(self):
+        '''
+        Stop the workers, and free the shared memory if the pool shared the context
+        '''
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        if self.owns_shared:
+            self.context.unshare()
+            self.owns_shared = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
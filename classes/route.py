@@ -1,4 +1,5 @@
-from functions.travel_time import travel_time
+import numpy as np
+from classes.traveltimematrix import TravelTimeMatrix
 
 # Import the config file
 from config import *
@@ -6,14 +7,172 @@ beta = BETA
 gamma = GAMMA
 
 class Route(object):
-    def __init__(self,bundle : list, restaurant_id : str): 
+    def __init__(self,bundle : list, restaurant_id : str, beta : float = beta, gamma : float = gamma): 
         '''
         Initialize a route
         '''
         self.bundle = bundle 
         self.restaurant_id = restaurant_id
-        self.beta = beta
-        self.gamma = gamma
+        self.beta = beta # weight of the service delay in the route cost
+        self.gamma = gamma # weight of the service waiting in the route cost
+        self._schedule_key = None # the bundle the cached schedule was computed for
+        self._schedule_travel_times = None # the travel time matrix the cached schedule was computed with
+
+    def _update_schedule(self, travel_times:TravelTimeMatrix):
+        '''
+        Cache the prefix schedule of the route: the location index of each travel point, the arrival time offset at each
+        travel point, the prefix sums of the arrival time offsets, the running max ready time from both ends and the partial cost sums.
+        The cache is rebuilt only when the bundle has changed since the last call.
+        '''
+        key = tuple(self.bundle) # the orders of the route in sequence
+        if key == self._schedule_key and travel_times is self._schedule_travel_times:
+            return # the cached schedule is up to date
+
+        matrix = travel_times.matrix
+        points = [travel_times.index[self.restaurant_id]] + [travel_times.index[o.id] for o in self.bundle] # location index of each travel point
+        arrival = [0.0] # arrival time offset at each travel point after leaving the restaurant
+        arrival_sum = [0.0] # prefix sums of the arrival time offsets
+        for k in range(1, len(points)): # for each order in the route
+            arrival.append(arrival[-1] + float(matrix[points[k-1], points[k]])) # add the travel time from the previous travel point
+            arrival_sum.append(arrival_sum[-1] + arrival[-1])
+
+        ready_prefix_max = [float('-inf')] # ready_prefix_max[k] is the latest ready time of the first k orders
+        for o in self.bundle:
+            ready_prefix_max.append(max(ready_prefix_max[-1], o.ready_time))
+        ready_suffix_max = [float('-inf')] # ready_suffix_max[k] is the latest ready time of the orders from position k on
+        for o in reversed(self.bundle):
+            ready_suffix_max.append(max(ready_suffix_max[-1], o.ready_time))
+        ready_suffix_max.reverse()
+
+        self._points = points
+        self._arrival = arrival
+        self._arrival_sum = arrival_sum
+        self._ready_prefix_max = ready_prefix_max
+        self._ready_suffix_max = ready_suffix_max
+        self._sum_ready_time = sum(o.ready_time for o in self.bundle) # partial cost sum of the ready times
+        self._sum_placement_time = sum(o.placement_time for o in self.bundle) # partial cost sum of the placement times
+        self._cost = self._get_cost(len(self.bundle), ready_prefix_max[-1], arrival[-1], arrival_sum[-1], self._sum_ready_time, self._sum_placement_time)
+        self._schedule_key = key
+        self._schedule_travel_times = travel_times
+
+    def _get_cost(self, n, ready_time, total_travel_time, arrival_sum, sum_ready_time, sum_placement_time):
+        '''
+        Calculate the route cost from the partial cost sums of a route with n orders.
+        Every order is reached at ready_time plus its arrival time offset, so the total service delay is
+        n*ready_time + arrival_sum - sum_ready_time and the total service waiting is n*ready_time + arrival_sum - sum_placement_time.
+        '''
+        if n == 0:
+            return 0 # if there is no order in the route, the cost is 0
+        return total_travel_time + \
+            self.beta * (n*ready_time + arrival_sum - sum_ready_time) + \
+                self.gamma * (n*ready_time + arrival_sum - sum_placement_time)
+
+    def _get_insertion(self, order, pos:int, travel_times:TravelTimeMatrix):
+        '''
+        Get the total travel time and the route cost after inserting an order at position pos, without changing the bundle
+        '''
+        self._update_schedule(travel_times)
+        n = len(self.bundle)
+        matrix = travel_times.matrix
+        points = self._points
+        o = travel_times.index[order.id] # location index of the order
+        prev = points[pos] # the travel point before the order
+        to_order = float(matrix[prev, o]) # travel time from the previous travel point to the order
+
+        if pos < n: # if the order is inserted before another order
+            nxt = points[pos+1] # the travel point after the order
+            shift = to_order + float(matrix[o, nxt]) - float(matrix[prev, nxt]) # the orders after pos are reached shift minutes later
+            total_travel_time = self._arrival[-1] + shift
+        else: # if the order is appended to the route
+            shift = 0
+            total_travel_time = self._arrival[-1] + to_order
+        arrival_sum = self._arrival_sum[-1] + self._arrival[pos] + to_order + (n - pos)*shift
+        ready_time = max(self._ready_prefix_max[-1], order.ready_time)
+
+        route_cost = self._get_cost(n+1, ready_time, total_travel_time, arrival_sum,
+                                    self._sum_ready_time + order.ready_time, self._sum_placement_time + order.placement_time)
+        return total_travel_time, route_cost
+
+    def insertion_delta(self, order, pos:int, travel_times:TravelTimeMatrix):
+        '''
+        Get the increase of the route cost if an order is inserted at position pos, without changing the bundle
+        '''
+        _, route_cost = self._get_insertion(order, pos, travel_times)
+
+        return route_cost - self._cost
+
+    def insertion_travel_time(self, order, pos:int, travel_times:TravelTimeMatrix):
+        '''
+        Get the total travel time of the route if an order is inserted at position pos, without changing the bundle
+        '''
+        total_travel_time, _ = self._get_insertion(order, pos, travel_times)
+
+        return total_travel_time
+
+    def removal_delta(self, pos:int, travel_times:TravelTimeMatrix):
+        '''
+        Get the increase of the route cost if the order at position pos is removed, without changing the bundle
+        '''
+        self._update_schedule(travel_times)
+        n = len(self.bundle)
+        matrix = travel_times.matrix
+        points = self._points
+        order = self.bundle[pos]
+        prev, cur = points[pos], points[pos+1] # the travel point before the order and the order itself
+
+        if pos < n-1: # if another order follows the removed order
+            nxt = points[pos+2]
+            shift = float(matrix[prev, nxt]) - float(matrix[prev, cur]) - float(matrix[cur, nxt]) # the orders after pos are reached shift minutes later
+            total_travel_time = self._arrival[-1] + shift
+        else: # if the last order is removed
+            shift = 0
+            total_travel_time = self._arrival[pos]
+        arrival_sum = self._arrival_sum[pos] + (self._arrival_sum[-1] - self._arrival_sum[pos+1]) + (n - pos - 1)*shift
+        ready_time = max(self._ready_prefix_max[pos], self._ready_suffix_max[pos+1])
+
+        route_cost = self._get_cost(n-1, ready_time, total_travel_time, arrival_sum,
+                                    self._sum_ready_time - order.ready_time, self._sum_placement_time - order.placement_time)
+        return route_cost - self._cost
+
+    def replacement_delta(self, pos:int, order, travel_times:TravelTimeMatrix):
+        '''
+        Get the increase of the route cost if the order at position pos is replaced by another order, without changing the bundle
+        '''
+        self._update_schedule(travel_times)
+        n = len(self.bundle)
+        matrix = travel_times.matrix
+        points = self._points
+        old_order = self.bundle[pos]
+        o = travel_times.index[order.id] # location index of the new order
+        prev, cur = points[pos], points[pos+1] # the travel point before the replaced order and the replaced order itself
+        to_order = float(matrix[prev, o]) # travel time from the previous travel point to the new order
+
+        if pos < n-1: # if another order follows the replaced order
+            nxt = points[pos+2]
+            shift = to_order + float(matrix[o, nxt]) - float(matrix[prev, cur]) - float(matrix[cur, nxt]) # the orders after pos are reached shift minutes later
+            total_travel_time = self._arrival[-1] + shift
+        else: # if the last order is replaced
+            shift = 0
+            total_travel_time = self._arrival[pos] + to_order
+        arrival_sum = self._arrival_sum[-1] - self._arrival[pos+1] + self._arrival[pos] + to_order + (n - pos - 1)*shift
+        ready_time = max(self._ready_prefix_max[pos], self._ready_suffix_max[pos+1], order.ready_time)
+
+        route_cost = self._get_cost(n, ready_time, total_travel_time, arrival_sum,
+                                    self._sum_ready_time - old_order.ready_time + order.ready_time,
+                                    self._sum_placement_time - old_order.placement_time + order.placement_time)
+        return route_cost - self._cost
+
+    def get_best_insertion(self, order, travel_times:TravelTimeMatrix):
+        '''
+        Get the position with the smallest increase of the route cost to insert an order, and the increase
+        '''
+        best_pos, min_delta = 0, float('inf')
+        for pos in range(len(self.bundle)+1): # for each position to insert the order
+            delta = self.insertion_delta(order, pos, travel_times)
+            if delta < min_delta: # keep the first position with the smallest increase
+                best_pos, min_delta = pos, delta
+
+        return best_pos, min_delta
         
     def get_ready_time(self):
         '''
@@ -23,22 +182,18 @@ class Route(object):
         
         return ready_time
 
-    def get_total_travel_time(self, meters_per_minute, locations):
+    def get_total_travel_time(self, travel_times:TravelTimeMatrix):
         '''
         Get the total travel time of the route from 1st destination to the last destination.
         Do not include pickup service time and drop off service time.
         '''
-        travel_points = [self.restaurant_id] + [o.id for o in self.bundle] # get the travel points of the route
-
-        if len(travel_points) == 1:
+        if len(self.bundle) == 0:
             return 0 # if there is no order in the route, return 0
-        else:
-            total_travel_time = 0 # initialize the total travel time
-            for i in range(len(travel_points)-1): # for each travel point, calculate the travel time to the next travel point
-                total_travel_time += travel_time(travel_points[i], travel_points[i+1], meters_per_minute, locations) # add the travel time to the total travel time
-            return total_travel_time # return the total travel time
+        self._update_schedule(travel_times)
 
-    def get_end_position(self,meters_per_minute,locations):
+        return self._arrival[-1] # the arrival time offset at the last order is the total travel time
+
+    def get_end_position(self):
         '''
         Get the end position of the route
         '''
@@ -46,53 +201,80 @@ class Route(object):
 
         return end_position
 
-    def get_total_service_delay(self, meters_per_minute, locations):
+    def get_total_service_delay(self, travel_times:TravelTimeMatrix):
         '''
         Get the total service delay of the route.
         '''
-        travel_points = [self.restaurant_id]+ [o.id for o in self.bundle] # get the travel points of the route
-        
-        if len(travel_points) == 1:
+        if len(self.bundle) == 0:
             return 0 # if there is no order in the route, return 0
-        else:
-            total_service_delay = 0 # initialize the total service delay
-            arrival_time_at_cp = self.get_ready_time() # initialize the arrival time at the current travel point
-            for i in range(len(travel_points)-1): # for each travel point:
-                arrival_time_at_cp += (travel_time(travel_points[i], travel_points[i+1], meters_per_minute, locations)) # calculate the arrival time at the next travel point
-                total_service_delay += (arrival_time_at_cp - self.bundle[i].ready_time) # add the service delay to the total service delay
-            return total_service_delay # return the total service delay
+        self._update_schedule(travel_times)
+        total_service_delay = len(self.bundle)*self._ready_prefix_max[-1] + self._arrival_sum[-1] - self._sum_ready_time # each order is reached at the ready time of the route plus its arrival time offset
+
+        return total_service_delay # return the total service delay
 
-    def get_total_service_waiting(self, meters_per_minute, locations):
+    def get_total_service_waiting(self, travel_times:TravelTimeMatrix):
         '''
         Get the total service waiting time of the route.
         Total service waiting time = arrival time at customer place - placement time (ignoring pickup service time and dropoff service time).
         '''
-        travel_points = [self.restaurant_id]+[o.id for o in self.bundle] # get the travel points of the route
-        
-        if len(travel_points) == 1: 
+        if len(self.bundle) == 0:
             return 0 # if there is no order in the route, return 0
-        else:
-            total_service_waiting = 0 # initialize the total service waiting time
-            arrival_time_at_cp = self.get_ready_time() # initialize the arrival time at the current travel point
-            for i in range(len(travel_points)-1): # for each travel point:
-                arrival_time_at_cp += (travel_time(travel_points[i], travel_points[i+1], meters_per_minute, locations)) # calculate the arrival time at the next travel point
-                total_service_waiting += (arrival_time_at_cp - self.bundle[i].placement_time) # add the service waiting time to the total service waiting time
-            return total_service_waiting
+        self._update_schedule(travel_times)
+        total_service_waiting = len(self.bundle)*self._ready_prefix_max[-1] + self._arrival_sum[-1] - self._sum_placement_time # each order is reached at the ready time of the route plus its arrival time offset
+
+        return total_service_waiting
 
-    def route_efficiency(self, meters_per_minute, locations):
+    def route_efficiency(self, travel_times:TravelTimeMatrix):
         '''
         Calculate the route efficiency: travel time per order
         '''
-        route_efficiency = len(self.bundle)/self.get_total_travel_time(meters_per_minute, locations) # calculate the route efficiency as 
+        route_efficiency = len(self.bundle)/self.get_total_travel_time(travel_times) # calculate the route efficiency as 
 
         return route_efficiency
 
-    def get_route_cost(self, meters_per_minute, locations):
+    def get_route_cost(self, travel_times:TravelTimeMatrix):
         '''
         Calculate the route cost
         '''
-        route_cost = self.get_total_travel_time(meters_per_minute,locations) + \
-            self.beta * self.get_total_service_delay(meters_per_minute,locations) + \
-                self.gamma * self.get_total_service_waiting(meters_per_minute,locations) # calculate the route cost as the total travel time + beta * total service delay + gamma * total service waiting
+        self._update_schedule(travel_times)
+        route_cost = self._cost # the route cost is the total travel time + beta * total service delay + gamma * total service waiting
         
         return route_cost
+
+def batch_insertion(routes:list, order, travel_times:TravelTimeMatrix):
+    '''
+    Score every (route, position) candidate to insert an order into a list of routes of the same restaurant in one array operation.
+    Returns, for each candidate, the index of the route, the position in the route, the increase of the route cost and the
+    total travel time of the route after the insertion. Candidates are ordered by route, then by position.
+    '''
+    for route in routes:
+        route._update_schedule(travel_times) # make sure the cached schedule of every route is up to date
+
+    counts = np.array([len(route.bundle)+1 for route in routes]) # number of positions in each route
+    route_index = np.repeat(np.arange(len(routes)), counts) # route of each candidate
+    pos = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) # position of each candidate in its route
+
+    prev = np.array([p for route in routes for p in route._points]) # travel point before the order
+    nxt = np.array([p for route in routes for p in route._points[1:] + [-1]]) # travel point after the order, -1 if the order is appended
+    arrival_at_prev = np.array([a for route in routes for a in route._arrival]) # arrival time offset at the travel point before the order
+
+    n = np.repeat(counts - 1, counts)
+    route_values = np.array([[route._arrival[-1], route._arrival_sum[-1], route._ready_prefix_max[-1], route._sum_ready_time,
+                              route._sum_placement_time, route._cost, route.beta, route.gamma] for route in routes], dtype=np.float64)
+    total_travel_time, arrival_sum, ready_time, sum_ready_time, sum_placement_time, route_cost, beta, gamma = np.repeat(route_values, counts, axis=0).T # values of the route of each candidate
+
+    o = travel_times.index[order.id] # location index of the order
+    matrix = travel_times.matrix
+    has_next = nxt >= 0
+    nxt = np.where(has_next, nxt, o)
+    to_order = matrix[prev, o].astype(np.float64) # travel time from the previous travel point to the order
+    shift = np.where(has_next, to_order + matrix[o, nxt] - matrix[prev, nxt], 0.0) # the orders after the position are reached shift minutes later
+
+    new_total_travel_time = np.where(has_next, total_travel_time + shift, total_travel_time + to_order)
+    new_arrival_sum = arrival_sum + arrival_at_prev + to_order + (n - pos)*shift
+    new_ready_time = np.maximum(ready_time, order.ready_time)
+    new_route_cost = new_total_travel_time + \
+        beta * ((n+1)*new_ready_time + new_arrival_sum - (sum_ready_time + order.ready_time)) + \
+            gamma * ((n+1)*new_ready_time + new_arrival_sum - (sum_placement_time + order.placement_time))
+
+    return route_index, pos, new_route_cost - route_cost, new_total_travel_time
@@ -0,0 +1,160 @@
+import glob
+import os
+import numpy as np
+import pandas as pd
+
+# Import the config file
+from config import *
+solution_buffer_size = SOLUTION_BUFFER_SIZE
+
+# solution file names read by reference/compute_performance_summary.py
+solution_file_names = {'assignments': 'solution_info_assignments.txt',
+                       'orders': 'solution_info_orders.txt',
+                       'couriers': 'solution_info_couriers.txt'}
+
+class SolutionSink(object):
+    '''
+    Solution sink interface.
+    DeliveryRouting writes the records of each assignment to the sink once the assignment is final:
+    the assignment, the orders it delivers and the moves of its courier. Records are buffered and written
+    every buffer_size records, so the output grows with the run and can be read while the run is still going.
+    '''
+    name = ''
+
+    def __init__(self, output_dir, buffer_size:int = solution_buffer_size):
+        self.output_dir = output_dir
+        self.buffer_size = buffer_size # the number of records kept in memory before they are written
+        self.assignment_count = 0 # the number of assignments written, assignments are numbered from 1
+        self.buffered = 0 # the number of records in the buffers
+        os.makedirs(output_dir, exist_ok=True)
+
+    def write_assignment(self, assign_time, pickup_time, courier_id:str, order_ids:list) -> int:
+        '''
+        Write an assignment and return its number
+        '''
+        self.assignment_count += 1
+        self.add('assignments', (assign_time, pickup_time, courier_id, ' '.join(order_ids)))
+        return self.assignment_count
+
+    def write_order(self, order_id:str, placement_time, ready_time, pickup_time, dropoff_time, courier_id:str):
+        '''
+        Write a delivered order
+        '''
+        self.add('orders', (order_id, placement_time, ready_time, pickup_time, dropoff_time, courier_id))
+
+    def write_move(self, courier_id:str, departure_time, origin_id:str, destination_id:str, assignment_id:int):
+        '''
+        Write a move of a courier
+        '''
+        self.add('couriers', (courier_id, departure_time, origin_id, destination_id, assignment_id))
+
+    def add(self, table:str, record:tuple):
+        '''
+        Buffer a record of a table, and write the buffers once they are full
+        '''
+        raise NotImplementedError
+
+    def flush(self):
+        '''
+        Write the buffered records
+        '''
+        raise NotImplementedError
+
+    def close(self):
+        '''
+        Write the buffered records and release the sink
+        '''
+        self.flush()
+
+class TextSolutionSink(SolutionSink):
+    '''
+    Solution sink that writes the three text files read by the evaluator.
+    The moves of the couriers are written as their assignments are finalized, so the moves of a courier are in order but not contiguous.
+    '''
+    name = 'text'
+
+    headers = {'assignments': 'Assignment_time Pickup_time Courier_ID Orders\n',
+               'orders': 'order placement_time ready_time pickup_time dropoff_time courier\n',
+               'couriers': ''} # the courier file has no header
+
+    def __init__(self, output_dir, buffer_size:int = solution_buffer_size, file_names:dict = solution_file_names):
+        super().__init__(output_dir, buffer_size)
+        self.files = {table: open(os.path.join(output_dir, file_name), 'w') for table, file_name in file_names.items()}
+        self.lines = {table: [] for table in self.files} # buffered lines of each file
+        for table, f in self.files.items():
+            f.write(self.headers[table])
+
+    def add(self, table:str, record:tuple):
+        self.lines[table].append(' '.join(map(str, record)) + '\n')
+        self.buffered += 1
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        for table, f in self.files.items():
+            f.writelines(self.lines[table])
+            f.flush() # the files can be read during the run
+            self.lines[table] = []
+        self.buffered = 0
+
+    def close(self):
+        self.flush()
+        for f in self.files.values():
+            f.close()
+
+class ColumnarSolutionSink(SolutionSink):
+    '''
+    Solution sink that writes each full buffer of a table as a numbered .npz file with one array per column,
+    read back with read_columnar_solution. The orders of an assignment are one space separated string.
+    '''
+    name = 'columnar'
+
+    columns = {'assignments': ['assignment_time', 'pickup_time', 'courier', 'orders'],
+               'orders': ['order', 'placement_time', 'ready_time', 'pickup_time', 'dropoff_time', 'courier'],
+               'couriers': ['courier', 'departure_time', 'origin', 'destination', 'assignment']}
+
+    def __init__(self, output_dir, buffer_size:int = solution_buffer_size):
+        super().__init__(output_dir, buffer_size)
+        self.records = {table: [] for table in self.columns} # buffered records of each table
+        self.parts = {table: 0 for table in self.columns} # the number of files written for each table
+        for path in glob.glob(os.path.join(output_dir, '*_[0-9][0-9][0-9][0-9][0-9].npz')): # do not mix with the parts of an earlier run
+            os.remove(path)
+
+    def add(self, table:str, record:tuple):
+        self.records[table].append(record)
+        self.buffered += 1
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        for table, records in self.records.items():
+            if records:
+                columns = {name: np.array(column) for name, column in zip(self.columns[table], zip(*records))}
+                np.savez(os.path.join(self.output_dir, '{}_{:05d}.npz'.format(table, self.parts[table])), **columns)
+                self.parts[table] += 1
+                self.records[table] = []
+        self.buffered = 0
+
+def read_columnar_solution(output_dir) -> dict:
+    '''
+    Read the tables written by a ColumnarSolutionSink as DataFrames, the parts written so far if the run is still going
+    '''
+    tables = {}
+    for table, columns in ColumnarSolutionSink.columns.items():
+        parts = []
+        for path in sorted(glob.glob(os.path.join(output_dir, table + '_[0-9][0-9][0-9][0-9][0-9].npz'))):
+            with np.load(path) as part:
+                parts.append(pd.DataFrame({name: part[name] for name in columns}))
+        tables[table] = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=columns)
+    return tables
+
+solution_sinks = {sink.name: sink for sink in [TextSolutionSink, ColumnarSolutionSink]} # sinks selectable by name
+
+def get_solution_sink(name:str, output_dir, buffer_size:int = solution_buffer_size) -> SolutionSink:
+    '''
+    Get a solution sink writing to output_dir by name
+    '''
+    if name not in solution_sinks:
+        raise ValueError('unknown solution sink {}, choose one of {}'.format(name, ', '.join(solution_sinks)))
+
+    return solution_sinks[name](output_dir, buffer_size)
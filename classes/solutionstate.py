@@ -0,0 +1,223 @@
+import numpy as np
+from classes.instancecontext import InstanceContext
+from classes.order import Order
+from classes.parameters import Parameters
+from classes.route import Route
+from classes.traveltimematrix import TravelTimeMatrix
+
+class SolutionState(object):
+    def __init__(self, order_data, travel_times:TravelTimeMatrix, params:Parameters, routes:list, epochs:list, restaurants:list):
+        '''
+        Initialize a compact solution state for the improvement of the routes after a run, e.g. with ALNS.
+        Route k is an integer array of rows in order_data, an OrderData or an OrderStore, built at decision epoch epochs[k] for the restaurant at location index restaurants[k].
+        The state only needs the static order data and the travel times, so it can be rebuilt from a shared InstanceContext.
+        Route arrays are never changed in place: an operator replaces the array of a route, so states made with copy share the arrays they do not change.
+        Changes are recorded in an undo log, so a rejected move is rolled back to a checkpoint instead of working on a copy.
+        '''
+        self.order_store = order_data
+        self.travel_times = travel_times
+        self.params = params
+        self.beta, self.gamma, self.omega = params.beta, params.gamma, params.omega # route cost weights and unassigned penalty
+
+        self.routes = routes
+        self.epochs = epochs
+        self.restaurants = restaurants
+        self.route_index = {} # routes of each (epoch, restaurant location index) pair
+        for k, key in enumerate(zip(epochs, restaurants)):
+            self.route_index.setdefault(key, []).append(k)
+        self.costs = [self.get_route_cost(rows, restaurant) for rows, restaurant in zip(routes, restaurants)] # cost of each route
+        self.total_cost = sum(self.costs)
+        self.unassigned = () # (row, epoch) of the orders removed from their route and not inserted again
+        self.log = [] # (route, rows, cost) before each change since the last commit
+        self.removal_deltas = {} # cost delta of removing each order of a route, for the routes that did not change since
+
+    @classmethod
+    def from_result(cls, dr):
+        '''
+        Build the state from the routes dr built at each decision epoch, dr.final_result
+        '''
+        routes, epochs, restaurants = [], [], []
+        index = dr.travel_times.index
+        for t, list_of_routes_by_restaurant in dr.final_result.items():
+            for res in list_of_routes_by_restaurant:
+                for route in res:
+                    routes.append(np.fromiter((o.index for o in route.bundle), dtype=np.intp, count=len(route.bundle)))
+                    epochs.append(t)
+                    restaurants.append(index[route.restaurant_id])
+        return cls(dr.order_store, dr.travel_times, dr.params, routes, epochs, restaurants)
+
+    @classmethod
+    def from_context(cls, context:InstanceContext, params:Parameters, solution:tuple):
+        '''
+        Build the state from the static data of a context and a solution given by get_solution
+        '''
+        routes, epochs, restaurants = solution
+        return cls(context.order_data, context.travel_times, params, list(routes), list(epochs), list(restaurants))
+
+    def get_solution(self) -> tuple:
+        '''
+        Get the routes, their epochs and their restaurants, which is all a process needs to rebuild the state from a shared context
+        '''
+        return list(self.routes), list(self.epochs), list(self.restaurants)
+
+    def copy(self):
+        '''
+        Copy the state, sharing the route arrays, which are replaced rather than changed
+        '''
+        state = object.__new__(SolutionState)
+        state.__dict__.update(self.__dict__)
+        state.routes, state.costs = list(self.routes), list(self.costs)
+        state.epochs, state.restaurants = list(self.epochs), list(self.restaurants)
+        state.route_index = {key: list(v) for key, v in self.route_index.items()}
+        state.log = []
+        state.removal_deltas = dict(self.removal_deltas)
+        return state
+
+    def get_route_cost(self, rows:np.ndarray, restaurant:int) -> float:
+        '''
+        Get the cost of a route, the same as Route.get_route_cost
+        '''
+        if len(rows) == 0:
+            return 0
+        points = np.concatenate(([restaurant], self.order_store.location[rows])) # location index of each travel point
+        arrival = np.cumsum(self.travel_times.matrix[points[:-1], points[1:]], dtype=np.float64) # arrival time offset at each order
+        ready_time = self.order_store.ready_time[rows]
+        n, route_ready_time = len(rows), float(ready_time.max())
+        return float(arrival[-1] + self.beta*(n*route_ready_time + arrival.sum() - ready_time.sum()) +\
+                     self.gamma*(n*route_ready_time + arrival.sum() - self.order_store.placement_time[rows].sum()))
+
+    def objective(self) -> float:
+        '''
+        Get the total route cost plus the penalty of the orders left unassigned
+        '''
+        return self.total_cost + self.omega*len(self.unassigned)
+
+    def set_route(self, k:int, rows:np.ndarray):
+        '''
+        Replace the orders of route k, recording the old ones in the undo log
+        '''
+        self.log.append((k, self.routes[k], self.costs[k]))
+        cost = self.get_route_cost(rows, self.restaurants[k])
+        self.total_cost += cost - self.costs[k]
+        self.routes[k], self.costs[k] = rows, cost
+        self.removal_deltas.pop(k, None)
+
+    def get_schedule_costs(self, candidates:np.ndarray, restaurant:int) -> np.ndarray:
+        '''
+        Get the cost of each row of candidates as a route of the restaurant at a location index, in one array operation
+        '''
+        if candidates.shape[1] == 0:
+            return np.zeros(len(candidates))
+        points = np.concatenate((np.full((len(candidates), 1), restaurant), self.order_store.location[candidates]), axis=1)
+        arrival = np.cumsum(self.travel_times.matrix[points[:, :-1], points[:, 1:]], axis=1, dtype=np.float64) # arrival time offset at each order
+        ready_time = self.order_store.ready_time[candidates]
+        n, route_ready_time = candidates.shape[1], ready_time.max(axis=1)
+        return arrival[:, -1] + self.beta*(n*route_ready_time + arrival.sum(axis=1) - ready_time.sum(axis=1)) +\
+                self.gamma*(n*route_ready_time + arrival.sum(axis=1) - self.order_store.placement_time[candidates].sum(axis=1))
+
+    def get_insertion_deltas(self, k:int, row:int) -> np.ndarray:
+        '''
+        Get the increase of the cost if the order of a row is inserted at each position of route k
+        '''
+        rows = self.routes[k]
+        candidates = np.array([np.insert(rows, pos, row) for pos in range(len(rows)+1)]) # the route with the order at each position
+        return self.get_schedule_costs(candidates, self.restaurants[k]) - self.costs[k]
+
+    def get_removal_deltas(self, k:int) -> np.ndarray:
+        '''
+        Get the increase of the cost if each order of route k is removed, cached until the route changes
+        '''
+        if k not in self.removal_deltas:
+            rows = self.routes[k]
+            candidates = np.array([np.delete(rows, pos) for pos in range(len(rows))]).reshape(len(rows), max(len(rows)-1, 0)) # the route without each order
+            self.removal_deltas[k] = self.get_schedule_costs(candidates, self.restaurants[k]) - self.costs[k] if len(rows) else np.zeros(0)
+        return self.removal_deltas[k]
+
+    def get_assigned(self) -> tuple:
+        '''
+        Get the row and the route of every order in a route
+        '''
+        lengths = np.fromiter((len(rows) for rows in self.routes), dtype=np.intp, count=len(self.routes))
+        if lengths.sum() == 0:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        return np.concatenate(self.routes), np.repeat(np.arange(len(self.routes)), lengths)
+
+    def remove_row(self, k:int, row:int):
+        '''
+        Remove the order of a row from route k
+        '''
+        return self.remove(k, int(np.flatnonzero(self.routes[k] == row)[0]))
+
+    def remove(self, k:int, pos:int) -> int:
+        '''
+        Remove the order at position pos of route k and return its row, it is unassigned until it is inserted again
+        '''
+        row = int(self.routes[k][pos])
+        self.set_route(k, np.delete(self.routes[k], pos))
+        self.unassigned = self.unassigned + ((row, self.epochs[k]),)
+        return row
+
+    def insert(self, k:int, pos:int, row:int):
+        '''
+        Insert the order of a row at position pos of route k
+        '''
+        self.set_route(k, np.insert(self.routes[k], pos, row))
+        self.unassigned = tuple(u for u in self.unassigned if u[0] != row)
+
+    def add_route(self, t:int, restaurant:int) -> int:
+        '''
+        Add an empty route at epoch t for the restaurant at a location index and return it
+        '''
+        k = len(self.routes)
+        self.routes.append(np.empty(0, dtype=np.intp))
+        self.costs.append(0)
+        self.epochs.append(t)
+        self.restaurants.append(restaurant)
+        self.route_index.setdefault((t, restaurant), []).append(k)
+        self.log.append((k, None, 0)) # undone by removing the route
+        return k
+
+    def get_insertion_delta(self, k:int, pos:int, row:int) -> float:
+        '''
+        Get the increase of the cost if the order of a row is inserted at position pos of route k, without changing the state
+        '''
+        return self.get_route_cost(np.insert(self.routes[k], pos, row), self.restaurants[k]) - self.costs[k]
+
+    def checkpoint(self) -> tuple:
+        '''
+        Get a mark to roll back to
+        '''
+        return len(self.log), self.total_cost, self.unassigned
+
+    def rollback(self, mark:tuple):
+        '''
+        Undo the changes made since a checkpoint
+        '''
+        length, self.total_cost, self.unassigned = mark
+        while len(self.log) > length:
+            k, rows, cost = self.log.pop()
+            if rows is None: # an added route
+                self.routes.pop()
+                self.costs.pop()
+                self.route_index[(self.epochs.pop(), self.restaurants.pop())].pop()
+            else:
+                self.routes[k], self.costs[k] = rows, cost
+            self.removal_deltas.pop(k, None)
+
+    def commit(self):
+        '''
+        Keep the changes made so far, clearing the undo log
+        '''
+        self.log = []
+
+    def get_routes(self, t:int) -> list:
+        '''
+        Get the non-empty routes of epoch t as Route objects, grouped by restaurant like dr.final_result
+        '''
+        routes_by_restaurant = {}
+        for k, epoch in enumerate(self.epochs):
+            if epoch == t and len(self.routes[k]) > 0:
+                restaurant_id = self.travel_times.ids[self.restaurants[k]]
+                route = Route([Order(self.order_store, int(i)) for i in self.routes[k]], restaurant_id, self.beta, self.gamma)
+                routes_by_restaurant.setdefault(restaurant_id, []).append(route)
+        return list(routes_by_restaurant.values())
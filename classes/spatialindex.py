@@ -0,0 +1,102 @@
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+from classes.traveltimematrix import TravelTimeMatrix
+
+class CourierGrid(object):
+    def __init__(self, locations:pd.DataFrame, travel_times:TravelTimeMatrix, cell_minutes:float):
+        '''
+        Initialize a uniform grid over the positions of the couriers.
+        Each cell covers cell_minutes of travel in both directions, so the couriers within a travel time radius of a
+        location are found by scanning the cells around it instead of every courier.
+        '''
+        self.travel_times = travel_times
+        self.cell_size = cell_minutes*travel_times.meters_per_minute # side of a cell in meters
+        self.x = locations['x'].to_numpy(dtype=np.float64) # x coordinate of each location, in matrix index order
+        self.y = locations['y'].to_numpy(dtype=np.float64) # y coordinate of each location, in matrix index order
+
+        self.cells = defaultdict(dict) # couriers in each cell, as courier id -> location index
+        self.courier_cell = {} # the cell of each courier
+        self.x_range = (np.floor(self.x.min()/self.cell_size), np.floor(self.x.max()/self.cell_size)) # smallest and largest column of the grid
+        self.y_range = (np.floor(self.y.min()/self.cell_size), np.floor(self.y.max()/self.cell_size)) # smallest and largest row of the grid
+        self.max_ring = int(max(self.x_range[1] - self.x_range[0], self.y_range[1] - self.y_range[0])) # number of rings around any cell that cover the whole grid
+
+    def get_cell(self, location:int) -> tuple:
+        '''
+        Get the cell of a location index
+        '''
+        return (int(self.x[location]//self.cell_size), int(self.y[location]//self.cell_size))
+
+    def update(self, courier_id:str, position_id:str):
+        '''
+        Move a courier to a new position, or add it to the grid if it is not in it yet
+        '''
+        location = self.travel_times.index[position_id]
+        cell = self.get_cell(location)
+
+        old_cell = self.courier_cell.get(courier_id)
+        if old_cell is not None and old_cell != cell: # if the courier leaves its cell
+            del self.cells[old_cell][courier_id]
+        self.cells[cell][courier_id] = location
+        self.courier_cell[courier_id] = cell
+
+    def remove(self, courier_id:str):
+        '''
+        Take a courier out of the grid
+        '''
+        cell = self.courier_cell.pop(courier_id, None)
+        if cell is not None:
+            del self.cells[cell][courier_id]
+            if not self.cells[cell]: # keep only the cells with couriers
+                del self.cells[cell]
+
+    def get_ring(self, cell:tuple, ring:int):
+        '''
+        Get the couriers of the cells at exactly ring cells from a cell, as (courier id, location index) pairs
+        '''
+        cx, cy = cell
+        if ring == 0:
+            yield from self.cells.get(cell, {}).items()
+            return
+        for dx in range(-ring, ring+1): # top and bottom rows of the ring
+            for dy in (-ring, ring):
+                yield from self.cells.get((cx+dx, cy+dy), {}).items()
+        for dy in range(-ring+1, ring): # left and right columns of the ring
+            for dx in (-ring, ring):
+                yield from self.cells.get((cx+dx, cy+dy), {}).items()
+
+    def within_radius(self, location_id:str, radius:float, members:dict) -> list:
+        '''
+        Get the couriers in members whose travel time to a location is at most radius minutes.
+        members maps the courier ids to consider to their column, and the columns are returned.
+        '''
+        location = self.travel_times.index[location_id]
+        cell = self.get_cell(location)
+        rings = min(int(np.ceil(radius*self.travel_times.meters_per_minute/self.cell_size)), self.max_ring) # a courier farther than this many rings is out of reach
+
+        columns = []
+        for ring in range(rings+1):
+            for courier_id, courier_location in self.get_ring(cell, ring):
+                if courier_id in members and self.travel_times.matrix[courier_location, location] <= radius:
+                    columns.append(members[courier_id])
+        return columns
+
+    def nearest(self, location_id:str, k:int, members:dict) -> list:
+        '''
+        Get the k couriers in members with the smallest travel time to a location, ties broken by column.
+        members maps the courier ids to consider to their column, and the columns are returned.
+        '''
+        location = self.travel_times.index[location_id]
+        cell = self.get_cell(location)
+
+        found = [] # (travel time, column) of the couriers seen so far
+        for ring in range(self.max_ring+1):
+            for courier_id, courier_location in self.get_ring(cell, ring):
+                if courier_id in members:
+                    found.append((float(self.travel_times.matrix[courier_location, location]), members[courier_id]))
+            if len(found) >= k:
+                found.sort()
+                if found[k-1][0] < ring*self.cell_size/self.travel_times.meters_per_minute: # every courier outside the rings seen is farther than the k-th nearest
+                    break
+        found.sort()
+        return [column for _, column in found[:k]]
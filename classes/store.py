@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+from classes.traveltimematrix import TravelTimeMatrix
+
+class OrderData(object):
+    def __init__(self, data:np.ndarray, ids:list, location_ids:list, courier_ids:list):
+        '''
+        Initialize the static data of the orders of an instance: one structured array with a row per order.
+        It is read-only, so every run on the instance can share it.
+        '''
+        self.data = data # static instance data
+        self.ids = ids # order ids in row order
+        self.location_ids = location_ids # location ids in matrix index order
+        self.courier_ids = courier_ids # courier ids in courier index order
+        self.courier_index = {courier_id: i for i, courier_id in enumerate(courier_ids)} # map each courier id to its index
+
+        self.placement_time = data['placement_time'] # column views of the static data
+        self.ready_time = data['ready_time']
+        self.restaurant = data['restaurant'] # location index of the restaurant
+        self.location = data['location'] # location index of the order
+        self.x = data['x']
+        self.y = data['y']
+
+    @classmethod
+    def from_frame(cls, orders:pd.DataFrame, travel_times:TravelTimeMatrix, courier_ids:list):
+        '''
+        Build the static order data from the orders table
+        '''
+        data = np.empty(len(orders), dtype=[('placement_time', orders['placement_time'].to_numpy().dtype),
+                                            ('ready_time', orders['ready_time'].to_numpy().dtype),
+                                            ('restaurant', np.int32),
+                                            ('location', np.int32),
+                                            ('x', orders['x'].to_numpy().dtype),
+                                            ('y', orders['y'].to_numpy().dtype)])
+        ids = list(orders['order'])
+        data['placement_time'] = orders['placement_time'].to_numpy()
+        data['ready_time'] = orders['ready_time'].to_numpy()
+        data['restaurant'] = travel_times.get_indices(list(orders['restaurant']))
+        data['location'] = travel_times.get_indices(ids)
+        data['x'] = orders['x'].to_numpy()
+        data['y'] = orders['y'].to_numpy()
+
+        return cls(data, ids, travel_times.ids, list(courier_ids))
+
+class OrderStore(object):
+    def __init__(self, static:OrderData):
+        '''
+        Initialize a columnar store of the orders of one run.
+        The static instance data is shared and the outcomes of the run are kept in a structured array of their own,
+        so a run can be reset without reading the instance again. Order objects are views on a row of the store.
+        '''
+        self.static = static
+        self.ids = static.ids
+        self.location_ids = static.location_ids
+        self.courier_ids = static.courier_ids
+        self.courier_index = static.courier_index
+        self.placement_time = static.placement_time # column views of the static data
+        self.ready_time = static.ready_time
+        self.restaurant = static.restaurant
+        self.location = static.location
+        self.x = static.x
+        self.y = static.y
+
+        self.reset()
+
+    def reset(self):
+        '''
+        Clear the outcomes of a run
+        '''
+        self.state = np.zeros(len(self.ids), dtype=[('pickup_time', np.float64),
+                                                    ('dropoff_time', np.float64),
+                                                    ('assign_time', np.int64),
+                                                    ('courier', np.int32)]) # per-run mutable state
+        self.state['courier'] = -1 # no courier
+
+        self.pickup_time = self.state['pickup_time'] # column views of the mutable state
+        self.dropoff_time = self.state['dropoff_time']
+        self.assign_time = self.state['assign_time']
+        self.courier = self.state['courier']
+
+class CourierData(object):
+    def __init__(self, data:np.ndarray, ids:list, location_ids:list, location_index:dict):
+        '''
+        Initialize the static data of the couriers of an instance: one structured array with a row per courier.
+        It is read-only, so every run on the instance can share it.
+        '''
+        self.data = data # static instance data
+        self.ids = ids # courier ids in row order
+        self.location_ids = location_ids # location ids in matrix index order
+        self.location_index = location_index # map each location id to its index in the matrix
+
+        self.on_time = data['on_time'] # column views of the static data
+        self.off_time = data['off_time']
+        self.location = data['location'] # location index of the courier
+        self.x = data['x']
+        self.y = data['y']
+
+    @classmethod
+    def from_frame(cls, couriers:pd.DataFrame, travel_times:TravelTimeMatrix):
+        '''
+        Build the static courier data from the couriers table
+        '''
+        data = np.empty(len(couriers), dtype=[('on_time', couriers['on_time'].to_numpy().dtype),
+                                              ('off_time', couriers['off_time'].to_numpy().dtype),
+                                              ('location', np.int32),
+                                              ('x', couriers['x'].to_numpy().dtype),
+                                              ('y', couriers['y'].to_numpy().dtype)])
+        ids = list(couriers['courier'])
+        data['on_time'] = couriers['on_time'].to_numpy()
+        data['off_time'] = couriers['off_time'].to_numpy()
+        data['location'] = travel_times.get_indices(ids)
+        data['x'] = couriers['x'].to_numpy()
+        data['y'] = couriers['y'].to_numpy()
+
+        return cls(data, ids, travel_times.ids, travel_times.index)
+
+class CourierStore(object):
+    def __init__(self, static:CourierData):
+        '''
+        Initialize a columnar store of the couriers of one run.
+        The static instance data is shared and the state of the run is kept in a structured array of its own,
+        so a run can be reset without reading the instance again. Courier objects are views on a row of the store.
+        '''
+        self.static = static
+        self.ids = static.ids
+        self.location_ids = static.location_ids
+        self.location_index = static.location_index
+        self.on_time = static.on_time # column views of the static data
+        self.off_time = static.off_time
+        self.location = static.location
+        self.x = static.x
+        self.y = static.y
+
+        self.reset()
+
+    def reset(self):
+        '''
+        Clear the state of a run, every courier waits at its own location from its on time
+        '''
+        self.state = np.zeros(len(self.ids), dtype=[('next_available_time', np.float64),
+                                                    ('position', np.int32)]) # per-run mutable state
+        self.state['next_available_time'] = self.on_time
+        self.state['position'] = self.location
+
+        self.next_available_time = self.state['next_available_time'] # column views of the mutable state
+        self.position = self.state['position']
+        self.assignments = [[] for _ in self.ids] # assignments of each courier
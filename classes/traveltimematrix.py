@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+class TravelTimeMatrix(object):
+    def __init__(self, locations:pd.DataFrame, meters_per_minute, dtype=np.float32):
+        '''
+        Initialize a travel time matrix.
+        Every order, restaurant and courier id is mapped to an integer index and the ceil'd travel time in minutes
+        between every pair of locations is computed once, so a lookup is a single array read.
+        '''
+        self.ids = list(locations.index) # location ids in index order
+        self.index = {location_id: i for i, location_id in enumerate(self.ids)} # map each location id to its index in the matrix
+        self.meters_per_minute = meters_per_minute
+
+        x = locations['x'].to_numpy(dtype=np.float64) # x coordinates of all locations
+        y = locations['y'].to_numpy(dtype=np.float64) # y coordinates of all locations
+        dist = np.sqrt(np.subtract.outer(x, x)**2 + np.subtract.outer(y, y)**2) # distance between every pair of locations
+        self.matrix = np.ceil(dist/meters_per_minute).astype(dtype) # travel time between every pair of locations in minutes
+
+    @classmethod
+    def from_matrix(cls, ids:list, matrix:np.ndarray, meters_per_minute):
+        '''
+        Initialize a travel time matrix from a matrix computed before, e.g. a memory-mapped one from the instance cache
+        '''
+        travel_times = cls.__new__(cls)
+        travel_times.ids = list(ids)
+        travel_times.index = {location_id: i for i, location_id in enumerate(travel_times.ids)}
+        travel_times.meters_per_minute = meters_per_minute
+        travel_times.matrix = matrix
+        return travel_times
+
+    def get_index(self, location_id:str) -> int:
+        '''
+        Get the matrix index of a location id
+        '''
+        return self.index[location_id]
+
+    def get_indices(self, location_ids:list) -> np.ndarray:
+        '''
+        Get the matrix indices of a list of location ids
+        '''
+        return np.fromiter((self.index[location_id] for location_id in location_ids), dtype=np.intp, count=len(location_ids))
+
+    def travel_time(self, origin_id:str, destination_id:str) -> float:
+        '''
+        Get the travel time between two locations in minutes
+        '''
+        return float(self.matrix[self.index[origin_id], self.index[destination_id]])
+
+    def travel_time_by_index(self, origin:int, destination:int) -> float:
+        '''
+        Get the travel time between two matrix indices in minutes
+        '''
+        return float(self.matrix[origin, destination])
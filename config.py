@@ -5,4 +5,42 @@ GAMMA = 10 # Control the click-to-door time in the construction of bundles, shou
 OMEGA = 1000 # controlling the undelivered orders
 X = 25 # the number of minutes that is considered a long waiting time
 COMMITMENT_STRATEGY = 0 # 0: no commitment, 1: commitment
-INSTANCE_DIR = './data/5o50t75s1p100'
\ No newline at end of file
+BATCHED_CONSTRUCTION = True # True: score all bundle and position candidates of a restaurant at once in bundle construction, False: one candidate at a time
+LS_STRATEGY = 'best' # 'best': apply the best move of the neighbourhood in local search, 'first': apply the first improving move
+LS_MAX_ITERATIONS = 0 # the maximum number of moves applied per restaurant in local search, 0: until no improving move is left
+LS_EXCHANGE = True # True: try to swap orders between routes in local search in addition to relocating them
+RESTAURANT_WORKERS = 0 # the number of worker processes that build and improve the routes of the restaurants of a decision epoch, 0 or 1: in the solving process
+RESTAURANT_MIN_PARALLEL = 32 # the smallest number of restaurants with ready orders for which a decision epoch is built in the worker processes
+RESTAURANT_CHUNK_SIZE = 16 # the largest number of restaurants sent to a worker process at once
+MATCHING_BACKEND = 'docplex' # 'docplex': binary program solved with CPLEX, 'lsa': linear sum assignment solved with scipy
+CANDIDATE_PRUNING = 'none' # 'none': every idle courier is a candidate for every route, 'radius': couriers within CANDIDATE_RADIUS minutes of the restaurant, 'knn': the CANDIDATE_K couriers nearest to the restaurant
+CANDIDATE_RADIUS = 30 # the travel time in minutes within which a courier is a candidate for a route when CANDIDATE_PRUNING is 'radius'
+CANDIDATE_K = 10 # the number of nearest couriers that are candidates for a route when CANDIDATE_PRUNING is 'knn'
+SPATIAL_CELL_MINUTES = 5 # the side of a cell of the courier grid in minutes of travel
+INSTANCE_CACHE = True # True: read instances from a compiled cache of .npy files in each instance directory, built on first use, the text files are read if the directory cannot be written
+INSTANCE_CACHE_DIR = '.instance_cache' # the name of the cache directory inside each instance directory, it holds one build per version of the source files
+INSTANCE_CACHE_TRAVEL_TIMES = False # True: also embed the travel time matrix in the cache (up to 60MB per instance)
+INSTANCE_DIR = './data/5o50t75s1p100'
+HORIZON_MINUTES = 0 # the simulated horizon in minutes, decision epochs run up to it, 0: the whole days that cover the orders and shifts of the instance
+SOLUTION_SINK = 'text' # 'text': the solution files read by the evaluator, 'columnar': numbered .npz files with one array per column
+SOLUTION_BUFFER_SIZE = 1000 # the number of solution records kept in memory before they are written
+ARCHIVE_ASSIGNMENTS = True # True: keep the assignments of retired couriers in memory, False: drop those already written to the solution sink
+ALNS_BUDGET_SECONDS = 30 # the wall-clock budget of an ALNS run in seconds
+ALNS_MIN_REMOVED = 5 # the smallest number of orders a removal operator takes out in one ALNS iteration
+ALNS_MAX_REMOVED = 20 # the largest number of orders a removal operator takes out in one ALNS iteration
+ALNS_SEGMENT = 100 # the number of ALNS iterations between two updates of the operator weights
+ALNS_REACTION = 0.1 # how far the operator weights move toward the scores of the last segment
+ALNS_SCORES = (33, 9, 13) # the score of an operator for a new best state, a better state and an accepted worse state
+ALNS_START_TEMPERATURE = 0 # the starting temperature of the simulated annealing acceptance, 0: only states that are not worse are accepted
+ALNS_COOLING = 0.999 # the factor applied to the temperature after each ALNS iteration
+ALNS_REGRET_K = 3 # the number of routes compared by the regret-k insertion
+ALNS_WORST_RANDOMNESS = 3 # the bias of the worst removal toward the orders with the largest savings, 1: uniform
+ALNS_SHAW_RANDOMNESS = 6 # the bias of the Shaw removal toward the orders most related to the seed, 1: uniform
+ALNS_MIGRATION_SECONDS = 0 # the seconds between two migrations of the best solution to every chain of a parallel ALNS run, 0: independent chains
+PROFILE_WORST_TICKS = 10 # the number of slowest decision epochs listed in the summary of a profiled run
+BENCHMARK_INSTANCE = './data/0o100t75s1p125' # the instance the micro-benchmarks run on
+BENCHMARK_REPEATS = 10 # the number of times each benchmark is timed, the fastest timing is kept
+BENCHMARK_MIN_SECONDS = 0.5 # each timing of a benchmark loops it until it takes at least this many seconds, so short benchmarks are timed well above the jitter of the machine
+BENCHMARK_INSTANCES_PER_FAMILY = 1 # the number of instances of each family, e.g. o100t75s1p125, run by the end-to-end benchmarks
+BENCHMARK_BASELINE = 'benchmarks/baseline.json' # the benchmark results new runs are compared to
+BENCHMARK_THRESHOLD = 0.25 # the relative slowdown over the baseline at which a benchmark fails
@@ -2,6 +2,7 @@ import matplotlib.pyplot as plt
 from classes.deliveryrouting import DeliveryRouting
 
 def orders_list(dr: DeliveryRouting, final_result, orders, locations, file_name, instance_dir):
+    dr.rebucket(dr.f, dr.delta_u) # the buckets of the solved epochs were dropped during the run
     print('Number of orders:', len(dr.orders))
     print('Number of orders in horizon list:', sum([len(v) for v in dr.orders_by_horizon_interval.values()]))
     orders_in_initilization = 0
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from classes.traveltimematrix import TravelTimeMatrix
+
+# Import the config file
+from config import *
+instance_cache = INSTANCE_CACHE
+instance_cache_dir = INSTANCE_CACHE_DIR
+instance_cache_travel_times = INSTANCE_CACHE_TRAVEL_TIMES
+
+cache_version = 2 # bump when the layout of the cache changes
+source_files = ['orders.txt', 'restaurants.txt', 'couriers.txt', 'instance_parameters.txt'] # the files a cache is compiled from
+
+def get_source_stamp(instance_dir) -> dict:
+    '''
+    Get the modification time and size of each source file of an instance
+    '''
+    stamp = {}
+    for name in source_files:
+        stat = os.stat(os.path.join(instance_dir, name))
+        stamp[name] = [stat.st_mtime_ns, stat.st_size]
+    return stamp
+
+def get_build_dir(instance_dir, travel_times:bool) -> str:
+    '''
+    Get the directory of the cache build of the current source files of an instance, with or without the travel time matrix.
+    A build is named after a hash of the cache layout and of the source stamp, so an edited instance gets a new build instead of replacing the old one.
+    '''
+    key = hashlib.sha1(json.dumps([cache_version, get_source_stamp(instance_dir)]).encode()).hexdigest()[:16]
+    return os.path.join(instance_dir, instance_cache_dir, key + ('_travel_times' if travel_times else ''))
+
+def is_cache_valid(cache_dir, instance_dir, travel_times:bool) -> bool:
+    '''
+    Check that a cache build exists, has the current layout, was compiled from the current source files and holds the travel time matrix if it is needed
+    '''
+    try:
+        with open(os.path.join(cache_dir, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if meta.get('version') != cache_version or meta.get('source') != get_source_stamp(instance_dir):
+        return False
+    return meta.get('has_travel_times') or not travel_times
+
+def build_instance_cache(instance_dir, cache_dir, travel_times:bool = instance_cache_travel_times) -> bool:
+    '''
+    Compile the text files of an instance into a directory of .npy files and a meta.json file, and return whether cache_dir holds a valid build.
+    Every order, restaurant and courier id is interned to its position in location_ids.npy, and the restaurant of each order is stored as that code.
+    The build is written to a temporary directory first and renamed to cache_dir, which is never replaced once it exists,
+    so a concurrent reader never sees a partial or removed build. It returns False if the instance directory cannot be written.
+    '''
+    stamp = get_source_stamp(instance_dir) # stamp the files before reading them, so a file changed while compiling invalidates the cache
+    try:
+        os.makedirs(os.path.dirname(cache_dir), exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix='.tmp', dir=os.path.dirname(cache_dir))
+        os.chmod(tmp_dir, 0o755) # readable by the other users of the instance, mkdtemp makes it private
+    except OSError: # the instance directory is read-only, the caller reads the text files
+        return False
+
+    try:
+        orders = pd.read_table(os.path.join(instance_dir, 'orders.txt')) # read orders
+        restaurants = pd.read_table(os.path.join(instance_dir, 'restaurants.txt')) # read restaurants
+        couriers = pd.read_table(os.path.join(instance_dir, 'couriers.txt')) # read couriers
+        instanceparams = pd.read_table(os.path.join(instance_dir, 'instance_parameters.txt')) # read instance parameters
+
+        location_ids = np.array(list(orders['order']) + list(restaurants['restaurant']) + list(couriers['courier']), dtype=str) # orders, then restaurants, then couriers
+        code = {location_id: i for i, location_id in enumerate(location_ids)}
+
+        arrays = {
+            'location_ids': location_ids,
+            'orders_x': orders['x'].to_numpy(),
+            'orders_y': orders['y'].to_numpy(),
+            'orders_placement_time': orders['placement_time'].to_numpy(),
+            'orders_restaurant': np.array([code[r_id] for r_id in orders['restaurant']], dtype=np.int32), # interned restaurant of each order
+            'orders_ready_time': orders['ready_time'].to_numpy(),
+            'restaurants_x': restaurants['x'].to_numpy(),
+            'restaurants_y': restaurants['y'].to_numpy(),
+            'couriers_x': couriers['x'].to_numpy(),
+            'couriers_y': couriers['y'].to_numpy(),
+            'couriers_on_time': couriers['on_time'].to_numpy(),
+            'couriers_off_time': couriers['off_time'].to_numpy(),
+        }
+        meta = {
+            'version': cache_version,
+            'source': stamp,
+            'counts': {'orders': len(orders), 'restaurants': len(restaurants), 'couriers': len(couriers)},
+            'instanceparams': {k: v.item() if hasattr(v, 'item') else v for k, v in instanceparams.iloc[0].items()}, # instance parameters as native values
+            'has_travel_times': bool(travel_times),
+        }
+        if travel_times: # embed the travel time matrix
+            locations = pd.DataFrame({'x': np.concatenate([arrays['orders_x'], arrays['restaurants_x'], arrays['couriers_x']]),
+                                      'y': np.concatenate([arrays['orders_y'], arrays['restaurants_y'], arrays['couriers_y']])}, index=location_ids)
+            arrays['travel_times'] = TravelTimeMatrix(locations, meta['instanceparams']['meters_per_minute']).matrix
+
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, name + '.npy'), array)
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        os.rename(tmp_dir, cache_dir) # atomic, and fails if another process has already moved the same build in place
+        return True
+    except OSError: # another process has just written the same build, or the disk is full
+        return is_cache_valid(cache_dir, instance_dir, travel_times)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True) # gone already if it was renamed
+
+def load_instance_cache(instance_dir, travel_times:bool = instance_cache_travel_times) -> dict:
+    '''
+    Load the compiled instance, compiling it first if there is no valid cache build, or get None if the cache cannot be written,
+    in which case the caller reads the text files. Arrays are memory-mapped, so loading does not read or copy them until they are used.
+    Builds of older source files are left in place, since a concurrent run may still be loading them, and can be deleted by hand.
+    '''
+    cache_dir = get_build_dir(instance_dir, travel_times)
+    if not travel_times and is_cache_valid(get_build_dir(instance_dir, True), instance_dir, False): # a build with the travel time matrix holds everything else too
+        cache_dir = get_build_dir(instance_dir, True)
+    if not is_cache_valid(cache_dir, instance_dir, travel_times) and not build_instance_cache(instance_dir, cache_dir, travel_times):
+        return None
+
+    with open(os.path.join(cache_dir, 'meta.json'), 'r') as f:
+        cache = json.load(f)
+    for name in os.listdir(cache_dir):
+        if name.endswith('.npy'):
+            cache[name[:-4]] = np.load(os.path.join(cache_dir, name), mmap_mode='r')
+    return cache
+
+def get_instance_frames(cache:dict):
+    '''
+    Build the orders, restaurants, couriers, instance parameters and locations tables of a compiled instance,
+    with the same columns as the text files
+    '''
+    n_orders, n_restaurants = cache['counts']['orders'], cache['counts']['restaurants']
+    ids = cache['location_ids'].tolist() # interned ids as strings
+    order_ids, restaurant_ids, courier_ids = ids[:n_orders], ids[n_orders:n_orders+n_restaurants], ids[n_orders+n_restaurants:]
+
+    orders = pd.DataFrame({'order': order_ids, 'x': cache['orders_x'], 'y': cache['orders_y'],
+                           'placement_time': cache['orders_placement_time'],
+                           'restaurant': [ids[i] for i in cache['orders_restaurant']],
+                           'ready_time': cache['orders_ready_time']})
+    restaurants = pd.DataFrame({'restaurant': restaurant_ids, 'x': cache['restaurants_x'], 'y': cache['restaurants_y']})
+    couriers = pd.DataFrame({'courier': courier_ids, 'x': cache['couriers_x'], 'y': cache['couriers_y'],
+                             'on_time': cache['couriers_on_time'], 'off_time': cache['couriers_off_time']})
+    instanceparams = pd.DataFrame([cache['instanceparams']])
+    locations = pd.DataFrame({'x': np.concatenate([cache['orders_x'], cache['restaurants_x'], cache['couriers_x']]),
+                              'y': np.concatenate([cache['orders_y'], cache['restaurants_y'], cache['couriers_y']])},
+                             index=pd.Index(ids, name='id')) # location of every order, restaurant and courier
+
+    return orders, restaurants, couriers, instanceparams, locations
+
+def get_travel_time_matrix(instance_dir, locations:pd.DataFrame, meters_per_minute) -> TravelTimeMatrix:
+    '''
+    Get the travel time matrix of an instance, read from the cache if the matrix is embedded in it and computed otherwise, or if the cache cannot be written
+    '''
+    cache = load_instance_cache(instance_dir, travel_times=True) if instance_cache and instance_cache_travel_times else None
+    if cache is not None:
+        return TravelTimeMatrix.from_matrix(cache['location_ids'].tolist(), cache['travel_times'], meters_per_minute)
+    return TravelTimeMatrix(locations, meters_per_minute)
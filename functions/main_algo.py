@@ -1,77 +1,95 @@
+import time
 from classes.deliveryrouting import DeliveryRouting
-from collections import defaultdict
-from docplex.mp.model import Model
+from classes.instancecontext import InstanceContext
+from classes.matching import get_matching_backend
+from classes.parameters import Parameters
+from classes.profiler import NullProfiler
+from classes.restaurantpool import RestaurantPool
+from classes.solutionsink import SolutionSink
 
-def algo(instance_dir):
+# Import the config file
+from config import *
+matching_backend = MATCHING_BACKEND
+candidate_pruning = CANDIDATE_PRUNING
+restaurant_workers = RESTAURANT_WORKERS
 
-    dr = DeliveryRouting(instance_dir)  # initialize a delivery routing problem
-    dr.get_ready_orders()
-    t_list = [*range(0, 24*60+1, dr.f)]
-    for t in t_list:
+def solve_epoch(dr:DeliveryRouting, t:int, backend, pruning=candidate_pruning, pool:RestaurantPool = None) -> list:
+    '''
+    Solve the decision epoch t: build the routes of its orders, match them to the idle couriers and assign them,
+    then retire the couriers and orders the later epochs no longer need. Return the (courier, route) pairs assigned.
+    The routes of the restaurants are built in the worker processes of pool if it is given and the epoch has enough restaurants.
+    '''
+    with dr.profiler.tick(t) as profiler: # records the time of each phase of the epoch if the run is profiled
         ready_orders = dr.get_ready_orders_at_t(t)
         idle_couriers = dr.get_idle_courier_at_t(t)
         bundle_size = int(dr.get_bundle_size(t))
-        if len(ready_orders)>0:
-            list_of_routes_by_restaurant = dr.initialization(t,ready_orders,idle_couriers,bundle_size)
+        if len(ready_orders) == 0:
+            profiler.lap('bucketing')
+            dr.retire(t)
+            profiler.lap('retire')
+            return []
+        orders_by_restaurant = dr.get_ready_orders_by_restaurant_at_t(t)
+        profiler.lap('bucketing')
+
+        if pool is not None and pool.accepts(orders_by_restaurant): # bundle construction and local search of each restaurant in the workers
+            list_of_routes_by_restaurant = pool.build_routes(dr, orders_by_restaurant, bundle_size)
+            profiler.lap('restaurant_pool')
+        else:
+            list_of_routes_by_restaurant = dr.initialization(t,ready_orders,idle_couriers,bundle_size,orders_by_restaurant)
+            profiler.lap('initialization')
             list_of_routes_by_restaurant = dr.local_search(list_of_routes_by_restaurant)
+            profiler.lap('local_search')
+        dr.record_routes(t, list_of_routes_by_restaurant)
+        profiler.lap('record_routes')
+
+        list_of_route = [route for r in list_of_routes_by_restaurant for route in r]
+
+        # feasibility and pickup delay of each route and courier pair
+        feasible, cost = dr.get_assignment_matrices(t, list_of_route, idle_couriers)
+        if pruning != 'none': # only the couriers near the restaurant of a route are candidates for it
+            feasible &= dr.get_candidate_mask(list_of_route, idle_couriers, pruning)
+        profiler.lap('feasibility')
 
-            
-            # create mp model
-            m = Model('bundle_assignment')
+        # solve the matching problem
+        start = time.perf_counter()
+        assignments = backend.solve(cost, feasible, dr.params.omega)
+        dr.matching_times[t] = time.perf_counter() - start # record the solve time of the tick
+        profiler.lap('solve', model = backend.build_time) # the model construction is timed by the backend
 
-            list_of_route = [route for r in list_of_routes_by_restaurant for route in r]
-            route_index = [i for i in range(len(list_of_route))]
-            courier_index = [0]+[j+1 for j in range(len(idle_couriers))]
-            route_courier_list = [(i,j) for i in route_index for j in courier_index]
-            
-            # create variables
-            route_courier = m.binary_var_dict(route_courier_list, name='route_courier')
-            can_assign = {}
-            for i in route_index:
-                for j in courier_index: 
-                    if j>0:
-                        if not dr.can_assign(t, idle_couriers[j-1],list_of_route[i]):
-                            can_assign[(i,j)] = 0
-                        else:
-                            can_assign[(i,j)] = 1
-            
-            # set objective
-            number_of_order_assign_to_pseudo_courier = m.sum(route_courier[i,0] for i in route_index)
-            real_pickup_delay = 0
-            for i in route_index:
-                for j in courier_index:
-                    if j>0:
-                        route = list_of_route[i]
-                        courier = idle_couriers[j-1]
-                        arrival_time = courier.next_available_time +\
-                            dr.dropoff_service_minutes/2 +\
-                            dr.travel_time(courier.position_after_last_assignment,route.restaurant_id) +\
-                            dr.pickup_service_minutes/2
-                        route_ready_time = route.get_ready_time()
-                        real_pickup_delay += max(0,arrival_time-route_ready_time)*route_courier[i,j]
-            m.minimize(number_of_order_assign_to_pseudo_courier+real_pickup_delay)
-            # constraints
-            # each route is assigned to one courier
-            for i in route_index:
-                m.add_constraint(m.sum(route_courier[i,j] for j in courier_index)==1)
-            # each courier is assigned to at most one route
-            for j in courier_index:
-                if j != 0:
-                    m.add_constraint(m.sum(route_courier[i,j] for i in route_index)<=1)
-            # check condition can_assign
-            for i in route_index:
-                for j in courier_index: 
-                    if j>0:
-                        m.add_constraint(route_courier[i,j]<=can_assign[(i,j)])
-            
-            # solve model
-            solution = m.solve(log_output = False) 
+        # assign routes to couriers
+        for i, j in assignments:
+            dr.assign_bundle(t, idle_couriers[j], list_of_route[i])
+        profiler.lap('assign_bundle')
+        dr.retire(t)
+        profiler.lap('retire')
+        profiler.record(orders = len(ready_orders), restaurants = len(orders_by_restaurant), routes = len(list_of_route),
+                        couriers = len(idle_couriers), variables = backend.variables, assigned = len(assignments))
 
-            # assign routes to couriers
-            for i in route_index:
-                for j in courier_index:
-                    if solution.get_value(route_courier[i,j]) == 1:
-                        if j != 0:
-                            dr.assign_bundle(t, idle_couriers[j-1], list_of_route[i])
+    return [(idle_couriers[j], list_of_route[i]) for i, j in assignments]
+
+def handle_epoch(dr:DeliveryRouting, t:int, kinds:set, backend, pruning=candidate_pruning, pool:RestaurantPool = None) -> list:
+    '''
+    Handle the events of the decision epoch t: solve it if an order bucket is released at it, otherwise only retire the shifts that ended.
+    Return the (courier, route) pairs assigned.
+    '''
+    if 'orders' in kinds:
+        return solve_epoch(dr, t, backend, pruning, pool)
+    dr.retire(t)
+    return []
+
+def algo(instance_dir, matching=matching_backend, pruning=candidate_pruning, params:Parameters = None, context:InstanceContext = None, sink:SolutionSink = None,
+         workers:int = restaurant_workers, profiler:NullProfiler = None):
+
+    dr = DeliveryRouting(instance_dir, params, context, sink)  # initialize a delivery routing problem, with the parameters in config.py if params is not given and the instance data of context if it is given
+    backend = get_matching_backend(matching) # the backend that solves the matching problem of each tick
+    if profiler is not None: # a TickProfiler records each decision epoch solved
+        dr.profiler = profiler
+    dr.get_ready_orders()
+    calendar = dr.get_calendar() # the epochs with orders or ending shifts, the other epochs have nothing to decide
+    with RestaurantPool(dr.context, dr.params, workers) as pool, dr.profiler: # the workers are only started by the first epoch with enough restaurants
+        while calendar:
+            t = calendar.next_epoch()
+            handle_epoch(dr, t, calendar.pop(t), backend, pruning, pool)
 
-    return dr
\ No newline at end of file
+    dr.close_sink() # write the assignments still tentative at the end of the day
+    return dr
@@ -0,0 +1,99 @@
+import time
+import numpy as np
+from classes.deliveryrouting import DeliveryRouting
+from classes.eventcalendar import EventCalendar
+from classes.instancecontext import InstanceContext
+from classes.matching import get_matching_backend
+from classes.orderfeed import OrderFeed
+from classes.parameters import Parameters
+from classes.profiler import NullProfiler
+from classes.restaurantpool import RestaurantPool
+from classes.solutionsink import SolutionSink
+from functions.main_algo import handle_epoch
+
+# Import the config file
+from config import *
+matching_backend = MATCHING_BACKEND
+candidate_pruning = CANDIDATE_PRUNING
+restaurant_workers = RESTAURANT_WORKERS
+
+def dispatch(instance_dir, feed:OrderFeed, matching=matching_backend, pruning=candidate_pruning, params:Parameters = None,
+             context:InstanceContext = None, sink:SolutionSink = None, speedup:float = 0, publish = None, workers:int = restaurant_workers,
+             profiler:NullProfiler = None) -> DeliveryRouting:
+    '''
+    Run the algorithm online: orders and courier shifts are only known once the feed delivers them.
+    Decision epochs are every f minutes of simulated time up to the horizon of the instance, run as fast as possible if speedup is 0,
+    otherwise in accelerated wall-clock time, speedup simulated minutes per wall-clock minute from the call.
+    Each epoch takes the events before its time, an order that comes after its epoch was solved goes to the next one.
+    Only the epochs with events in the calendar are handled, and without a wall clock the epochs before the next event are skipped.
+    The final assignments are written to sink as they are made and publish(t, assigned) is called with the (courier, route) pairs of each epoch handled.
+    The decision latency of each epoch handled is recorded in dr.epoch_latencies, and the phases of each epoch solved in profiler if it is given.
+    '''
+    dr = DeliveryRouting(instance_dir, params, context, sink) # the instance data is read, but its orders and couriers are revealed by the feed
+    dr.start_online()
+    if profiler is not None:
+        dr.profiler = profiler
+    backend = get_matching_backend(matching) # the backend that solves the matching problem of each tick
+    calendar = dr.get_calendar() # filled with the orders and shifts the feed reveals
+
+    with RestaurantPool(dr.context, dr.params, workers) as pool, dr.profiler: # the workers are only started by the first epoch with enough restaurants
+        clock_start = time.perf_counter()
+        t = 0
+        while t <= dr.horizon:
+            if speedup > 0: # wait for the time of the epoch
+                delay = clock_start + t*60/speedup - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            start = time.perf_counter()
+            for _, kind, event_id in feed.get_events(t):
+                if kind == 'order':
+                    epoch = dr.add_order(event_id, not_before=t)
+                    if epoch is not None:
+                        calendar.schedule(epoch, 'orders')
+                else:
+                    dr.add_courier(event_id)
+                    calendar.schedule(dr.get_retire_epoch(event_id), 'shift_end')
+
+            kinds = calendar.pop(t)
+            if kinds:
+                assigned = handle_epoch(dr, t, kinds, backend, pruning, pool)
+                dr.epoch_latencies[t] = time.perf_counter() - start # from the events of the epoch to its assignments
+                if publish is not None:
+                    publish(t, assigned)
+
+            t = get_next_epoch(dr, t, feed, calendar, speedup)
+
+    dr.close_sink() # write the assignments still tentative at the end of the day
+    return dr
+
+def get_next_epoch(dr:DeliveryRouting, t:int, feed:OrderFeed, calendar:EventCalendar, speedup:float = 0) -> int:
+    '''
+    Get the epoch after t to handle. With a wall clock every epoch is visited, since events can come at any time,
+    otherwise the next epoch is the first one with an event in the calendar or in the feed.
+    '''
+    if speedup > 0:
+        return t + dr.f
+    next_epochs = [] if calendar.next_epoch() is None else [calendar.next_epoch()]
+    next_time = feed.next_time()
+    if next_time is not None:
+        next_epochs.append(calendar.get_epoch(next_time)) # the epoch that takes the next event of the feed
+    if not next_epochs:
+        return dr.horizon + 1 if feed.is_done() else t + dr.f # stop, or wait for a producer that is not done
+    return max(t + dr.f, min(next_epochs))
+
+def get_latency_report(dr:DeliveryRouting, speedup:float = 0) -> dict:
+    '''
+    Summarize the decision latency of the epochs in milliseconds.
+    With a wall clock, an epoch is late if it takes longer than the f minutes of simulated time it has before the next one.
+    '''
+    latencies = 1000*np.array(list(dr.epoch_latencies.values()), dtype=np.float64)
+    if len(latencies) == 0:
+        return {'epochs': 0}
+
+    report = {'epochs': len(latencies), 'mean_ms': float(latencies.mean()), 'p50_ms': float(np.percentile(latencies, 50)),
+              'p95_ms': float(np.percentile(latencies, 95)), 'max_ms': float(latencies.max())}
+    if speedup > 0:
+        report['budget_ms'] = 1000*dr.f*60/speedup
+        report['late_epochs'] = int((latencies > report['budget_ms']).sum())
+    return report
@@ -1,10 +1,19 @@
 import os
 import pandas as pd
+from functions.instance_cache import load_instance_cache, get_instance_frames
 
-def read_instance_information(instance_dir):
+# Import the config file
+from config import *
+instance_cache = INSTANCE_CACHE
+
+def read_instance_information(instance_dir, use_cache=instance_cache):
     '''
-    Read instance information from the instance directory
+    Read instance information from the instance directory, or from its compiled cache if use_cache is True and the cache can be written
     '''
+    cache = load_instance_cache(instance_dir) if use_cache else None # the memory-mapped cache, compiled on first use
+    if cache is not None:
+        orders, restaurants, couriers, instanceparams, locations = get_instance_frames(cache)
+        return (orders, restaurants, couriers, instanceparams, locations) + get_instance_parameters(instanceparams)
 
     orders=pd.read_table(os.path.join(instance_dir, 'orders.txt')) # read orders
     restaurants=pd.read_table(os.path.join(instance_dir, 'restaurants.txt')) # read restaurants
@@ -23,6 +32,12 @@ def read_instance_information(instance_dir):
     locations=pd.concat([order_locations, restaurant_locations, courier_locations]) # concatenate the dataframes for order, restaurant, and courier locations
     locations.set_index('id', inplace=True) # set the index of the dataframe for locations to be the id of the location
 
+    return (orders, restaurants, couriers, instanceparams, locations) + get_instance_parameters(instanceparams)
+
+def get_instance_parameters(instanceparams):
+    '''
+    Get the instance parameters from the instance parameters table
+    '''
     meters_per_minute=instanceparams.at[0,'meters_per_minute'] # get the meters per minute
     pickup_service_minutes=instanceparams.at[0,'pickup service minutes'] # get the pickup service minutes
     dropoff_service_minutes=instanceparams.at[0,'dropoff service minutes'] # get the dropoff service minutes
@@ -30,6 +45,6 @@ def read_instance_information(instance_dir):
     pay_per_order=instanceparams.at[0,'pay per order'] # get the pay per order
     guaranteed_pay_per_hour=instanceparams.at[0,'guaranteed pay per hour'] # get the guaranteed pay per hour
 
-    return orders,restaurants,couriers,instanceparams,locations, meters_per_minute, pickup_service_minutes, dropoff_service_minutes, \
+    return meters_per_minute, pickup_service_minutes, dropoff_service_minutes, \
             target_click_to_door, pay_per_order,\
             guaranteed_pay_per_hour
@@ -0,0 +1,161 @@
+import contextlib
+import getpass
+import glob
+import importlib.util
+import itertools
+import json
+import os
+import shutil
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from classes.instancecontext import InstanceContext
+from classes.parameters import Parameters
+from classes.solutionsink import TextSolutionSink
+from functions.main_algo import algo
+
+# Import the config file
+from config import *
+matching_backend = MATCHING_BACKEND
+candidate_pruning = CANDIDATE_PRUNING
+
+worker_contexts = {} # the instance contexts attached in a worker process, by the names of their shared blocks
+max_worker_contexts = 2 # contexts kept attached in a worker process, the sweep has at most this many instances in flight
+
+evaluator_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'reference', 'compute_performance_summary.py') # the reference evaluator
+
+def load_evaluator():
+    '''
+    Import the reference evaluator script as a module
+    '''
+    spec = importlib.util.spec_from_file_location('compute_performance_summary', evaluator_path)
+    evaluator = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(evaluator)
+    return evaluator
+
+def get_parameter_grid(grid:dict) -> list:
+    '''
+    Get the Parameters of every point of a grid, given as a list of values for each Parameters argument
+    '''
+    names = list(grid)
+    return [Parameters(**dict(zip(names, values))) for values in itertools.product(*(grid[name] for name in names))]
+
+def get_run_dir(output_dir, instance_dir, params:Parameters, matching=matching_backend, pruning=candidate_pruning):
+    '''
+    Get the output directory of one instance and grid point, solved with a matching backend and candidate pruning
+    '''
+    return os.path.join(output_dir, os.path.basename(os.path.normpath(instance_dir)), '{}_{}_{}'.format(params.get_tag(), matching, pruning))
+
+def is_done(run_dir) -> bool:
+    '''
+    Check if a grid point has already been run, its summary is written last
+    '''
+    return os.path.isfile(os.path.join(run_dir, 'summary.json'))
+
+def run_grid_point(instance_dir, params:Parameters, run_dir, matching=matching_backend, pruning=candidate_pruning, context:InstanceContext = None) -> dict:
+    '''
+    Run the algorithm and the evaluator on one instance and grid point, and write the solution files, the evaluator output and a summary to run_dir.
+    The instance is read from instance_dir unless its context is given.
+    The performance file is also copied under the name solution_performance_<user>_<tag>.txt used in the instance folders.
+    '''
+    os.makedirs(run_dir, exist_ok=True)
+    summary = {'instance': os.path.basename(os.path.normpath(instance_dir)), 'params': params.to_dict(), 'matching': matching, 'pruning': pruning}
+
+    with open(os.path.join(run_dir, 'log.txt'), 'w') as log, contextlib.redirect_stdout(log): # the solver and the evaluator print their progress
+        start = time.perf_counter()
+        algo(instance_dir, matching=matching, pruning=pruning, params=params, context=context, sink=TextSolutionSink(run_dir)) # the solution files are written during the run
+        summary['solve_time'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        feasible, total_delivered, total_cost, proportion_trueup, _, _ = load_evaluator().compute_performance_summary(instance_dir, run_dir, run_dir)
+        summary['evaluation_time'] = time.perf_counter() - start
+
+    summary.update({'feasible': bool(feasible), 'delivered': int(total_delivered) if total_delivered is not None else None,
+                    'total_cost': float(total_cost) if total_cost is not None else None,
+                    'proportion_trueup': float(proportion_trueup) if proportion_trueup is not None else None})
+    if feasible:
+        shutil.copyfile(os.path.join(run_dir, 'solution_performance.txt'),
+                        os.path.join(run_dir, 'solution_performance_{}_{}.txt'.format(getpass.getuser(), params.get_tag())))
+
+    with open(os.path.join(run_dir, 'summary.json.tmp'), 'w') as f:
+        json.dump(summary, f, indent=4)
+    os.replace(os.path.join(run_dir, 'summary.json.tmp'), os.path.join(run_dir, 'summary.json')) # mark the grid point as done
+
+    return summary
+
+def get_worker_context(context:InstanceContext) -> InstanceContext:
+    '''
+    Get the context attached in this worker process for a context received with a task,
+    so that the grid points of an instance run in the same worker reuse its buckets
+    '''
+    key = tuple(block.name for block in context.shared.values())
+    if key not in worker_contexts:
+        while len(worker_contexts) >= max_worker_contexts: # detach from the oldest instance, the sweep is done with it
+            worker_contexts.pop(next(iter(worker_contexts))).release(unlink=False)
+        worker_contexts[key] = context
+    return worker_contexts[key]
+
+def run_task(task:tuple) -> tuple:
+    '''
+    Run one grid point in a worker process, returning the error instead of raising it so that the other grid points go on
+    '''
+    instance_dir, params, run_dir, matching, pruning, context = task
+    try:
+        return run_dir, run_grid_point(instance_dir, params, run_dir, matching, pruning, get_worker_context(context)), None
+    except Exception:
+        return run_dir, None, traceback.format_exc()
+
+def sweep(instance_pattern:str, grid:dict, output_dir, workers:int = None, matching=matching_backend, pruning=candidate_pruning) -> list:
+    '''
+    Run every instance matching instance_pattern at every point of the parameter grid in a process pool.
+    The instance context is built once per instance and shared with the workers through shared memory, so each grid point costs only the solve.
+    At most max_worker_contexts instances are in flight, the shared memory of an instance is freed once all its grid points are done.
+    Grid points that already have a summary in output_dir for the same matching backend and pruning are skipped, so an interrupted sweep is resumed by running it again.
+    Return the summaries of the grid points run.
+    '''
+    instance_dirs = sorted(d for d in glob.glob(instance_pattern) if os.path.isfile(os.path.join(d, 'orders.txt')))
+    parameter_grid = get_parameter_grid(grid)
+    todo = {instance_dir: [(params, get_run_dir(output_dir, instance_dir, params, matching, pruning)) for params in parameter_grid
+                           if not is_done(get_run_dir(output_dir, instance_dir, params, matching, pruning))] for instance_dir in instance_dirs}
+    todo = {instance_dir: runs for instance_dir, runs in todo.items() if runs} # instances with grid points left to run
+    n_runs, n_todo = len(instance_dirs)*len(parameter_grid), sum(len(runs) for runs in todo.values())
+    print('{} instances, {} grid points, {} runs, {} already done'.format(len(instance_dirs), len(parameter_grid), n_runs, n_runs - n_todo))
+
+    summaries = []
+    failed = [] # the grid points that raised an error
+    contexts = {} # the shared context and the number of grid points left of each instance in flight
+    futures = {} # the instance of each submitted grid point
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+
+        def collect(done):
+            '''
+            Report the finished grid points and free the contexts of the instances that are done
+            '''
+            for future in done:
+                instance_dir = futures.pop(future)
+                run_dir, summary, error = future.result()
+                if error is None:
+                    summaries.append(summary)
+                    print('[{}/{}] {}: delivered {}, cost {}, {:.1f}s'.format(len(summaries) + len(failed), n_todo, run_dir, summary['delivered'], summary['total_cost'], summary['solve_time']))
+                else:
+                    failed.append(run_dir)
+                    print('[{}/{}] {}: failed\n{}'.format(len(summaries) + len(failed), n_todo, run_dir, error))
+                contexts[instance_dir][1] -= 1
+                if contexts[instance_dir][1] == 0:
+                    contexts.pop(instance_dir)[0].release()
+
+        for instance_dir, runs in todo.items():
+            while len(contexts) >= max_worker_contexts: # wait for an instance to finish before sharing the next one
+                collect(wait(futures, return_when=FIRST_COMPLETED).done)
+            try:
+                context = InstanceContext(instance_dir).share()
+            except Exception:
+                print('{}: failed to read the instance\n{}'.format(instance_dir, traceback.format_exc()))
+                continue
+            contexts[instance_dir] = [context, len(runs)]
+            for params, run_dir in runs:
+                futures[executor.submit(run_task, (instance_dir, params, run_dir, matching, pruning, context))] = instance_dir
+        while futures:
+            collect(wait(futures, return_when=FIRST_COMPLETED).done)
+
+    return summaries
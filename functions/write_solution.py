@@ -0,0 +1,14 @@
+from classes.deliveryrouting import DeliveryRouting
+from classes.solutionsink import TextSolutionSink, solution_file_names
+
+def write_solution(dr:DeliveryRouting, output_dir, file_names:dict = solution_file_names):
+    '''
+    Write the orders, couriers and assignments of a solved problem in the format of the solution files of main.ipynb.
+    By default the files are named as the evaluator expects, the notebook names are orders_solution_info.txt, courier_solution_info.txt and assignment_solution_info.txt.
+    A run given a sink writes the same records as it goes, this writes them after the run.
+    '''
+    sink = TextSolutionSink(output_dir, file_names=file_names)
+    for c in dr.couriers:
+        for a in c.assignments:
+            dr.write_assignment(c, a, sink)
+    sink.close()
@@ -1,9 +1,16 @@
 import argparse
 import json
+import os
 
 from functions.read_instance_information import *
 from functions.main_algo import *
+from functions.online import dispatch, get_latency_report
 from functions.analysis import *
+from classes.instancecontext import InstanceContext
+from classes.matching import matching_backends
+from classes.orderfeed import QueueFeed, ReplayFeed, get_replay_events
+from classes.profiler import TickProfiler
+from classes.solutionsink import get_solution_sink, solution_sinks
 
 # Import the config file
 from config import *
@@ -13,22 +20,58 @@ beta = BETA
 gamma = GAMMA
 
 if __name__ == '__main__':
-    
+
     # Parse the arguments
     parser = argparse.ArgumentParser()
     parser.add_argument('--instance_dir', type=str, default='0o50t75s1p100')
+    parser.add_argument('--matching', type=str, default=MATCHING_BACKEND, choices=list(matching_backends), help='the backend that solves the matching problem of each tick')
+    parser.add_argument('--pruning', type=str, default=CANDIDATE_PRUNING, choices=['none', 'radius', 'knn'], help='which couriers are candidates for each route in the matching problem')
+    parser.add_argument('--output_dir', type=str, default=None, help='write the solution to this directory during the run')
+    parser.add_argument('--sink', type=str, default=SOLUTION_SINK, choices=list(solution_sinks), help='the format of the solution written to output_dir')
+    parser.add_argument('--online', action='store_true', help='reveal the orders and courier shifts one by one from a replay of the instance')
+    parser.add_argument('--speedup', type=float, default=0, help='in online mode, simulated minutes per wall-clock minute, 0: as fast as possible')
+    parser.add_argument('--profile', type=str, nargs='?', const='profile', default=None,
+                        help='time the phases of each tick and write them to PROFILE.csv and PROFILE.json, with a summary of the worst ticks')
     args = parser.parse_args()
     file_name = str(args.instance_dir)
-    #instance_dir = 'data/' + str(args.instance_dir)
-    instance_dir = 'C:\\Users\\Asus\\OneDrive\\Documents\\GitHub\\smu-cs606-meal-delivery-routing-problem\\data\\' + str(args.instance_dir)
+    instance_dir = os.path.join('data', str(args.instance_dir))
 
     # Read instance information
     orders,restaurants,couriers,instanceparams,locations, meters_per_minute, pickup_service_minutes, dropoff_service_minutes, \
             target_click_to_door, pay_per_order,\
             guaranteed_pay_per_hour=read_instance_information(instance_dir)
-    
-    dr = algo(instance_dir) # run the algorithm
+
     print('Running...')
+    sink = get_solution_sink(args.sink, args.output_dir) if args.output_dir else None # final assignments are written as the run goes
+    profiler = TickProfiler() if args.profile else None # the runs that are not profiled do not count anything
+    if args.online:
+        context = InstanceContext(instance_dir)
+        if args.speedup > 0: # the replay is pushed to the dispatcher from another thread in accelerated wall-clock time
+            feed = QueueFeed()
+            feed.replay(get_replay_events(context, delta_u), args.speedup)
+        else:
+            feed = ReplayFeed(context, delta_u)
+        dr = dispatch(instance_dir, feed, matching=args.matching, pruning=args.pruning, context=context, sink=sink, speedup=args.speedup, profiler=profiler) # run the algorithm online
+        print('Decision latency:', ', '.join('{}: {:.2f}'.format(k, v) if isinstance(v, float) else '{}: {}'.format(k, v)
+                                          for k, v in get_latency_report(dr, args.speedup).items()))
+    else:
+        dr = algo(instance_dir, matching=args.matching, pruning=args.pruning, sink=sink, profiler=profiler) # run the algorithm
+
+    # report the matching solve time of each tick
+    matching_times = list(dr.matching_times.values())
+    if matching_times:
+        print('Matching backend:', args.matching)
+        print('Ticks solved: {}, total solve time: {:.3f}s, mean: {:.2f}ms, max: {:.2f}ms'.format(
+            len(matching_times), sum(matching_times), 1000*sum(matching_times)/len(matching_times), 1000*max(matching_times)))
+
+    # report the couriers and orders retired during the run
+    print('Retired:', ', '.join('{} {}'.format(v, k.replace('_', ' ')) for k, v in dr.archive.summary().items()))
+
+    # report the phases of each tick
+    if profiler is not None:
+        profiler.write(args.profile)
+        print(profiler.format_summary())
+        print('Profile written to {}.csv and {}.json'.format(args.profile, args.profile))
 
     # save print results
 
@@ -36,4 +79,4 @@ if __name__ == '__main__':
     # with open(str(instance_dir) + '/final_result.json', 'w') as f:
     #     f.write(obj) # write the final result to a json file
 
-    
+
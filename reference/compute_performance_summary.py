@@ -5,6 +5,8 @@ import os
 import numpy as np
 import bisect
 import sys
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # make the repository packages importable when run as a script
+from functions.instance_cache import instance_cache,load_instance_cache,get_instance_frames,get_travel_time_matrix
 '''
 This script takes as input (at most) three directories, in the following order:
     1. instance directory: it is expected to contain files orders.txt, couriers.txt, restaurants.txt, and instance_parameters.txt
@@ -19,11 +21,8 @@ Example call:
 folder_default=os.path.join(os.path.curdir,'test_sampling_orders')
 
 # some methods defined on their own for clarity
-def travel_time(origin_id,destination_id,meters_per_minute,locations):
-    dist=np.sqrt((locations.at[destination_id,'x']-locations.at[origin_id,'x'])**2\
-                +(locations.at[destination_id,'y']-locations.at[origin_id,'y'])**2)
-    tt=np.ceil(dist/meters_per_minute)
-    return tt
+def travel_time(origin_id,destination_id,travel_times):
+    return travel_times.travel_time(origin_id,destination_id)
 
 def parse_console_input_and_define_parameter_values(console_input):
     instance_dir=next((p for p in console_input if 'instance_dir=' in p),None)
@@ -61,20 +60,24 @@ def parse_console_input_and_define_parameter_values(console_input):
         os.makedirs(output_dir)
     return instance_dir,input_dir,output_dir
 
-def read_instance_information(instance_dir):
-    orders=pd.read_table(os.path.join(instance_dir,'orders.txt'))
-    restaurants=pd.read_table(os.path.join(instance_dir,'restaurants.txt'))
-    couriers=pd.read_table(os.path.join(instance_dir,'couriers.txt'))
-    instanceparams=pd.read_table(os.path.join(instance_dir,'instance_parameters.txt'))
+def read_instance_information(instance_dir,use_cache=instance_cache):
+    cache=load_instance_cache(instance_dir) if use_cache else None # compiled on first use, None if it cannot be written
+    if cache is not None:
+        orders,restaurants,couriers,instanceparams,locations=get_instance_frames(cache)
+    else:
+        orders=pd.read_table(os.path.join(instance_dir,'orders.txt'))
+        restaurants=pd.read_table(os.path.join(instance_dir,'restaurants.txt'))
+        couriers=pd.read_table(os.path.join(instance_dir,'couriers.txt'))
+        instanceparams=pd.read_table(os.path.join(instance_dir,'instance_parameters.txt'))
 
-    order_locations=pd.DataFrame(data=[orders.order,orders.x,orders.y]).transpose()
-    order_locations.columns=['id','x','y']
-    restaurant_locations=pd.DataFrame(data=[restaurants.restaurant,restaurants.x,restaurants.y]).transpose()
-    restaurant_locations.columns=['id','x','y']
-    courier_locations=pd.DataFrame(data=[couriers.courier,couriers.x,couriers.y]).transpose()
-    courier_locations.columns=['id','x','y']
-    locations=pd.concat([order_locations,restaurant_locations,courier_locations])
-    locations.set_index('id',inplace=True)
+        order_locations=pd.DataFrame(data=[orders.order,orders.x,orders.y]).transpose()
+        order_locations.columns=['id','x','y']
+        restaurant_locations=pd.DataFrame(data=[restaurants.restaurant,restaurants.x,restaurants.y]).transpose()
+        restaurant_locations.columns=['id','x','y']
+        courier_locations=pd.DataFrame(data=[couriers.courier,couriers.x,couriers.y]).transpose()
+        courier_locations.columns=['id','x','y']
+        locations=pd.concat([order_locations,restaurant_locations,courier_locations])
+        locations.set_index('id',inplace=True)
 
     orders.set_index('order',inplace=True)
     couriers.set_index('courier',inplace=True)
@@ -135,24 +138,86 @@ def read_solution_information(input_dir):
             else:
                 line=line.split()
                 if courier_id!=line[0]:
-                    courier_sol[courier_id]=courier_moves
+                    courier_sol.setdefault(courier_id,[]).extend(courier_moves) # the moves of a courier need not be contiguous
                     courier_moves=[]
                     courier_id=line[0]
                 departure_time=int(float(line[1]))
                 origin_id= line[2] if line[2]!='0' else courier_id
                 destination_id=line[3].strip()
                 courier_moves.append([departure_time,origin_id,destination_id])
-        if courier_id not in courier_sol:
-            courier_sol[courier_id]=courier_moves
+        courier_sol.setdefault(courier_id,[]).extend(courier_moves)
         courier_sol.pop(None, None)
     return assignment_sol,order_sol,courier_sol,order_pickup_times
 
+def explode_assignments(assignment_sol):
+    # one row per (assignment, order) pair, in the order of the assignments and of the orders in each bundle
+    bundle_sizes=assignment_sol.bundle.map(len).to_numpy(dtype=np.intp)
+    pairs=pd.DataFrame({'assignment':np.repeat(np.arange(len(assignment_sol)),bundle_sizes),
+                        'order':pd.Series([o for b in assignment_sol.bundle for o in b],dtype=object)})
+    pairs['position']=np.arange(len(pairs))-np.repeat(np.cumsum(bundle_sizes)-bundle_sizes,bundle_sizes) # position of the order in its bundle
+    return pairs
+
+def get_assignment_rows(assignment_sol,positions):
+    # the assignments at the given positions as the rows yielded by assignment_sol.iterrows(), used to report violations
+    if len(positions)==0:
+        return []
+    values=assignment_sol.values
+    return [pd.Series(values[i],index=assignment_sol.columns,name=assignment_sol.index[i]) for i in positions]
+
+class CourierTimelines(object):
+    # the timeline of every courier with moves, all couriers in one pair of flat arrays: the courier's on-time at its own location,
+    # then for each move the departure time (in transit, place '') and the arrival time at the destination
+    def __init__(self,courier_sol,couriers,travel_times):
+        self.couriers=list(courier_sol)
+        self.index=pd.Series(np.arange(len(self.couriers)),index=pd.Index(self.couriers,dtype=object)) # timeline of each courier
+        move_counts=np.array([len(s) for s in courier_sol.values()],dtype=np.intp)
+        self.move_courier=np.repeat(np.arange(len(self.couriers)),move_counts) # timeline of each move
+        departure=np.array([a[0] for s in courier_sol.values() for a in s],dtype=np.float64)
+        self.origin=np.array([a[1] for s in courier_sol.values() for a in s],dtype=object)
+        destination=np.array([a[2] for s in courier_sol.values() for a in s],dtype=object)
+        self.tt=travel_times.matrix[travel_times.get_indices(self.origin),travel_times.get_indices(destination)].astype(np.float64)
+
+        point_counts=1+2*move_counts
+        self.start=np.cumsum(point_counts)-point_counts # position of the first point of each timeline
+        self.end=self.start+point_counts
+        departure_point=self.start[self.move_courier]+1+2*(np.arange(len(self.move_courier))-np.repeat(np.cumsum(move_counts)-move_counts,move_counts))
+        self.times=np.empty(point_counts.sum(),dtype=np.float64)
+        self.places=np.empty(point_counts.sum(),dtype=object)
+        self.times[self.start]=couriers.on_time.loc[self.couriers].to_numpy(dtype=np.float64)
+        self.places[self.start]=self.couriers
+        self.times[departure_point]=departure
+        self.places[departure_point]=''
+        self.times[departure_point+1]=departure+self.tt
+        self.places[departure_point+1]=destination
+        self.previous_place=self.places[departure_point-1] # where the courier was before each move
+        descending=np.flatnonzero(np.diff(self.times)<0)+1 # points earlier than the point before them
+        descending=descending[~np.isin(descending,self.start)]
+        self.unordered=np.unique(np.searchsorted(self.end,descending,side='right')) # timelines with departures before arrivals
+
+    def locate(self,courier_ids,query_times):
+        # the place of each courier at each time, i.e. places[bisect_left(times,t)-1] on the courier's timeline,
+        # for all queries at once by sorting them together with the timeline points
+        k=self.index.loc[courier_ids].to_numpy() # timeline of each query, unknown couriers raise a KeyError
+        query_times=np.asarray(query_times,dtype=np.float64)
+        point_timeline=np.repeat(np.arange(len(self.start)),self.end-self.start)
+        is_point=np.r_[np.ones(len(self.times),dtype=np.intp),np.zeros(len(query_times),dtype=np.intp)]
+        order=np.lexsort((is_point,np.r_[self.times,query_times],np.r_[point_timeline,k])) # queries go before points at the same time, as in bisect_left
+        rank=np.empty(len(order),dtype=np.intp)
+        rank[order]=np.cumsum(is_point[order])-is_point[order] # timeline points sorted before each entry
+        i=rank[len(self.times):]-1 # the point just before each query on the flat timeline
+        i=np.where(i<self.start[k],self.end[k]-1,i) # before the first point of its timeline: the last place, as index -1 of a list
+        for j in np.flatnonzero(np.isin(k,self.unordered)): # sorting does not reproduce a binary search on an unordered timeline
+            times=self.times[self.start[k[j]]:self.end[k[j]]].tolist()
+            i[j]=self.start[k[j]]+(bisect.bisect_left(times,query_times[j])-1)%len(times)
+        return self.places[i]
+
 # Script
 def compute_performance_summary(instance_dir,input_dir,output_dir):
     print('reading instance information')   
     orders,restaurants,couriers,instanceparams,locations,meters_per_minute,\
     pickup_service_minutes,dropoff_service_minutes,target_click_to_door,\
     pay_per_order,guaranteed_pay_per_hour = read_instance_information(instance_dir)
+    travel_times=get_travel_time_matrix(instance_dir,locations,meters_per_minute)
     print('reading solution information')
     assignment_sol,order_sol,courier_sol,order_pickup_times = read_solution_information(input_dir)
     
@@ -162,36 +227,28 @@ def compute_performance_summary(instance_dir,input_dir,output_dir):
     f= open(feasibility_file, "w")
     feasible=True
 
+    pairs=explode_assignments(assignment_sol) # one row per (assignment, order) pair
+    assignment_orders=pairs.order.to_numpy()
+    assignment_of_pair=pairs.assignment.to_numpy()
+
     # verify that each order is in at most one assignment
-    bundles_per_order={}
-    for o in order_sol.index:
-        for b in assignment_sol.bundle:
-            if o in b:
-                if o in bundles_per_order:
-                    bundles_per_order[o].append(b)
-                else:
-                    bundles_per_order[o]=[b]
-    violations={o:l for o,l in bundles_per_order.items() if len(l)>1}
-    if violations: 
+    bundles_per_order=pairs.drop_duplicates(['assignment','order']).order.value_counts() # an order is counted once per bundle it is in
+    order_ids=pd.Series(order_sol.index,dtype=object)
+    counts=order_ids.map(bundles_per_order).fillna(0)*order_ids.map(order_ids.value_counts()) # every row of the order in the solution counts
+    violations=order_ids[(counts>1).to_numpy()].unique()
+    if len(violations): 
         print('orders in more than one assignment:',file=f)
-        print(*violations.keys(),sep='\n',file=f)    
+        print(*violations,sep='\n',file=f)    
         feasible=False
     else:
         print('every order is in at most one assignment: OK',file=f)
 
     # verify that assignments are not made before information is revealed
-    violations=[]
-    orders_per_bundle=[] # leverage loop to record the size of bundles
-    for i,a in assignment_sol.iterrows():
-        order_seq=a.bundle
-        assignment_time=a.assignment_time
-        #print('\n'+str(pickup)+' '+str(order_seq),end='\t')
-        for o in order_seq:
-            placement=orders.at[o,'placement_time']
-            #print(ready,end=' ')
-            if assignment_time<placement:
-                violations.append((assignment_time,placement,o,a))
-        orders_per_bundle.append(len(order_seq))
+    placement=orders.placement_time.loc[assignment_orders].to_numpy()
+    late=np.flatnonzero(assignment_sol.assignment_time.to_numpy()[assignment_of_pair]<placement)
+    rows=get_assignment_rows(assignment_sol,assignment_of_pair[late])
+    violations=[(a.assignment_time,placement[j],assignment_orders[j],a) for j,a in zip(late,rows)]
+    orders_per_bundle=assignment_sol.bundle.map(len).tolist() # size of bundles
     if violations:
         print('\nassignments made before orders are placed:',file=f)
         print(*violations,sep='\n',file=f)
@@ -200,13 +257,10 @@ def compute_performance_summary(instance_dir,input_dir,output_dir):
         print('\nassignments are never made before information is revealed: OK',file=f)
 
     # verify that each assignment is picked up before the off-time of the courier
-    violations=[]
-    bundles_per_courier={d:0 for d in couriers.index}#leverage loop: couriers' total bundles served
-    for i,a in assignment_sol.iterrows():
-        offtime=couriers.at[a.courier,'off_time']
-        if offtime<a.pickup_time:
-            violations.append((offtime,a.pickup_time,a))
-        bundles_per_courier[a.courier]+=1
+    offtime=couriers.off_time.loc[assignment_sol.courier].to_numpy()
+    late=np.flatnonzero(offtime<assignment_sol.pickup_time.to_numpy())
+    violations=[(offtime[i],a.pickup_time,a) for i,a in zip(late,get_assignment_rows(assignment_sol,late))]
+    bundles_per_courier=assignment_sol.courier.value_counts().reindex(couriers.index,fill_value=0) # couriers' total bundles served
     if violations:
         print('\nbundle picked up after off-time of courier:',file=f)
         print(*violations,sep='\n',file=f)
@@ -215,16 +269,10 @@ def compute_performance_summary(instance_dir,input_dir,output_dir):
         print('\nbundle picked up before off-time of courier: OK',file=f)
 
     # verify that, for each assignment, the pickup time is not erlier than the ready time of any order in the bundle
-    violations=[]
-    for i,a in assignment_sol.iterrows():
-        order_seq=a.bundle
-        pickup=a.pickup_time
-        #print('\n'+str(pickup)+' '+str(order_seq),end='\t')
-        for o in order_seq:
-            ready=orders.at[o,'ready_time']
-            #print(ready,end=' ')
-            if ready>pickup:
-                violations.append((pickup,ready,a))
+    ready=orders.ready_time.loc[assignment_orders].to_numpy()
+    early=np.flatnonzero(ready>assignment_sol.pickup_time.to_numpy()[assignment_of_pair])
+    rows=get_assignment_rows(assignment_sol,assignment_of_pair[early])
+    violations=[(a.pickup_time,ready[j],a) for j,a in zip(early,rows)]
     if violations:
         print('\nbundle pickup times do not respect individual ready times:',file=f)
         print(*violations,sep='\n',file=f)
@@ -235,18 +283,12 @@ def compute_performance_summary(instance_dir,input_dir,output_dir):
     # verify that dropoffs occur in the right order (one assignment after another one, 
     # respecting the delivery sequence in each assigned bundle) and that and delivery 
     # service time is enforced 
-    violations=[]
-    for i,a in assignment_sol.iterrows():
-        order_seq=a.bundle
-        dropoffs=[]
-        #print('\n',order_seq,end='\t')
-        for o in order_seq:
-            drop=order_sol.at[o,'dropoff_time']
-            #print(drop,end=' ')
-            if dropoffs:
-                if drop<dropoffs[-1]+dropoff_service_minutes:
-                    violations.append((dropoffs,drop,order_seq))
-            dropoffs.append(drop)
+    drop=order_sol.dropoff_time.loc[assignment_orders].to_numpy()
+    previous_drop=np.r_[np.nan,drop[:-1]] # dropoff time of the previous order of the bundle
+    early=np.flatnonzero((pairs.position.to_numpy()>0)&(drop<previous_drop+dropoff_service_minutes))
+    bundle_drops=np.split(drop,np.flatnonzero(np.diff(assignment_of_pair))+1) if len(drop) else [] # dropoff times of each non-empty bundle
+    bundle_drops=dict(zip(np.unique(assignment_of_pair),bundle_drops))
+    violations=[(list(bundle_drops[assignment_of_pair[j]]),drop[j],assignment_sol.bundle.iat[assignment_of_pair[j]]) for j in early]
     if violations:
         print('\ndropoffs do not follow the prescribed sequence:',file=f)
         print(*violations,sep='\n',file=f)
@@ -257,26 +299,14 @@ def compute_performance_summary(instance_dir,input_dir,output_dir):
     # Prepare timeline for each courier: when are they in transit? when and where are
     # they not moving? While we're at it, verify that couriers do not tele-transport 
     # (arrival location is next departure location; arrival happens before departure)
-    courier_timeline={}
-    violations1=[]
-    violations2=[]
-    time_driving={}
-    for d,s in courier_sol.items():
-        courier_timeline[d]=lambda:None
-        courier_timeline[d].times=[couriers.loc[d].on_time]
-        courier_timeline[d].places=[d]
-        time_driving[d]=0
-        for a in s:
-            if a[1]!=courier_timeline[d].places[-1]:#'current origin should be previous destination'
-                violations1.append((d,a[1],courier_timeline[d].places[-1]))
-            courier_timeline[d].times.append(a[0])
-            courier_timeline[d].places.append('')
-            tt=travel_time(a[1],a[2],meters_per_minute,locations)
-            courier_timeline[d].times.append(a[0]+tt)
-            courier_timeline[d].places.append(a[2])
-            time_driving[d]+=tt
-        if sorted(courier_timeline[d].times) != courier_timeline[d].times:#'if departures happen after arrivals, times are ordered'
-            violations2.append(courier_timeline[d].times)
+    courier_timeline=CourierTimelines(courier_sol,couriers,travel_times)
+    discontinuous=np.flatnonzero(courier_timeline.origin!=courier_timeline.previous_place) #'current origin should be previous destination'
+    violations1=[(courier_timeline.couriers[courier_timeline.move_courier[j]],courier_timeline.origin[j],courier_timeline.previous_place[j]) for j in discontinuous]
+    violations2=[[couriers.loc[d].on_time]+[t for a in courier_sol[d] for t in (a[0],a[0]+travel_time(a[1],a[2],travel_times))]
+                 for d in (courier_timeline.couriers[k] for k in courier_timeline.unordered)] #'if departures happen after arrivals, times are ordered'
+
+    time_driving=pd.Series(np.bincount(courier_timeline.move_courier,weights=courier_timeline.tt,minlength=len(courier_timeline.couriers)),
+                           index=pd.Index(courier_timeline.couriers,dtype=object))
     if violations1:
         print('\ndiscontinuities in sequence of origin-destination pairs:',file=f)
         print(*violations1,sep='\n',file=f)
@@ -291,23 +321,13 @@ def compute_performance_summary(instance_dir,input_dir,output_dir):
         print('\ndepartures and arrival time are consistent in time: OK',file=f)
 
     # Verify that for each dropoff, the courier is located at the right place at the right time
-    time_dropping={d:0 for d in couriers.index} #leverage loop: couriers' total dropoff service time
-    orders_served={d:0 for d in couriers.index}#leverage loop: couriers' total orders served
-    violations=[]
-    #print(order_sol.head())
-    for o_id, o_info in order_sol.iterrows():
-        if o_info.courier=='courier':
-            continue
-        d=o_info['courier']
-        if d not in orders_served:
-            continue
-        drop=o_info.dropoff_time
-        i=bisect.bisect_left(courier_timeline[d].times,drop)-1
-        loc_id=courier_timeline[d].places[i]
-        if loc_id!=o_id:
-            violations.append((o_id,drop,loc_id))
-        time_dropping[d]+=dropoff_service_minutes
-        orders_served[d]+=1
+    delivered=order_sol[((order_sol.courier!='courier')&order_sol.courier.isin(couriers.index)).to_numpy()]
+    loc_ids=courier_timeline.locate(delivered.courier,delivered.dropoff_time)
+    wrong=np.flatnonzero(loc_ids!=delivered.index.to_numpy())
+    drops=delivered.dropoff_time.to_numpy(dtype=object) if len(wrong) else None
+    violations=[(delivered.index[j],drops[j],loc_ids[j]) for j in wrong]
+    orders_served=delivered.courier.value_counts().reindex(couriers.index,fill_value=0) # couriers' total orders served
+    time_dropping=orders_served*dropoff_service_minutes # couriers' total dropoff service time
     if violations:
         print('\ninconsistency in dropoff times and locations',file=f)
         print(*violations,file=f)
@@ -316,18 +336,12 @@ def compute_performance_summary(instance_dir,input_dir,output_dir):
         print('\ndropoff times and locations are consistent:OK',file=f)
 
     # Verify that, for each pickup, the courier is located at the right place at the right time
-    time_picking={d:0 for d in couriers.index} #leverage loop: couriers' total pickup service time (lower bound)
-    violations=[]
-    for a_id, a_info in assignment_sol.iterrows():
-        d=a_info.courier
-        o=a_info.bundle[0]
-        r=orders.loc[o].restaurant
-        pickup=a_info.pickup_time
-        i=bisect.bisect_left(courier_timeline[d].times,pickup)-1
-        loc_id=courier_timeline[d].places[i]
-        if loc_id!=r:
-            violations.append((o_id,r,pickup,loc_id))
-        time_picking[d]+=pickup_service_minutes
+    first_orders=assignment_sol.bundle.str[0]
+    restaurant=orders.restaurant.loc[first_orders].to_numpy()
+    loc_ids=courier_timeline.locate(assignment_sol.courier,assignment_sol.pickup_time)
+    wrong=np.flatnonzero(loc_ids!=restaurant)
+    violations=[(first_orders.iat[i],restaurant[i],assignment_sol.pickup_time.iat[i].item(),loc_ids[i]) for i in wrong]
+    time_picking=bundles_per_courier*pickup_service_minutes # couriers' total pickup service time (lower bound)
     if violations:
         print('\ninconsistency in pickup times and locations',file=f)
         print(*violations,file=f)
@@ -362,23 +376,22 @@ def compute_performance_summary(instance_dir,input_dir,output_dir):
         order_performance['click-to-door']=order_performance['dropoff_time']-order_performance['placement_time']
         order_performance['ready-to-door']=order_performance['dropoff_time']-order_performance['ready_time']
         order_performance['ready-to-pickup']=order_performance['pickup_time']-order_performance['ready_time']
-        order_performance['click-to-door overage']=order_performance.apply(\
-                                                   lambda row:max(0,row['click-to-door']-target_click_to_door) ,axis=1)     
+        order_performance['click-to-door overage']=(order_performance['click-to-door']-target_click_to_door).clip(lower=0).fillna(0)
     except:
         order_performance=None
     try:
         courier_performance=couriers.drop(['x','y'],axis=1)
         courier_performance['shift_duration']=courier_performance['off_time']-courier_performance['on_time']
         courier_performance['guaranteed_earnings']=courier_performance['shift_duration']*guaranteed_pay_per_hour/60.0
-        courier_performance['orders_delivered']=pd.Series(orders_served)
-        courier_performance['bundles_delivered']=pd.Series(bundles_per_courier)
+        courier_performance['orders_delivered']=orders_served
+        courier_performance['bundles_delivered']=bundles_per_courier
         courier_performance['orders_per_hour']=60*courier_performance['orders_delivered']/courier_performance['shift_duration']
         courier_performance['bundles_per_hour']=60*courier_performance['bundles_delivered']/courier_performance['shift_duration']
         courier_performance['order_earnings']=courier_performance['orders_delivered']*pay_per_order
-        courier_performance['payment']=courier_performance.apply(lambda row: max(row['order_earnings'],row['guaranteed_earnings']),axis=1)
-        courier_performance['time_driving']=pd.Series(*zip(*[(v,k) for k,v in time_driving.items()]))
-        courier_performance['time_dropping']=pd.Series(*zip(*[(v,k) for k,v in time_dropping.items()]))
-        courier_performance['time_picking']=pd.Series(*zip(*[(v,k) for k,v in time_picking.items()]))
+        courier_performance['payment']=np.maximum(courier_performance['order_earnings'],courier_performance['guaranteed_earnings'])
+        courier_performance['time_driving']=time_driving
+        courier_performance['time_dropping']=time_dropping
+        courier_performance['time_picking']=time_picking
         courier_performance['utilization']=(courier_performance['time_driving']+courier_performance['time_dropping']+\
                                                  courier_performance['time_picking'])/courier_performance['shift_duration']
         courier_performance.fillna({'utilization':0},inplace=True)
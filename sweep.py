@@ -0,0 +1,36 @@
+import argparse
+
+from functions.sweep import sweep
+from classes.matching import matching_backends
+
+# Import the config file
+from config import *
+
+def number(value:str):
+    '''
+    Parse a number, keeping whole numbers as int so that the tags read b10 and not b10.0
+    '''
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+if __name__ == '__main__':
+
+    # Parse the arguments, every parameter takes a list of values and the grid is their product
+    parser = argparse.ArgumentParser(description='Run the algorithm and the evaluator over instances and a parameter grid')
+    parser.add_argument('--instances', type=str, default='data/*', help='glob of the instance directories')
+    parser.add_argument('--output_dir', type=str, default='results', help='one sub-directory per instance and grid point is written here')
+    parser.add_argument('--f', type=int, nargs='+', default=[F_MINUTE])
+    parser.add_argument('--delta_u', type=int, nargs='+', default=[DELTA_U])
+    parser.add_argument('--beta', type=number, nargs='+', default=[BETA])
+    parser.add_argument('--gamma', type=number, nargs='+', default=[GAMMA])
+    parser.add_argument('--x', type=int, nargs='+', default=[X])
+    parser.add_argument('--omega', type=number, nargs='+', default=[OMEGA])
+    parser.add_argument('--commitment_strategy', type=int, nargs='+', default=[COMMITMENT_STRATEGY], choices=[0, 1])
+    parser.add_argument('--workers', type=int, default=None, help='number of processes, all cores by default')
+    parser.add_argument('--matching', type=str, default=MATCHING_BACKEND, choices=list(matching_backends))
+    parser.add_argument('--pruning', type=str, default=CANDIDATE_PRUNING, choices=['none', 'radius', 'knn'])
+    args = parser.parse_args()
+
+    grid = {'f_minute': args.f, 'delta_u': args.delta_u, 'beta': args.beta, 'gamma': args.gamma,
+            'x': args.x, 'omega': args.omega, 'commitment_strategy': args.commitment_strategy}
+    sweep(args.instances, grid, args.output_dir, workers=args.workers, matching=args.matching, pruning=args.pruning)